@@ -33,6 +33,11 @@ def ALLOWED_ORIGINS(self) -> List[str]:
     # AI Model Settings
     GEMINI_API_KEY: str = "your-gemini-api-key-here"
     
+    # Vision API Settings
+    ENABLE_VISION_API: bool = False
+    GOOGLE_VISION_CREDENTIALS_PATH: str = ""
+    VISION_API_MONTHLY_LIMIT: int = 1000
+    
     # Voice Input Settings (NEW)
     ENABLE_VOICE_INPUT: bool = True
     MAX_AUDIO_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
@@ -43,6 +48,17 @@ def ALLOWED_ORIGINS(self) -> List[str]:
     MODEL_CONFIDENCE_THRESHOLD: float = 0.5
     MAX_INGREDIENTS_DETECTED: int = 15  # Increased for voice input
     MAX_RECIPE_GENERATION_RETRIES: int = 3
+    GEMINI_STRUCTURED_OUTPUT: bool = True
+    
+    # Gemini Resilience Settings
+    GEMINI_REQUEST_TIMEOUT: int = 60
+    GEMINI_RETRY_BASE_DELAY: float = 0.5
+    GEMINI_RETRY_MAX_DELAY: float = 8.0
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = 20
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_MIN_CALLS: int = 5
+    CIRCUIT_BREAKER_RESET_TIMEOUT: int = 30
+    CIRCUIT_BREAKER_SERVE_FALLBACK: bool = False
     
     # File Upload Settings
     MAX_FILE_SIZE: int = 10 * 1024 * 1024
@@ -52,6 +68,21 @@ def ALLOWED_ORIGINS(self) -> List[str]:
     # Logging Settings
     LOG_LEVEL: str = "INFO"
     
+    # Observability
+    ENABLE_METRICS: bool = True
+    ENABLE_TRACING: bool = True
+    TRACING_SAMPLE_RATE: float = 1.0  # share of requests exported; Server-Timing is always set
+    TRACING_SERVER_TIMING: bool = True
+    TRACING_EXPORT_PATH: str = ""  # OTLP/JSON lines file, e.g. ./traces/spans.jsonl
+    TRACING_OTLP_ENDPOINT: str = ""  # OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+    TRACING_SERVICE_NAME: str = "recipe-api"
+    
+    # Response compression (brotli needs the optional brotli package, else gzip)
+    ENABLE_COMPRESSION: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
     # Optional Features
     ENABLE_EMAIL_NOTIFICATIONS: bool = False
     ENABLE_ANALYTICS: bool = True
@@ -64,9 +95,89 @@ def ALLOWED_ORIGINS(self) -> List[str]:
     MAX_CONCURRENT_REQUESTS: int = 100
     REQUEST_TIMEOUT: int = 30
     DATABASE_CONNECTION_TIMEOUT: int = 10
+    READINESS_PROBE_INTERVAL: int = 15
+    READINESS_PROBE_TIMEOUT: int = 5
+    
+    # Admission control: MAX_CONCURRENT_REQUESTS slots, queued up to REQUEST_TIMEOUT
+    ENABLE_ADMISSION_CONTROL: bool = True
+    ADMISSION_LLM_SHARE: float = 0.25  # share of the slots reserved for LLM-bound routes
+    ADMISSION_QUEUE_SIZE: int = 100  # waiting requests per route class
+    ADMISSION_STREAM_LIMIT: int = 2  # concurrent history exports, outside MAX_CONCURRENT_REQUESTS
+    
+    # Per-user fair share of LLM calls
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_USER_RATE_PER_MINUTE: float = 30
+    LLM_USER_BURST: int = 10
+    LLM_USER_MAX_QUEUED: int = 4
+    LLM_QUEUE_TIMEOUT: float = 20
+    ENABLE_REQUEST_COALESCING: bool = True  # identical concurrent generations share one LLM call
+    IDEMPOTENCY_KEY_TTL: int = 86400  # how long a completed Idempotency-Key replays its response
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 120  # an in-progress key older than this is taken over
+    
+    # Recipe cache and speculative off-peak pre-generation (needs ENABLE_RECIPE_CACHING)
+    RECIPE_CACHE_TTL: int = 43200
+    ENABLE_RECIPE_PREGENERATION: bool = True
+    PREGENERATION_WINDOW_START_HOUR: int = 2  # UTC; the window may wrap past midnight
+    PREGENERATION_WINDOW_END_HOUR: int = 6
+    PREGENERATION_TOKEN_BUDGET: int = 200000  # per daily window
+    PREGENERATION_INTERVAL: int = 300  # seconds between passes inside the window
+    PREGENERATION_LEASE_SECONDS: int = 1800  # a pass still running after this is taken over
+    PREGENERATION_ACTIVE_DAYS: int = 14
+    PREGENERATION_MAX_USERS: int = 500
+    PREGENERATION_COMBOS_PER_USER: int = 3
+    PREGENERATION_STAPLE_INGREDIENTS: int = 4
+    PREGENERATION_WEIGHT: float = 0.25  # fair-scheduling weight relative to a live user
+    
+    # In-memory ingredient index behind /recipes/cookable
+    INGREDIENT_INDEX_REFRESH_SECONDS: int = 60  # reads older than this pull new recipes first
+    INGREDIENT_INDEX_BATCH_SIZE: int = 1000
+    COOKABLE_MAX_RESULTS: int = 50
+    
+    # TF-IDF similarity matrix behind /recipes/{id}/similar
+    SIMILARITY_FEATURES: int = 1024  # hashed term columns; changing it invalidates snapshots
+    SIMILARITY_NUTRITION_WEIGHT: float = 0.2
+    SIMILARITY_REFRESH_SECONDS: int = 60
+    SIMILARITY_SNAPSHOT_DIR: str = "./data/similarity"  # empty disables snapshots
+    SIMILARITY_SNAPSHOT_INTERVAL: int = 600
+    SIMILAR_MAX_RESULTS: int = 50
+    
+    # Offline recommendation build (ENABLE_USER_RECOMMENDATIONS); one worker runs it at a time
+    RECOMMENDATION_INTERVAL: int = 21600  # seconds between builds
+    RECOMMENDATION_LEASE_SECONDS: int = 3600  # a build still running after this is taken over
+    RECOMMENDATION_FACTORS: int = 32
+    RECOMMENDATION_TOP_N: int = 50  # stored per user
+    RECOMMENDATION_FAVORITE_WEIGHT: float = 2.0  # added to a history entry's weight when favorited
+    RECOMMENDATION_BATCH_SIZE: int = 5000  # documents per streamed read
+    RECOMMENDATION_USER_CHUNK: int = 512  # users scored per matrix product
+    
+    # Mood x cuisine x time-of-day priors (ENABLE_MOOD_ANALYSIS)
+    MOOD_ANALYSIS_INTERVAL: int = 3600  # seconds between rebuilds
+    MOOD_ANALYSIS_LEASE_SECONDS: int = 900
+    MOOD_ANALYSIS_BATCH_SIZE: int = 5000
+    MOOD_PRIOR_MIN_SUPPORT: int = 30  # recipes a mood (and time slot) needs before it biases prompts
+    MOOD_PRIOR_MIN_LIFT: float = 1.2
+    MOOD_PRIOR_TOP_CUISINES: int = 2
+    
+    # MinHash near-duplicate detection as recipe_history is written
+    ENABLE_NEAR_DUPLICATE_DETECTION: bool = True
+    NEAR_DUPLICATE_THRESHOLD: float = 0.8  # estimated Jaccard similarity of title/ingredient/step shingles
+    NEAR_DUPLICATE_ACTION: str = "flag"  # flag: mark the entry; merge: point it at the stored recipe when the user already has it
+    NEAR_DUPLICATE_REROLL: bool = False  # regenerate once when the user already has a near-duplicate
+    NEAR_DUPLICATE_MAX_CANDIDATES: int = 50  # LSH candidates compared per written recipe
+    MINHASH_PERMUTATIONS: int = 64  # changing either re-keys the index; run scripts.dedup_recipes
+    MINHASH_BANDS: int = 16
+    
+    # Streaming /recipes/history/export
+    HISTORY_EXPORT_BATCH_SIZE: int = 500  # entries per cursor batch, hydrated and encoded together
     
     # Development
     MOCK_AI_RESPONSES: bool = False
+    MOCK_AI_SEED: int = 42
+    MOCK_AI_LATENCY_DISTRIBUTION: str = "lognormal"  # constant, uniform or lognormal
+    MOCK_AI_LATENCY_MS: float = 800
+    MOCK_AI_LATENCY_SPREAD: float = 0.5
+    MOCK_AI_ERROR_RATE: float = 0.0
+    MOCK_AI_MALFORMED_RATE: float = 0.0
     
     class Config:
         env_file = ".env"
@@ -1,50 +1,142 @@
 #mongodb.py
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateMany, UpdateOne
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import logging
 
 from app.core.config import get_settings
+from app.utils.recipe_schema import recipe_content, recipe_content_hash
+from app.utils.metrics import MONGO_COMMAND_LISTENER
+from app.utils.tracing import MONGO_COMMAND_TRACER, traced
 
 logger = logging.getLogger(__name__)
 
+USER_VERSION_FIELDS = ("history", "favorites", "profile", "mood")
+
 class MongoDB:
     def __init__(self):
         self.settings = get_settings()
         self.client: Optional[AsyncIOMotorClient] = None
         self.database = None
         
+    def open(self):
+        """Create the client; Motor connects lazily, so this never blocks"""
+        if self.client is None:
+            self.client = AsyncIOMotorClient(
+                self.settings.MONGODB_URL,
+                event_listeners=[MONGO_COMMAND_LISTENER, MONGO_COMMAND_TRACER],
+                serverSelectionTimeoutMS=self.settings.DATABASE_CONNECTION_TIMEOUT * 1000
+            )
+            self.database = self.client[self.settings.DATABASE_NAME]
+    
     async def connect(self):
         try:
-            self.client = AsyncIOMotorClient(self.settings.MONGODB_URL)
-            self.database = self.client[self.settings.DATABASE_NAME]
-            await self.client.admin.command('ping')
+            self.open()
+            await self.ping()
             await self._create_indexes()
             logger.info("Connected to MongoDB successfully")
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {str(e)}")
             raise
     
+    async def ping(self) -> bool:
+        await self.client.admin.command('ping')
+        return True
+    
     async def close(self):
         if self.client:
             self.client.close()
+            self.client = None
+            self.database = None
             logger.info("Disconnected from MongoDB")
     
     async def _create_indexes(self):
         try:
             await self.database.users.create_index("email", unique=True)
             await self.database.users.create_index("created_at")
-            await self.database.recipes.create_index("user_id")
-            await self.database.recipes.create_index("created_at")
             await self.database.recipe_history.create_index("user_id")
             await self.database.recipe_history.create_index("created_at")
             await self.database.recipe_history.create_index([("user_id", 1), ("created_at", -1)])
+            await self.database.favorites.create_index([("user_id", 1), ("recipe_id", 1)])
+            await self.database.recipes.create_index([("created_at", 1), ("_id", 1)])
+            await self.database.recipes.create_index("minhash_bands", sparse=True)
+            # Changing IDEMPOTENCY_KEY_TTL later needs a collMod on this index
+            await self.database.idempotency_keys.create_index(
+                "created_at", expireAfterSeconds=self.settings.IDEMPOTENCY_KEY_TTL
+            )
+            await self.database.recipe_cache.create_index(
+                "created_at", expireAfterSeconds=self.settings.RECIPE_CACHE_TTL
+            )
             logger.info("Database indexes created successfully")
         except Exception as e:
             logger.error(f"Error creating indexes: {str(e)}")
     
+    # Per-user version counters behind the ETags of the read endpoints. Writers
+    # bump after their write lands, so a tag can lag its payload but never
+    # get ahead of it.
+    
+    async def get_user_versions(self, user_id: str) -> Dict[str, int]:
+        doc = await self.database.user_versions.find_one({"_id": user_id})
+        versions = {field: 0 for field in USER_VERSION_FIELDS}
+        if doc:
+            versions.update({field: doc.get(field, 0) for field in USER_VERSION_FIELDS})
+        return versions
+    
+    async def bump_user_version(self, user_id: str, *fields: str):
+        await self.database.user_versions.update_one(
+            {"_id": user_id},
+            {"$inc": {field: 1 for field in fields}},
+            upsert=True
+        )
+    
+    # Idempotency keys: one document per (user, key), claimed before the work
+    # runs and completed with the response; the TTL index expires them.
+    
+    async def claim_idempotency_key(self, user_id: str, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """None when this caller now owns the key, else the existing record"""
+        doc_id = f"{user_id}:{key}"
+        now = datetime.utcnow()
+        try:
+            await self.database.idempotency_keys.insert_one({
+                "_id": doc_id,
+                "user_id": user_id,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "created_at": now
+            })
+            return None
+        except DuplicateKeyError:
+            existing = await self.database.idempotency_keys.find_one({"_id": doc_id})
+        
+        if existing is None:
+            # Expired between the insert and the read
+            return await self.claim_idempotency_key(user_id, key, fingerprint)
+        
+        # A claim whose worker died mid-request is taken over once it is stale
+        stale_before = now - timedelta(seconds=self.settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        if existing["status"] == "in_progress" and existing["created_at"] < stale_before:
+            result = await self.database.idempotency_keys.update_one(
+                {"_id": doc_id, "status": "in_progress", "created_at": existing["created_at"]},
+                {"$set": {"fingerprint": fingerprint, "created_at": now}}
+            )
+            if result.modified_count:
+                return None
+        return existing
+    
+    async def complete_idempotency_key(self, user_id: str, key: str, response: Dict[str, Any], history_id: Optional[str] = None):
+        await self.database.idempotency_keys.update_one(
+            {"_id": f"{user_id}:{key}"},
+            {"$set": {"status": "completed", "response": response, "history_id": history_id}}
+        )
+    
+    async def release_idempotency_key(self, user_id: str, key: str):
+        """Forget a claim whose work failed, so a retry runs it again"""
+        await self.database.idempotency_keys.delete_one({"_id": f"{user_id}:{key}", "status": "in_progress"})
+    
+    @traced()
     async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             user_data["created_at"] = datetime.utcnow()
@@ -60,6 +152,7 @@ async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
             logger.error(f"Error creating user: {str(e)}")
             raise
     
+    @traced()
     async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         try:
             return await self.database.users.find_one({"email": email, "is_active": True})
@@ -67,6 +160,7 @@ async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
             logger.error(f"Error getting user by email: {str(e)}")
             raise
     
+    @traced()
     async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         try:
             return await self.database.users.find_one({"_id": ObjectId(user_id), "is_active": True})
@@ -74,24 +168,278 @@ async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
             logger.error(f"Error getting user by ID: {str(e)}")
             raise
     
+    @traced()
+    async def save_recipe(self, recipe: Dict[str, Any]) -> str:
+        """Store a recipe once in the content-addressed recipes collection; returns its hash"""
+        content_hash = recipe_content_hash(recipe)
+        fields = {"recipe": recipe_content(recipe), "created_at": datetime.utcnow()}
+        if self.settings.ENABLE_NEAR_DUPLICATE_DETECTION:
+            # LSH band keys keep the near-duplicate index current as recipes are written.
+            # Imported here: minhash needs numpy, which importing main should not load
+            from app.utils.minhash import get_minhasher, minhash_fields
+            fields.update(minhash_fields(recipe, get_minhasher(self.settings.MINHASH_PERMUTATIONS, self.settings.MINHASH_BANDS)))
+        try:
+            await self.database.recipes.update_one(
+                {"_id": content_hash},
+                {"$setOnInsert": fields},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent upsert of the same content won the race
+            pass
+        return content_hash
+    
+    async def find_minhash_candidates(self, band_keys: List[int], params: List[int], limit: int) -> List[Dict[str, Any]]:
+        """Stored recipes sharing at least one LSH band key, with their signatures"""
+        cursor = self.database.recipes.find(
+            {"minhash_bands": {"$in": band_keys}, "minhash_params": params}, {"minhash": 1, "created_at": 1}
+        ).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    async def save_minhashes(self, updates: List[Dict[str, Any]]):
+        """Set signature fields on stored recipes; each update is {"_id": hash, **minhash fields}"""
+        if updates:
+            await self.database.recipes.bulk_write(
+                [UpdateOne({"_id": doc["_id"]}, {"$set": {k: v for k, v in doc.items() if k != "_id"}}) for doc in updates],
+                ordered=False
+            )
+    
+    async def user_has_recipes(self, user_id: str, content_hashes: List[str]) -> bool:
+        if not content_hashes:
+            return False
+        entry = await self.database.recipe_history.find_one(
+            {"user_id": user_id, "recipe_hash": {"$in": content_hashes}}, {"_id": 1}
+        )
+        return entry is not None
+    
+    async def mark_near_duplicates(self, matches: Dict[str, Dict[str, Any]], merge: bool) -> int:
+        """
+        Flag history entries whose recipe has a near-duplicate, given
+        {recipe hash: {"recipe_hash": kept hash, "similarity": s}}. With
+        `merge` the entries are repointed at the kept recipe, but only for
+        users whose history already has it; a near-duplicate can still differ
+        in an allergen, so nobody is handed another user's recipe. Returns
+        the number of entries changed.
+        """
+        if not matches:
+            return 0
+        user_ids = await self.database.recipe_history.distinct("user_id", {"recipe_hash": {"$in": list(matches)}})
+        owners: Dict[str, List[str]] = {}
+        if merge:
+            # Who already has each kept recipe; only their entries may be repointed at it
+            cursor = self.database.recipe_history.aggregate([
+                {"$match": {"recipe_hash": {"$in": list({match["recipe_hash"] for match in matches.values()})}}},
+                {"$group": {"_id": "$recipe_hash", "users": {"$addToSet": "$user_id"}}}
+            ])
+            owners = {doc["_id"]: doc["users"] for doc in await cursor.to_list(length=None)}
+        ops = []
+        for content_hash, match in matches.items():
+            users = owners.get(match["recipe_hash"], [])
+            if users:
+                ops.append(UpdateMany(
+                    {"recipe_hash": content_hash, "user_id": {"$in": users}},
+                    {"$set": {"near_duplicate_of": match, "recipe_hash": match["recipe_hash"]}}
+                ))
+            ops.append(UpdateMany(
+                {"recipe_hash": content_hash, "user_id": {"$nin": users}}, {"$set": {"near_duplicate_of": match}}
+            ))
+        result = await self.database.recipe_history.bulk_write(ops, ordered=False)
+        for user_id in user_ids:
+            await self.bump_user_version(user_id, "history")
+        return result.modified_count
+    
+    async def get_recipe(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        doc = await self.database.recipes.find_one({"_id": content_hash}, {"recipe": 1})
+        return doc["recipe"] if doc else None
+    
+    async def get_recipes(self, content_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        cursor = self.database.recipes.find({"_id": {"$in": content_hashes}}, {"recipe": 1})
+        return {doc["_id"]: doc["recipe"] for doc in await cursor.to_list(length=len(content_hashes))}
+    
+    async def get_recipes_since(
+        self, since: Optional[datetime], limit: int, after_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Stored recipes in (created_at, _id) order, from `since` inclusive, or
+        strictly after (since, after_id) when a tie-break id is given
+        """
+        if since is None:
+            query = {}
+        elif after_id is None:
+            query = {"created_at": {"$gte": since}}
+        else:
+            query = {"$or": [{"created_at": {"$gt": since}}, {"created_at": since, "_id": {"$gt": after_id}}]}
+        cursor = self.database.recipes.find(query, {"recipe": 1, "created_at": 1}).sort(
+            [("created_at", 1), ("_id", 1)]
+        ).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    async def iter_recipes_since(self, since: Optional[datetime], batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Batches of stored recipes from `since` (inclusive) on. Pages are keyed
+        on (created_at, _id), so recipes sharing a timestamp are never skipped
+        or repeated at a batch boundary, however many there are.
+        """
+        after_id = None
+        while True:
+            batch = await self.get_recipes_since(since, batch_size, after_id)
+            if batch:
+                yield batch
+            last = batch[-1] if batch else None
+            if len(batch) < batch_size or last.get("created_at") is None:
+                return
+            since, after_id = last["created_at"], last["_id"]
+    
+    # Recipe cache: generation inputs key -> a stored recipe. Each entry is
+    # served at most once per user, so asking again still gets a new recipe.
+    
+    @traced()
+    async def take_cached_recipe(self, key: str, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.database.recipe_cache.find_one_and_update(
+            {"_id": key, "served_to": {"$ne": user_id}},
+            {"$addToSet": {"served_to": user_id}},
+            projection={"recipe_hash": 1, "source": 1}
+        )
+    
+    async def put_cached_recipe(self, key: str, recipe_hash: str, source: str, served_to: List[str]):
+        await self.database.recipe_cache.update_one(
+            {"_id": key},
+            {"$set": {
+                "recipe_hash": recipe_hash,
+                "source": source,
+                "served_to": served_to,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+    
+    async def delete_cached_recipe(self, key: str, recipe_hash: str):
+        """Drop the entry, unless it has since been replaced by another recipe"""
+        await self.database.recipe_cache.delete_one({"_id": key, "recipe_hash": recipe_hash})
+    
+    async def mark_cached_recipe_served(self, key: str, user_id: str):
+        await self.database.recipe_cache.update_one({"_id": key}, {"$addToSet": {"served_to": user_id}})
+    
+    async def has_cached_recipe(self, key: str, user_id: str) -> bool:
+        doc = await self.database.recipe_cache.find_one(
+            {"_id": key, "served_to": {"$ne": user_id}}, {"_id": 1}
+        )
+        return doc is not None
+    
+    async def get_active_user_ids(self, since: datetime, limit: int) -> List[str]:
+        """Users who generated recipes since `since`, most active first"""
+        pipeline = [
+            {"$match": {"created_at": {"$gte": since}}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": limit}
+        ]
+        cursor = self.database.recipe_history.aggregate(pipeline)
+        return [doc["_id"] for doc in await cursor.to_list(length=limit)]
+    
+    async def get_recent_generation_inputs(self, user_id: str, since: datetime, limit: int = 100) -> List[Dict[str, Any]]:
+        cursor = self.database.recipe_history.find(
+            {"user_id": user_id, "created_at": {"$gte": since}},
+            {"ingredients_used": 1, "mood": 1}
+        ).sort("created_at", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    @traced()
     async def save_recipe_history(self, history_data: Dict[str, Any]) -> str:
+        """Save a history entry; an embedded recipe is moved to the recipes collection and referenced by hash"""
         try:
+            if "recipe" in history_data:
+                history_data = dict(history_data)
+                history_data["recipe_hash"] = await self.save_recipe(history_data.pop("recipe"))
             result = await self.database.recipe_history.insert_one(history_data)
+            await self.bump_user_version(history_data["user_id"], "history")
             return str(result.inserted_id)
         except Exception as e:
             logger.error(f"Error saving recipe history: {str(e)}")
             raise
     
+    @traced()
+    async def delete_history_entry(self, user_id: str, history_id: str) -> bool:
+        try:
+            result = await self.database.recipe_history.delete_one({"_id": ObjectId(history_id), "user_id": user_id})
+            if result.deleted_count:
+                await self.bump_user_version(user_id, "history")
+            return result.deleted_count > 0
+        except Exception as e:
+            logger.error(f"Error deleting history entry: {str(e)}")
+            raise
+    
+    @traced()
+    async def hydrate_history(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach the referenced recipe to each history entry with a single $in lookup"""
+        hashes = list({entry["recipe_hash"] for entry in entries if "recipe_hash" in entry})
+        if not hashes:
+            return entries
+        
+        cursor = self.database.recipes.find({"_id": {"$in": hashes}}, {"recipe": 1})
+        recipes = {doc["_id"]: doc["recipe"] for doc in await cursor.to_list(length=len(hashes))}
+        
+        for entry in entries:
+            content = recipes.get(entry.get("recipe_hash"))
+            if content is not None and "recipe" not in entry:
+                entry["recipe"] = {**content, "generated_at": entry.get("created_at")}
+        return entries
+    
+    @traced()
     async def get_recipe_history(self, user_id: str, limit: int = 10, skip: int = 0) -> List[Dict[str, Any]]:
         try:
             cursor = self.database.recipe_history.find(
                 {"user_id": user_id}
             ).sort("created_at", -1).skip(skip).limit(limit)
-            return await cursor.to_list(length=limit)
+            return await self.hydrate_history(await cursor.to_list(length=limit))
         except Exception as e:
             logger.error(f"Error getting recipe history: {str(e)}")
             raise
     
+    @traced()
+    async def get_history_entry(self, user_id: str, history_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            entry = await self.database.recipe_history.find_one({"_id": ObjectId(history_id), "user_id": user_id})
+            if entry is None:
+                return None
+            return (await self.hydrate_history([entry]))[0]
+        except Exception as e:
+            logger.error(f"Error getting history entry: {str(e)}")
+            raise
+    
+    async def iter_user_history(
+        self, user_id: str, batch_size: int, with_favorites: bool = False
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        A user's whole history, newest first, in hydrated batches off one
+        cursor. The next batch is only fetched once the caller asks for it,
+        so a slow consumer holds one batch in memory, never the history.
+        With `with_favorites` each entry gets a `favorite` flag from one $in
+        lookup per batch.
+        """
+        cursor = self.database.recipe_history.find({"user_id": user_id}).sort("created_at", -1).batch_size(batch_size)
+        batch: List[Dict[str, Any]] = []
+        async for entry in cursor:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield await self._hydrate_export_batch(user_id, batch, with_favorites)
+                batch = []
+        if batch:
+            yield await self._hydrate_export_batch(user_id, batch, with_favorites)
+    
+    async def _hydrate_export_batch(
+        self, user_id: str, batch: List[Dict[str, Any]], with_favorites: bool
+    ) -> List[Dict[str, Any]]:
+        await self.hydrate_history(batch)
+        if with_favorites:
+            ids = [str(entry["_id"]) for entry in batch]
+            cursor = self.database.favorites.find({"user_id": user_id, "recipe_id": {"$in": ids}}, {"recipe_id": 1})
+            favorites = {doc["recipe_id"] for doc in await cursor.to_list(length=len(ids))}
+            for entry in batch:
+                entry["favorite"] = str(entry["_id"]) in favorites
+        return batch
+    
+    @traced()
     async def update_user_profile(self, user_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             update_data["updated_at"] = datetime.utcnow()
@@ -100,11 +448,13 @@ async def update_user_profile(self, user_id: str, update_data: Dict[str, Any]) -
                 {"$set": update_data},
                 return_document=True
             )
+            await self.bump_user_version(user_id, "profile")
             return result
         except Exception as e:
             logger.error(f"Error updating user profile: {str(e)}")
             raise
     
+    @traced()
     async def toggle_favorite_recipe(self, user_id: str, recipe_id: str) -> bool:
         try:
             existing_favorite = await self.database.favorites.find_one(
@@ -114,6 +464,7 @@ async def toggle_favorite_recipe(self, user_id: str, recipe_id: str) -> bool:
                 await self.database.favorites.delete_one(
                     {"user_id": user_id, "recipe_id": recipe_id}
                 )
+                await self.bump_user_version(user_id, "favorites")
                 return False
             else:
                 await self.database.favorites.insert_one({
@@ -121,11 +472,13 @@ async def toggle_favorite_recipe(self, user_id: str, recipe_id: str) -> bool:
                     "recipe_id": recipe_id,
                     "created_at": datetime.utcnow()
                 })
+                await self.bump_user_version(user_id, "favorites")
                 return True
         except Exception as e:
             logger.error(f"Error toggling favorite recipe: {str(e)}")
             raise
     
+    @traced()
     async def get_favorite_recipes(self, user_id: str) -> List[Dict[str, Any]]:
         try:
             favorite_cursor = self.database.favorites.find({"user_id": user_id})
@@ -139,14 +492,17 @@ async def get_favorite_recipes(self, user_id: str) -> List[Dict[str, Any]]:
             logger.error(f"Error getting favorite recipes: {str(e)}")
             raise
     
+    @traced()
     async def save_mood_log(self, mood_data: Dict[str, Any]) -> str:
         try:
             result = await self.database.mood_logs.insert_one(mood_data)
+            await self.bump_user_version(mood_data["user_id"], "mood")
             return str(result.inserted_id)
         except Exception as e:
             logger.error(f"Error saving mood log: {str(e)}")
             raise
     
+    @traced()
     async def get_mood_trends(self, user_id: str, days: int = 30) -> List[Dict[str, Any]]:
         try:
             start_date = datetime.utcnow() - timedelta(days=days)
@@ -177,6 +533,7 @@ async def get_mood_trends(self, user_id: str, days: int = 30) -> List[Dict[str,
             logger.error(f"Error getting mood trends: {str(e)}")
             raise
     
+    @traced()
     async def get_ingredient_usage_stats(self, user_id: str) -> List[Dict[str, Any]]:
         try:
             pipeline = [
@@ -204,9 +561,106 @@ async def get_ingredient_usage_stats(self, user_id: str) -> List[Dict[str, Any]]
         except Exception as e:
             logger.error(f"Error getting ingredient usage stats: {str(e)}")
             raise
+    
+    # Batch jobs. A job runs on one worker at a time under a lease, and at
+    # most once per interval across all workers.
+    
+    async def claim_job(self, name: str, lease_seconds: int, interval: int) -> bool:
+        """True when this worker now holds the lease for `name`"""
+        now = datetime.utcnow()
+        try:
+            result = await self.database.jobs.update_one(
+                {
+                    "_id": name,
+                    "lease_until": {"$lt": now},
+                    "finished_at": {"$lt": now - timedelta(seconds=interval)}
+                },
+                {
+                    "$set": {"lease_until": now + timedelta(seconds=lease_seconds), "started_at": now},
+                    "$setOnInsert": {"finished_at": datetime(1970, 1, 1)}
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Leased elsewhere, or ran too recently
+            return False
+        return bool(result.modified_count or result.upserted_id)
+    
+    async def finish_job(self, name: str, stats: Dict[str, Any]):
+        now = datetime.utcnow()
+        await self.database.jobs.update_one(
+            {"_id": name}, {"$set": {"lease_until": now, "finished_at": now, "stats": stats}}
+        )
+    
+    async def save_job_progress(self, name: str, progress: Dict[str, Any]):
+        """Persist state a job carries across passes and workers, without touching its lease"""
+        await self.database.jobs.update_one({"_id": name}, {"$set": {"progress": progress}})
+    
+    async def release_job(self, name: str):
+        """Give the lease up without counting a run, so the next poll retries"""
+        await self.database.jobs.update_one({"_id": name}, {"$set": {"lease_until": datetime.utcnow()}})
+    
+    async def get_job(self, name: str) -> Optional[Dict[str, Any]]:
+        return await self.database.jobs.find_one({"_id": name})
+    
+    async def iter_batches(
+        self,
+        collection: str,
+        projection: Dict[str, Any],
+        batch_size: int,
+        query: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream a whole collection in _id order, one bounded batch per round trip"""
+        last_id = None
+        while True:
+            batch_query = dict(query or {})
+            if last_id is not None:
+                batch_query["_id"] = {"$gt": last_id}
+            cursor = self.database[collection].find(batch_query, projection).sort("_id", 1).limit(batch_size)
+            batch = await cursor.to_list(length=batch_size)
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1]["_id"]
+    
+    async def save_recommendations(self, recommendations: List[Dict[str, Any]]):
+        """Upsert precomputed recommendation documents, keyed by user id"""
+        if recommendations:
+            await self.database.user_recommendations.bulk_write(
+                [UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True) for doc in recommendations],
+                ordered=False
+            )
+    
+    async def delete_recommendations_before(self, generated_at: datetime) -> int:
+        """Drop recommendations an earlier run wrote for users the latest run no longer covers"""
+        result = await self.database.user_recommendations.delete_many({"generated_at": {"$lt": generated_at}})
+        return result.deleted_count
+    
+    async def get_recommendations(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.database.user_recommendations.find_one({"_id": user_id})
+    
+    async def save_analytics_snapshot(self, name: str, snapshot: Dict[str, Any]):
+        await self.database.analytics_snapshots.replace_one({"_id": name}, {"_id": name, **snapshot}, upsert=True)
+    
+    async def get_analytics_snapshot(self, name: str) -> Optional[Dict[str, Any]]:
+        return await self.database.analytics_snapshots.find_one({"_id": name})
+
+_shared_db: Optional[MongoDB] = None
+
+def get_shared_database() -> MongoDB:
+    """The process-wide MongoDB instance; its client pools connections for every request"""
+    global _shared_db
+    if _shared_db is None:
+        _shared_db = MongoDB()
+        _shared_db.open()
+    return _shared_db
+
+async def close_shared_database():
+    global _shared_db
+    if _shared_db is not None:
+        await _shared_db.close()
+        _shared_db = None
 
 async def get_database() -> MongoDB:
-    db = MongoDB()
-    if not db.client:
-        await db.connect()
-    return db
\ No newline at end of file
+    return get_shared_database()
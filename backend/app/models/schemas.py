@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, PrivateAttr, validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -53,6 +53,12 @@ class NutritionInfo(BaseModel):
     fiber: float
     sugar: float
     sodium: float
+    # False when no ingredient line could be counted; the values are then zeros, not an estimate
+    available: bool = True
+
+    @classmethod
+    def unavailable(cls) -> "NutritionInfo":
+        return cls(calories=0, protein=0, carbs=0, fat=0, fiber=0, sugar=0, sodium=0, available=False)
 
 class UserCreate(BaseModel):
     name: str
@@ -102,6 +108,16 @@ class RecipeResponse(BaseModel):
     nutrition_info: NutritionInfo
     tags: List[str] = []
     generated_at: datetime = datetime.utcnow()
+    # Set on the placeholder served while the circuit is open; never serialized
+    _fallback: bool = PrivateAttr(default=False)
+
+    @validator('nutrition_info', pre=True)
+    def fill_missing_nutrition(cls, v):
+        # Recipes stored while the field could be null
+        return NutritionInfo.unavailable() if v is None else v
+
+# Upper bound for generated and locally scaled recipes
+MAX_SERVINGS = 24
 
 class RecipeRequest(BaseModel):
     ingredients: List[str]
@@ -115,6 +131,12 @@ def validate_ingredients(cls, v):
         if len(v) < 1:
             raise ValueError('At least one ingredient is required')
         return v
+    
+    @validator('servings')
+    def validate_servings(cls, v):
+        if v is not None and not 1 <= v <= MAX_SERVINGS:
+            raise ValueError(f'Servings must be between 1 and {MAX_SERVINGS}')
+        return v
 
 # NEW: Voice/Audio ingredient detection
 class VoiceIngredientRequest(BaseModel):
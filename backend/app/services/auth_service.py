@@ -10,6 +10,7 @@
 from app.database.mongodb import MongoDB
 from app.core.config import get_settings
 from app.utils.exceptions import CustomException
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +20,13 @@ def __init__(self):
         self.algorithm = "HS256"
         self.access_token_expire_minutes = 60 * 24  # 24 hours
     
+    @traced()
     def _hash_password(self, password: str) -> str:
         """Hash password using bcrypt"""
         salt = bcrypt.gensalt()
         return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
     
+    @traced()
     def _verify_password(self, password: str, hashed_password: str) -> bool:
         """Verify password against hash"""
         return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -76,6 +79,7 @@ def verify_token(self, token: str) -> str:
         except jwt.JWTError:
             raise CustomException(status_code=401, detail="Invalid token")
     
+    @traced()
     async def create_user(self, user_data: UserCreate, db: MongoDB) -> Dict[str, Any]:
         """Create a new user account"""
         try:
@@ -109,6 +113,7 @@ async def create_user(self, user_data: UserCreate, db: MongoDB) -> Dict[str, Any
             logger.error(f"Error creating user: {str(e)}")
             raise CustomException(status_code=500, detail="Failed to create user")
     
+    @traced()
     async def authenticate_user(self, credentials: UserLogin, db: MongoDB) -> Dict[str, Any]:
         """Authenticate user and return access token"""
         try:
@@ -1,13 +1,12 @@
-from google.cloud import vision
 import logging
 from typing import List, Dict, Any
 import asyncio
-from PIL import Image
 import io
 import os
 
 from app.core.config import get_settings
 from app.utils.exceptions import CustomException
+from app.utils.metrics import VISION_LATENCY, VISION_QUOTA_REMAINING, VISION_REQUESTS, observe_call
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +16,7 @@ def __init__(self):
         self.vision_client = None
         self.loaded = False
         self.monthly_usage_count = 0
+        VISION_QUOTA_REMAINING.set(self.settings.VISION_API_MONTHLY_LIMIT)
         
         # Comprehensive ingredient mapping database
         self.ingredient_categories = {
@@ -114,6 +114,9 @@ async def load_model(self):
             # Set credentials path as environment variable
             os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.settings.GOOGLE_VISION_CREDENTIALS_PATH
             
+            # Heavy SDK, only imported when the Vision API is actually configured
+            from google.cloud import vision
+            
             # Initialize Vision API client
             self.vision_client = vision.ImageAnnotatorClient()
             
@@ -155,6 +158,7 @@ async def detect_ingredients(self, image_data: bytes) -> List[str]:
                 
                 if ingredients:
                     self.monthly_usage_count += 1
+                    VISION_QUOTA_REMAINING.set(self.settings.VISION_API_MONTHLY_LIMIT - self.monthly_usage_count)
                     logger.info(f"Vision API usage: {self.monthly_usage_count}/{self.settings.VISION_API_MONTHLY_LIMIT}")
                     logger.info(f"Detected ingredients: {ingredients}")
                     return ingredients
@@ -174,6 +178,8 @@ async def detect_ingredients(self, image_data: bytes) -> List[str]:
     async def _detect_with_vision_api(self, image_data: bytes) -> List[str]:
         """Detect ingredients using Google Cloud Vision API"""
         try:
+            from google.cloud import vision
+            
             # Prepare image for Vision API
             image = vision.Image(content=image_data)
             
@@ -181,7 +187,8 @@ async def _detect_with_vision_api(self, image_data: bytes) -> List[str]:
             
             # Perform label detection (costs 1 unit)
             logger.info("Performing label detection...")
-            label_response = self.vision_client.label_detection(image=image)
+            with observe_call(VISION_REQUESTS, VISION_LATENCY, ("label_detection",)):
+                label_response = self.vision_client.label_detection(image=image)
             
             if label_response.error.message:
                 raise Exception(f"Vision API error: {label_response.error.message}")
@@ -201,7 +208,8 @@ async def _detect_with_vision_api(self, image_data: bytes) -> List[str]:
             if len(detected_ingredients) < 3 and self.monthly_usage_count < (self.settings.VISION_API_MONTHLY_LIMIT - 5):
                 logger.info("Performing object localization...")
                 try:
-                    object_response = self.vision_client.object_localization(image=image)
+                    with observe_call(VISION_REQUESTS, VISION_LATENCY, ("object_localization",)):
+                        object_response = self.vision_client.object_localization(image=image)
                     objects = object_response.localized_object_annotations
                     
                     for obj in objects:
@@ -271,6 +279,8 @@ async def _mock_ingredient_detection(self, image_data: bytes) -> List[str]:
         try:
             await asyncio.sleep(0.3)
             
+            from PIL import Image
+            
             # Analyze image to provide semi-realistic results
             image = Image.open(io.BytesIO(image_data))
             width, height = image.size
@@ -0,0 +1,347 @@
+#llm_backend.py
+from typing import List, Optional, Dict, Any, Union
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+
+from app.core.config import get_settings
+from app.utils.fair_scheduler import get_llm_scheduler
+from app.utils.metrics import LLM_IN_FLIGHT, LLM_LATENCY, LLM_REQUESTS, LLM_TOKENS, observe_call
+from app.utils.tracing import span
+from app.utils.resilience import LLMRateLimitError, LLMTimeoutError, LLMUnavailableError, classify_error
+
+logger = logging.getLogger(__name__)
+
+Contents = Union[str, List[Any]]
+
+class LLMResponse:
+    def __init__(self, text: Optional[str], prompt_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+class LLMBackend:
+    """Interface the AI services talk to; one instance per service"""
+
+    name = "base"
+
+    async def initialize(self) -> bool:
+        raise NotImplementedError
+
+    async def health_check(self) -> bool:
+        """Cheap re-check after initialize that the provider still accepts calls; raises with the reason if not"""
+        raise NotImplementedError
+
+    async def generate(self, contents: Contents, operation: str = "generate", **options) -> LLMResponse:
+        """
+        Run one model call in the current user's fair share of LLM slots;
+        `operation` only labels the call in /metrics
+        """
+        labels = (self.name, operation)
+        async with get_llm_scheduler().slot():
+            LLM_IN_FLIGHT.inc((self.name,))
+            try:
+                with span(f"llm.{operation}", backend=self.name), \
+                        observe_call(LLM_REQUESTS, LLM_LATENCY, labels, classify=lambda e: classify_error(e).value):
+                    response = await self._generate(contents, **options)
+            finally:
+                LLM_IN_FLIGHT.dec((self.name,))
+        LLM_TOKENS.inc(labels + ("prompt",), response.prompt_tokens)
+        LLM_TOKENS.inc(labels + ("output",), response.output_tokens)
+        return response
+
+    async def _generate(
+        self,
+        contents: Contents,
+        temperature: float = 0.7,
+        max_output_tokens: int = 2048,
+        top_p: Optional[float] = None,
+        top_k: Optional[int] = None,
+        response_mime_type: Optional[str] = None,
+        response_schema: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        raise NotImplementedError
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_names: List[str]):
+        self.settings = get_settings()
+        self.model_names = model_names
+        self.model = None
+        self.model_name: Optional[str] = None
+
+    async def _probe_model(self, model_name: str):
+        import google.generativeai as genai
+
+        loop = asyncio.get_event_loop()
+        try:
+            logger.info(f"Initializing model: {model_name}")
+            model = genai.GenerativeModel(model_name)
+            test_response = await loop.run_in_executor(
+                None,
+                lambda: model.generate_content(
+                    "Say OK", request_options={"timeout": self.settings.READINESS_PROBE_TIMEOUT}
+                )
+            )
+            if test_response and test_response.text:
+                return model
+        except Exception as e:
+            logger.warning(f"Model {model_name} failed: {e}")
+        return None
+
+    async def initialize(self) -> bool:
+        # google.generativeai costs most of a second to import, so only the real backend loads it
+        import google.generativeai as genai
+
+        genai.configure(api_key=self.settings.GEMINI_API_KEY)
+
+        # Probe every candidate at once, then take the first working one in preference order
+        models = await asyncio.gather(*(self._probe_model(name) for name in self.model_names))
+        for model_name, model in zip(self.model_names, models):
+            if model is not None:
+                self.model = model
+                self.model_name = model_name
+                logger.info(f"Model initialized: {model_name}")
+                return True
+        return False
+
+    async def health_check(self) -> bool:
+        # Counting tokens authenticates and resolves the model but spends no generation quota
+        if self.model is None:
+            return False
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: self.model.count_tokens("OK", request_options={"timeout": self.settings.READINESS_PROBE_TIMEOUT})
+        )
+        return True
+
+    async def _generate(
+        self,
+        contents: Contents,
+        temperature: float = 0.7,
+        max_output_tokens: int = 2048,
+        top_p: Optional[float] = None,
+        top_k: Optional[int] = None,
+        response_mime_type: Optional[str] = None,
+        response_schema: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        config = {"temperature": temperature, "max_output_tokens": max_output_tokens}
+        if top_p is not None:
+            config["top_p"] = top_p
+        if top_k is not None:
+            config["top_k"] = top_k
+        if response_mime_type:
+            config["response_mime_type"] = response_mime_type
+        if response_schema:
+            config["response_schema"] = response_schema
+        request_options = {"timeout": timeout} if timeout else None
+
+        loop = asyncio.get_event_loop()
+        try:
+            response = await loop.run_in_executor(
+                None,
+                lambda: self.model.generate_content(
+                    contents,
+                    generation_config=genai.types.GenerationConfig(**config),
+                    request_options=request_options
+                )
+            )
+        except (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests) as e:
+            raise LLMRateLimitError(str(e)) from e
+        except (google_exceptions.DeadlineExceeded, google_exceptions.GatewayTimeout) as e:
+            raise LLMTimeoutError(str(e)) from e
+        except (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError) as e:
+            raise LLMUnavailableError(str(e)) from e
+
+        try:
+            text = response.text if response else None
+        except ValueError:
+            # Blocked or empty candidates make the quick accessor raise
+            text = None
+
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            text=text,
+            prompt_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0
+        )
+
+class MockLLMBackend(LLMBackend):
+    """
+    Deterministic local stand-in for Gemini, enabled by MOCK_AI_RESPONSES.
+
+    Recipe prompts get realistic recipe JSON built from the prompt's ingredients,
+    extraction prompts get comma-separated ingredient lists. Latency, error and
+    malformed-output rates come from the MOCK_AI_* settings so throughput and
+    tail latency can be measured without network access.
+    """
+
+    name = "mock"
+
+    COMMON_INGREDIENTS = [
+        "tomato", "onion", "garlic", "chicken", "rice", "spinach", "egg",
+        "potato", "carrot", "bell pepper", "cheese", "pasta", "mushroom", "lentils"
+    ]
+    CUISINES = ["italian", "indian", "mexican", "thai", "mediterranean", "american", "chinese"]
+    QUANTITIES = ["500g", "2 medium", "200g", "1 cup", "3 cloves", "150g", "1 large"]
+
+    def __init__(self, settings=None):
+        self.settings = settings or get_settings()
+        # Fault injection and latency follow one seeded sequence, so a run is reproducible
+        self._rng = random.Random(self.settings.MOCK_AI_SEED)
+
+    async def initialize(self) -> bool:
+        logger.info(
+            f"Using mock LLM backend (latency {self.settings.MOCK_AI_LATENCY_DISTRIBUTION} "
+            f"~{self.settings.MOCK_AI_LATENCY_MS}ms, error rate {self.settings.MOCK_AI_ERROR_RATE}, "
+            f"malformed rate {self.settings.MOCK_AI_MALFORMED_RATE})"
+        )
+        return True
+
+    async def health_check(self) -> bool:
+        return True
+
+    def _latency(self) -> float:
+        median = self.settings.MOCK_AI_LATENCY_MS / 1000
+        spread = self.settings.MOCK_AI_LATENCY_SPREAD
+        distribution = self.settings.MOCK_AI_LATENCY_DISTRIBUTION
+        if distribution == "constant":
+            return median
+        if distribution == "uniform":
+            return max(0.0, self._rng.uniform(median * (1 - spread), median * (1 + spread)))
+        # Lognormal gives the long right tail real LLM latencies have
+        return self._rng.lognormvariate(0, spread) * median
+
+    def _maybe_fail(self):
+        if self._rng.random() >= self.settings.MOCK_AI_ERROR_RATE:
+            return
+        error = self._rng.choice([LLMRateLimitError, LLMTimeoutError, LLMUnavailableError])
+        raise error(f"Injected mock {error.__name__}")
+
+    async def _generate(
+        self,
+        contents: Contents,
+        temperature: float = 0.7,
+        max_output_tokens: int = 2048,
+        top_p: Optional[float] = None,
+        top_k: Optional[int] = None,
+        response_mime_type: Optional[str] = None,
+        response_schema: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        latency = self._latency()
+        malformed = self._rng.random() < self.settings.MOCK_AI_MALFORMED_RATE
+        if timeout and latency > timeout:
+            await asyncio.sleep(timeout)
+            raise LLMTimeoutError(f"Mock call exceeded {timeout}s")
+        await asyncio.sleep(latency)
+        self._maybe_fail()
+
+        if isinstance(contents, list):
+            prompt = next((part for part in contents if isinstance(part, str)), "")
+            blobs = [part.get("data", b"") for part in contents if isinstance(part, dict)]
+        else:
+            prompt, blobs = contents, []
+
+        if response_mime_type == "application/json" or "valid JSON" in prompt:
+            text = self._recipe_text(prompt, malformed)
+        elif blobs:
+            text = self._ingredients_from_audio(blobs[0])
+        else:
+            text = self._ingredients_from_text(prompt)
+
+        return LLMResponse(text=text, prompt_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+
+    def _seeded(self, *parts: Any) -> random.Random:
+        digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+        return random.Random(int(digest[:16], 16) ^ self.settings.MOCK_AI_SEED)
+
+    def _recipe_text(self, prompt: str, malformed: bool) -> str:
+        ingredients = re.findall(r"^- (?!Mood|Dietary|Allergies|Health|Cuisine|Servings)(.+)$", prompt, re.MULTILINE)
+        ingredients = [ing.strip() for ing in ingredients] or ["mixed vegetables"]
+        mood_match = re.search(r"- Mood: (\w+)", prompt)
+        mood = mood_match.group(1) if mood_match else "happy"
+        servings_match = re.search(r"- Servings: (\d+)", prompt)
+        servings = int(servings_match.group(1)) if servings_match else 2
+
+        rng = self._seeded(prompt)
+        cuisine = rng.choice(self.CUISINES)
+        prep_time = rng.choice([10, 15, 20])
+        cook_time = rng.choice([20, 25, 30, 40])
+        recipe = {
+            "title": f"{mood.title()} {cuisine.title()} {ingredients[0].title()} Skillet",
+            "description": f"A {cuisine} dish built around {', '.join(ingredients[:3])}.",
+            "ingredients": [f"{rng.choice(self.QUANTITIES)} {ing}" for ing in ingredients]
+                + ["1 tbsp olive oil", "1 tsp salt"],
+            "instructions": [
+                "Prepare and chop all the ingredients.",
+                "Heat the olive oil in a large pan over medium heat.",
+                f"Add the {ingredients[0]} and cook for {cook_time // 3} minutes.",
+                "Add the remaining ingredients and season with salt.",
+                f"Simmer for {cook_time - cook_time // 3} minutes, stirring occasionally.",
+                "Serve hot."
+            ],
+            "prep_time": prep_time,
+            "cook_time": cook_time,
+            "total_time": prep_time + cook_time,
+            "servings": servings,
+            "difficulty": rng.choice(["easy", "medium"]),
+            "cuisine_type": cuisine,
+            "tags": [mood, cuisine, "homemade"]
+        }
+        text = json.dumps(recipe, indent=2)
+        if not malformed:
+            return text
+
+        # The failure modes real model output shows
+        mutation = self._rng.choice(["fence", "prose", "trailing_comma", "missing_comma", "truncated", "garbage"])
+        if mutation == "fence":
+            return f"```json\n{text}\n```"
+        if mutation == "prose":
+            return f"Here is a delicious recipe for you!\n\n{text}\n\nEnjoy!"
+        if mutation == "trailing_comma":
+            return text.replace('"homemade"\n', '"homemade",\n')
+        if mutation == "missing_comma":
+            return text.replace('",\n    "', '"\n    "')
+        if mutation == "truncated":
+            return text[:int(len(text) * 0.8)]
+        return "I'm sorry, I can't help with that right now."
+
+    def _ingredients_from_text(self, prompt: str) -> str:
+        quoted = re.search(r'"(.+?)"', prompt, re.DOTALL)
+        source = quoted.group(1) if quoted else prompt
+        parts = re.split(r",|\band\b|\n", source.lower())
+        found = []
+        for part in parts:
+            part = re.sub(r"^\s*(?:i have|i've got|we have|there is|there are|also)\s+", "", part)
+            part = re.sub(r"^\s*(?:some|a few|a|an|the)\s+", "", part)
+            part = re.sub(r"^[\d\s./]*(?:g|kg|ml|cups?|tbsp|tsp)?\s+", "", part)
+            part = part.strip(" .")
+            if part.endswith("oes"):
+                part = part[:-2]
+            elif part.endswith("s") and not part.endswith("ss"):
+                part = part[:-1]
+            if part:
+                found.append(part)
+        return ", ".join(found) or "tomato, onion"
+
+    def _ingredients_from_audio(self, data: bytes) -> str:
+        rng = self._seeded(hashlib.sha256(data).hexdigest())
+        return ", ".join(rng.sample(self.COMMON_INGREDIENTS, rng.randint(3, 5)))
+
+def create_llm_backend(model_names: List[str]) -> LLMBackend:
+    """Pick the real Gemini backend or the local stand-in"""
+    settings = get_settings()
+    if settings.MOCK_AI_RESPONSES:
+        return MockLLMBackend(settings)
+    return GeminiBackend(model_names)
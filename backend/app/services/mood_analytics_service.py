@@ -0,0 +1,153 @@
+#mood_analytics_service.py
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from app.core.config import get_settings
+from app.database.mongodb import get_shared_database
+from app.utils.mood_priors import CUISINES, MOOD_INDEX, TIME_SLOTS, MOODS, MoodPriors, cuisine_index, time_slot
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "mood_analysis"
+SNAPSHOT_NAME = "mood_cuisine"
+
+# How often each worker checks for a due rebuild and reloads the snapshot
+POLL_SECONDS = 300
+
+class MoodAnalyticsService:
+    """
+    Cross-user mood x cuisine x time-of-day priors. A periodic job (one
+    worker at a time, under the job lease) streams recipe_history, recipes
+    and mood_logs into NumPy contingency tables and stores the counts as one
+    small snapshot document. Every worker keeps the latest snapshot in
+    memory, so using the priors never aggregates per request.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.priors = MoodPriors.empty()
+        self._task: Optional[asyncio.Task] = None
+        self.last_stats: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="mood-analysis")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+                await self.load()
+            except Exception as e:
+                logger.error(f"Mood analysis failed: {e}")
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def load(self) -> bool:
+        doc = await get_shared_database().get_analytics_snapshot(SNAPSHOT_NAME)
+        priors = MoodPriors.from_document(doc) if doc else None
+        if priors is None:
+            return False
+        self.priors = priors
+        return True
+
+    async def run_once(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Rebuild if no other worker holds the job and the snapshot is old enough; None when skipped"""
+        db = get_shared_database()
+        interval = 0 if force else self.settings.MOOD_ANALYSIS_INTERVAL
+        if not await db.claim_job(JOB_NAME, self.settings.MOOD_ANALYSIS_LEASE_SECONDS, interval):
+            return None
+        try:
+            stats = await self.build()
+        except Exception:
+            await db.release_job(JOB_NAME)
+            raise
+        await db.finish_job(JOB_NAME, stats)
+        self.last_stats = stats
+        return stats
+
+    async def build(self) -> Dict[str, Any]:
+        import numpy as np
+
+        start = time.perf_counter()
+        db = get_shared_database()
+        batch_size = self.settings.MOOD_ANALYSIS_BATCH_SIZE
+
+        recipe_cuisines: Dict[str, int] = {}
+        async for batch in db.iter_batches("recipes", {"recipe.cuisine_type": 1}, batch_size):
+            for doc in batch:
+                recipe_cuisines[doc["_id"]] = cuisine_index((doc.get("recipe") or {}).get("cuisine_type"))
+
+        moods, cuisines, slots = array("B"), array("B"), array("B")
+        projection = {"mood": 1, "recipe_hash": 1, "created_at": 1, "recipe.cuisine_type": 1}
+        async for batch in db.iter_batches("recipe_history", projection, batch_size):
+            for entry in batch:
+                mood, created_at = MOOD_INDEX.get(entry.get("mood")), entry.get("created_at")
+                if mood is None or not isinstance(created_at, datetime):
+                    continue
+                cuisine = recipe_cuisines.get(entry.get("recipe_hash"))
+                if cuisine is None:
+                    if "recipe" not in entry:
+                        continue
+                    # Entry still embeds its recipe
+                    cuisine = cuisine_index(entry["recipe"].get("cuisine_type"))
+                moods.append(mood)
+                cuisines.append(cuisine)
+                slots.append(time_slot(created_at))
+
+        log_moods, log_slots = array("B"), array("B")
+        async for batch in db.iter_batches("mood_logs", {"mood": 1, "timestamp": 1}, batch_size):
+            for log in batch:
+                mood, timestamp = MOOD_INDEX.get(log.get("mood")), log.get("timestamp")
+                if mood is not None and isinstance(timestamp, datetime):
+                    log_moods.append(mood)
+                    log_slots.append(time_slot(timestamp))
+
+        shape = (len(MOODS), len(CUISINES), len(TIME_SLOTS))
+        cells = (np.frombuffer(moods, np.uint8).astype(np.int64) * shape[1]
+                 + np.frombuffer(cuisines, np.uint8)) * shape[2] + np.frombuffer(slots, np.uint8)
+        counts = np.bincount(cells, minlength=np.prod(shape)).reshape(shape)
+        log_cells = np.frombuffer(log_moods, np.uint8).astype(np.int64) * shape[2] + np.frombuffer(log_slots, np.uint8)
+        mood_slots = np.bincount(log_cells, minlength=shape[0] * shape[2]).reshape(shape[0], shape[2])
+
+        priors = MoodPriors(counts, mood_slots, datetime.utcnow())
+        await db.save_analytics_snapshot(SNAPSHOT_NAME, priors.to_document())
+        self.priors = priors
+
+        stats = {
+            "recipes": len(moods),
+            "mood_logs": len(log_moods),
+            "mood_cuisine_association": round(priors.association, 4),
+            "seconds": round(time.perf_counter() - start, 2)
+        }
+        logger.info(f"Mood analysis built: {stats}")
+        return stats
+
+    def cuisine_hint(self, mood: str, when: Optional[datetime] = None) -> List[str]:
+        """Cuisines this mood leans towards at this time of day; empty when the data is too thin"""
+        if not self.settings.ENABLE_MOOD_ANALYSIS:
+            return []
+        return self.priors.top_cuisines(
+            mood,
+            when or datetime.utcnow(),
+            k=self.settings.MOOD_PRIOR_TOP_CUISINES,
+            min_support=self.settings.MOOD_PRIOR_MIN_SUPPORT,
+            min_lift=self.settings.MOOD_PRIOR_MIN_LIFT
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.settings.ENABLE_MOOD_ANALYSIS,
+            "running": self._task is not None,
+            "generated_at": self.priors.generated_at.isoformat() if self.priors.generated_at else None,
+            "last_build": self.last_stats
+        }
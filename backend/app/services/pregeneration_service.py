@@ -0,0 +1,194 @@
+#pregeneration_service.py
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from app.core.config import get_settings
+from app.database.mongodb import get_shared_database
+from app.models.schemas import MoodEnum
+from app.utils.fair_scheduler import get_llm_scheduler, set_scheduling_key
+from app.utils.metrics import PREGENERATED_RECIPES
+
+logger = logging.getLogger(__name__)
+
+Combination = Tuple[Tuple[str, ...], str]
+
+JOB_NAME = "recipe_pregeneration"
+
+# Tokens assumed per recipe until real generations have been measured
+DEFAULT_TOKENS_PER_RECIPE = 1500
+
+class PregenerationService:
+    """
+    Fills the recipe cache during a daily off-peak window with recipes for
+    each active user's most likely (ingredient set, mood) requests, within a
+    per-window token budget. Runs at a low fair-scheduling weight and only
+    while the LLM slots are mostly idle, so live requests always come first.
+    One worker at a time runs a pass (job lease); the window's token spend
+    is kept on the job document, so the budget holds across workers.
+    """
+
+    def __init__(self, recipe_service):
+        self.settings = get_settings()
+        self.recipe_service = recipe_service
+        self._task: Optional[asyncio.Task] = None
+        self.window: Optional[str] = None
+        self.tokens_used = 0
+        self.stats = {"generated": 0, "already_cached": 0, "failed": 0}
+        self.last_run: Optional[datetime] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="recipe-pregeneration")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def in_window(self, now: Optional[datetime] = None) -> bool:
+        hour = (now or datetime.utcnow()).hour
+        start, end = self.settings.PREGENERATION_WINDOW_START_HOUR, self.settings.PREGENERATION_WINDOW_END_HOUR
+        # A window like 22-4 wraps past midnight
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def _window_id(self, now: datetime) -> str:
+        """Date the current window opened on; the token budget resets per window"""
+        wraps = self.settings.PREGENERATION_WINDOW_START_HOUR > self.settings.PREGENERATION_WINDOW_END_HOUR
+        if wraps and now.hour < self.settings.PREGENERATION_WINDOW_END_HOUR:
+            now -= timedelta(days=1)
+        return now.date().isoformat()
+    
+    def llm_idle(self) -> bool:
+        scheduler = get_llm_scheduler()
+        return scheduler.in_flight <= scheduler.capacity // 4 and not any(
+            user.queued for user in scheduler.active_users()
+        )
+
+    def budget_left(self) -> int:
+        return self.settings.PREGENERATION_TOKEN_BUDGET - self.tokens_used
+
+    def _tokens_per_recipe(self) -> float:
+        stats = self.recipe_service.get_generation_stats()
+        if not stats["recipes"]:
+            return DEFAULT_TOKENS_PER_RECIPE
+        return stats["avg_prompt_tokens_per_recipe"] + stats["avg_output_tokens_per_recipe"]
+
+    async def _run(self):
+        # Runs in its own task, so this only tags the speculative LLM calls
+        set_scheduling_key("pregeneration", self.settings.PREGENERATION_WEIGHT)
+        while True:
+            await asyncio.sleep(self.settings.PREGENERATION_INTERVAL)
+            if not self.in_window():
+                continue
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Recipe pre-generation pass failed: {e}")
+
+    async def run_once(self) -> bool:
+        """One pass, if no other worker holds the job and the last pass is old enough; False when skipped"""
+        db = get_shared_database()
+        if not await db.claim_job(JOB_NAME, self.settings.PREGENERATION_LEASE_SECONDS, self.settings.PREGENERATION_INTERVAL):
+            return False
+        try:
+            await self._pass(db)
+        except Exception:
+            await db.release_job(JOB_NAME)
+            raise
+        await db.finish_job(JOB_NAME, dict(self.stats))
+        return True
+
+    async def _pass(self, db):
+        """Over the active users; stops at the budget or when traffic picks up"""
+        now = datetime.utcnow()
+        self.window = self._window_id(now)
+        progress = (await db.get_job(JOB_NAME) or {}).get("progress") or {}
+        # Another worker may have spent part of this window's budget
+        self.tokens_used = progress.get("tokens_used", 0) if progress.get("window") == self.window else 0
+        self.last_run = now
+
+        since = now - timedelta(days=self.settings.PREGENERATION_ACTIVE_DAYS)
+        for user_id in await db.get_active_user_ids(since, self.settings.PREGENERATION_MAX_USERS):
+            user = await db.get_user_by_id(user_id)
+            if not user:
+                continue
+            for ingredients, mood in await self.likely_requests(user_id, since):
+                if not self._may_continue():
+                    return
+                try:
+                    tokens = await self.recipe_service.pregenerate(
+                        user_id,
+                        list(ingredients),
+                        MoodEnum(mood),
+                        dietary_preferences=user.get("dietary_preferences", []),
+                        allergies=user.get("allergies", []),
+                        health_goals=user.get("health_goals", [])
+                    )
+                except Exception as e:
+                    tokens = None
+                    logger.warning(f"Pre-generation for user {user_id} failed: {e}")
+
+                if tokens is None:
+                    self.stats["failed"] += 1
+                    PREGENERATED_RECIPES.inc(("failed",))
+                elif tokens == 0:
+                    self.stats["already_cached"] += 1
+                else:
+                    self.tokens_used += tokens
+                    self.stats["generated"] += 1
+                    PREGENERATED_RECIPES.inc(("generated",))
+                    await db.save_job_progress(JOB_NAME, {"window": self.window, "tokens_used": self.tokens_used})
+
+    def _may_continue(self) -> bool:
+        if self.budget_left() < self._tokens_per_recipe():
+            logger.info(f"Pre-generation budget spent ({self.tokens_used} tokens)")
+            return False
+        if not self.llm_idle():
+            logger.info("Pre-generation paused: live traffic picked up")
+            return False
+        if self.recipe_service.get_circuit_state()["state"] != "closed":
+            return False
+        return True
+
+    async def likely_requests(self, user_id: str, since: datetime) -> List[Combination]:
+        """
+        The user's most frequent (ingredient set, mood) pairs from recent
+        history, plus their staple ingredients paired with their dominant mood
+        from the usage and mood aggregates.
+        """
+        db = get_shared_database()
+        counts: Counter = Counter()
+        for entry in await db.get_recent_generation_inputs(user_id, since):
+            ingredients = tuple(sorted({i.strip().lower() for i in entry.get("ingredients_used") or [] if i}))
+            if ingredients and entry.get("mood") in MoodEnum._value2member_map_:
+                counts[(ingredients, entry["mood"])] += 1
+
+        usage = await db.get_ingredient_usage_stats(user_id)
+        moods: Counter = Counter()
+        for trend in await db.get_mood_trends(user_id, days=self.settings.PREGENERATION_ACTIVE_DAYS):
+            moods[trend["mood"]] += trend["count"]
+        if usage and moods:
+            staples = tuple(sorted({u["ingredient"].strip().lower() for u in usage[:self.settings.PREGENERATION_STAPLE_INGREDIENTS]}))
+            mood = moods.most_common(1)[0][0]
+            if mood in MoodEnum._value2member_map_:
+                # Ranks below any pair the user actually asked for
+                counts[(staples, mood)] += 0.5
+
+        return [combination for combination, _ in counts.most_common(self.settings.PREGENERATION_COMBOS_PER_USER)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.settings.ENABLE_RECIPE_PREGENERATION,
+            "running": self._task is not None,
+            "window_utc": f"{self.settings.PREGENERATION_WINDOW_START_HOUR:02d}:00-"
+                          f"{self.settings.PREGENERATION_WINDOW_END_HOUR:02d}:00",
+            "in_window": self.in_window(),
+            "token_budget": self.settings.PREGENERATION_TOKEN_BUDGET,
+            "tokens_used": self.tokens_used,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            **self.stats
+        }
@@ -0,0 +1,64 @@
+#recipe_cache.py
+from datetime import datetime
+from typing import List, Optional
+import logging
+
+from app.database.mongodb import get_shared_database
+from app.models.schemas import RecipeResponse
+from app.utils.metrics import PREGENERATED_RECIPES, record_cache
+from app.utils.recipe_schema import recipe_content_hash
+
+logger = logging.getLogger(__name__)
+
+class RecipeCache:
+    """
+    Generated recipes keyed by their canonical generation inputs, stored
+    through the content-addressed recipes collection. Entries come from live
+    generations and from speculative pre-generation. A cache failure is
+    logged and treated as a miss, so it never fails a generation.
+    """
+
+    async def take(self, key: str, user_id: str) -> Optional[RecipeResponse]:
+        db = get_shared_database()
+        try:
+            entry = await db.take_cached_recipe(key, user_id)
+            content = await db.get_recipe(entry["recipe_hash"]) if entry else None
+        except Exception as e:
+            logger.warning(f"Recipe cache lookup failed: {e}")
+            return None
+
+        record_cache("recipe", content is not None)
+        if content is None:
+            return None
+        if entry.get("source") == "speculative":
+            PREGENERATED_RECIPES.inc(("served",))
+        return RecipeResponse(**content, generated_at=datetime.utcnow())
+
+    async def put(self, key: str, recipe: RecipeResponse, source: str, served_to: List[str]):
+        db = get_shared_database()
+        try:
+            recipe_hash = await db.save_recipe(recipe.dict())
+            await db.put_cached_recipe(key, recipe_hash, source, served_to)
+        except Exception as e:
+            logger.warning(f"Recipe cache write failed: {e}")
+
+    async def mark_served(self, key: str, user_id: str):
+        """Record that a recipe shared from another caller's generation was served to `user_id` too"""
+        try:
+            await get_shared_database().mark_cached_recipe_served(key, user_id)
+        except Exception as e:
+            logger.warning(f"Recipe cache write failed: {e}")
+
+    async def discard(self, key: str, recipe: RecipeResponse):
+        """Drop a recipe that was cached under `key` but turned down by the caller it was generated for"""
+        try:
+            await get_shared_database().delete_cached_recipe(key, recipe_content_hash(recipe.dict()))
+        except Exception as e:
+            logger.warning(f"Recipe cache write failed: {e}")
+
+    async def contains(self, key: str, user_id: str) -> bool:
+        try:
+            return await get_shared_database().has_cached_recipe(key, user_id)
+        except Exception as e:
+            logger.warning(f"Recipe cache lookup failed: {e}")
+            return False
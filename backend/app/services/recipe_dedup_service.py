@@ -0,0 +1,192 @@
+#recipe_dedup_service.py
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import time
+
+from app.core.config import get_settings
+from app.database.mongodb import get_shared_database
+from app.utils.minhash import LSHIndex, MinHasher, get_minhasher, recipe_shingles, similarity
+from app.utils.recipe_schema import recipe_content_hash
+
+logger = logging.getLogger(__name__)
+
+class RecipeDedupService:
+    """
+    Near-duplicate recipes by MinHash over title, ingredient and instruction
+    shingles. Every stored recipe carries its signature and LSH band keys
+    (written by MongoDB.save_recipe), so a new recipe is matched with one
+    indexed $in query plus a vectorized comparison against the candidates,
+    and every worker sees the same index. History entries whose recipe
+    nearly repeats a stored one are flagged, or merged onto it.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.stats = {"checked": 0, "flagged": 0, "merged": 0, "rerolls": 0}
+        self.last_backfill: Optional[Dict[str, Any]] = None
+
+    @property
+    def hasher(self) -> MinHasher:
+        return get_minhasher(self.settings.MINHASH_PERMUTATIONS, self.settings.MINHASH_BANDS)
+
+    async def matches(self, recipe: Dict[str, Any]) -> List[Tuple[str, float]]:
+        """
+        Stored recipes at or above NEAR_DUPLICATE_THRESHOLD, most similar
+        first. Once the recipe itself is stored only older ones count, the
+        same rule the backfill applies, so a repeat of a kept recipe is
+        never flagged against its own duplicates.
+        """
+        import numpy as np
+        hasher = self.hasher
+        signature = hasher.signature(recipe_shingles(recipe))
+        if signature is None:
+            return []
+        own = recipe_content_hash(recipe)
+        candidates = await get_shared_database().find_minhash_candidates(
+            hasher.band_keys(signature).tolist(), hasher.params, self.settings.NEAR_DUPLICATE_MAX_CANDIDATES
+        )
+        stored = next((doc for doc in candidates if doc["_id"] == own), None)
+        if stored is not None and stored.get("created_at"):
+            candidates = [doc for doc in candidates if doc.get("created_at") and doc["created_at"] < stored["created_at"]]
+        candidates = [doc for doc in candidates if doc["_id"] != own and doc.get("minhash")]
+        if not candidates:
+            return []
+        signatures = np.frombuffer(b"".join(doc["minhash"] for doc in candidates), dtype=np.uint32)
+        scores = similarity(signature, signatures.reshape(len(candidates), hasher.num_perm))
+        order = np.argsort(-scores, kind="stable")
+        return [
+            (candidates[i]["_id"], round(float(scores[i]), 3))
+            for i in order if scores[i] >= self.settings.NEAR_DUPLICATE_THRESHOLD
+        ]
+
+    async def annotate(self, history: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        A history entry about to be written, flagged with `near_duplicate_of`
+        when its recipe nearly repeats a stored one. With
+        NEAR_DUPLICATE_ACTION=merge, and when that stored recipe is already
+        in the user's own history, the entry references it instead and the
+        new copy is never stored; otherwise it is only flagged.
+        """
+        if not self.settings.ENABLE_NEAR_DUPLICATE_DETECTION or "recipe" not in history:
+            return history
+        try:
+            found = await self.matches(history["recipe"])
+            merge = False
+            if found and self.settings.NEAR_DUPLICATE_ACTION == "merge":
+                # Merge only onto the user's own recipes; another user's near-duplicate may hold an allergen
+                for position, (candidate, _) in enumerate(found):
+                    if await get_shared_database().user_has_recipes(history["user_id"], [candidate]):
+                        found.insert(0, found.pop(position))
+                        merge = True
+                        break
+        except Exception as e:
+            # Detection is best effort; the write goes ahead unflagged
+            logger.warning(f"Near-duplicate check failed: {e}")
+            return history
+        self.stats["checked"] += 1
+        if not found:
+            return history
+
+        content_hash, score = found[0]
+        history = dict(history)
+        history["near_duplicate_of"] = {"recipe_hash": content_hash, "similarity": score}
+        if merge:
+            del history["recipe"]
+            history["recipe_hash"] = content_hash
+            self.stats["merged"] += 1
+        else:
+            self.stats["flagged"] += 1
+        return history
+
+    async def should_reroll(self, recipe: Dict[str, Any], user_id: str) -> bool:
+        """True when NEAR_DUPLICATE_REROLL is on and the user already has this recipe or a near-duplicate"""
+        if not (self.settings.ENABLE_NEAR_DUPLICATE_DETECTION and self.settings.NEAR_DUPLICATE_REROLL):
+            return False
+        try:
+            hashes = [recipe_content_hash(recipe)] + [content_hash for content_hash, _ in await self.matches(recipe)]
+            repeat = await get_shared_database().user_has_recipes(user_id, hashes)
+        except Exception as e:
+            logger.warning(f"Near-duplicate re-roll check failed: {e}")
+            return False
+        if repeat:
+            self.stats["rerolls"] += 1
+        return repeat
+
+    async def backfill(self, batch_size: int, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Sign every stored recipe and flag (or merge) the history of existing
+        near-duplicates. Signatures are computed a batch at a time in one
+        vectorized pass and only written where missing or built with other
+        parameters. Duplicates are then resolved in memory, oldest recipe
+        first, so each cluster keeps its earliest recipe.
+        """
+        import numpy as np
+        start = time.perf_counter()
+        db = get_shared_database()
+        hasher = self.hasher
+        ids: List[str] = []
+        created: List[float] = []
+        signature_batches: List["np.ndarray"] = []
+        signed = 0
+
+        projection = {"recipe": 1, "created_at": 1, "minhash_params": 1}
+        async for batch in db.iter_batches("recipes", projection, batch_size):
+            signatures = hasher.signatures([recipe_shingles(doc.get("recipe") or {}) for doc in batch])
+            band_keys = hasher.band_keys(signatures)
+            empty = (signatures == np.iinfo(np.uint32).max).all(axis=1)
+            updates = []
+            for doc, signature, keys, is_empty in zip(batch, signatures, band_keys, empty):
+                if is_empty:
+                    continue
+                ids.append(doc["_id"])
+                created.append(doc["created_at"].timestamp() if doc.get("created_at") else 0.0)
+                if doc.get("minhash_params") != hasher.params:
+                    updates.append({
+                        "_id": doc["_id"],
+                        "minhash": signature.tobytes(),
+                        "minhash_bands": keys.tolist(),
+                        "minhash_params": hasher.params
+                    })
+            signature_batches.append(signatures[~empty])
+            if updates and not dry_run:
+                await db.save_minhashes(updates)
+            signed += len(updates)
+
+        all_signatures = np.concatenate(signature_batches) if signature_batches else np.zeros((0, hasher.num_perm), np.uint32)
+        all_keys = hasher.band_keys(all_signatures)
+        index = LSHIndex(hasher)
+        duplicates: Dict[str, Dict[str, Any]] = {}
+        for row in np.argsort(np.array(created), kind="stable"):
+            kept, score = index.best_match(all_signatures[row], all_keys[row])
+            if kept is not None and score >= self.settings.NEAR_DUPLICATE_THRESHOLD:
+                duplicates[ids[row]] = {"recipe_hash": kept, "similarity": round(score, 3)}
+            else:
+                index.add(ids[row], all_signatures[row], all_keys[row])
+
+        changed = 0
+        if not dry_run:
+            merge = self.settings.NEAR_DUPLICATE_ACTION == "merge"
+            pending = list(duplicates.items())
+            for offset in range(0, len(pending), batch_size):
+                changed += await db.mark_near_duplicates(dict(pending[offset:offset + batch_size]), merge)
+
+        stats = {
+            "recipes": len(ids),
+            "signed": signed,
+            "near_duplicates": len(duplicates),
+            "history_entries_changed": changed,
+            "seconds": round(time.perf_counter() - start, 2)
+        }
+        self.last_backfill = stats
+        logger.info(f"Near-duplicate backfill: {stats}")
+        return stats
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.settings.ENABLE_NEAR_DUPLICATE_DETECTION,
+            "action": self.settings.NEAR_DUPLICATE_ACTION,
+            "threshold": self.settings.NEAR_DUPLICATE_THRESHOLD,
+            "reroll": self.settings.NEAR_DUPLICATE_REROLL,
+            **self.stats,
+            "last_backfill": self.last_backfill
+        }
@@ -0,0 +1,84 @@
+#recipe_search_service.py
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+import asyncio
+import logging
+import time
+
+from app.core.config import get_settings
+from app.database.mongodb import get_shared_database
+from app.utils.ingredient_index import IngredientIndex
+
+logger = logging.getLogger(__name__)
+
+class RecipeSearchService:
+    """
+    LLM-free retrieval over every recipe generated so far. Recipes are read
+    from the content-addressed recipes collection, so each distinct recipe is
+    indexed once however many users were served it. The index only grows:
+    a refresh pulls recipes stored since the last one, and runs on read once
+    the index is older than INGREDIENT_INDEX_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.index = IngredientIndex()
+        self.synced_until: Optional[datetime] = None
+        self.last_refresh: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.last_refresh is not None
+
+    def is_stale(self) -> bool:
+        return not self.ready or time.monotonic() - self.last_refresh >= self.settings.INGREDIENT_INDEX_REFRESH_SECONDS
+
+    async def refresh(self, force: bool = False) -> int:
+        """Index recipes stored since the last refresh; returns how many were added"""
+        if not force and not self.is_stale():
+            return 0
+        async with self._lock:
+            # A concurrent reader may have refreshed while we waited
+            if not force and not self.is_stale():
+                return 0
+            db = get_shared_database()
+            added = 0
+            async for batch in db.iter_recipes_since(self.synced_until, self.settings.INGREDIENT_INDEX_BATCH_SIZE):
+                # add() skips recipes at synced_until itself, re-read on every refresh
+                for doc in batch:
+                    if self.index.add(doc["_id"], doc.get("recipe") or {}):
+                        added += 1
+                self.synced_until = batch[-1].get("created_at") or self.synced_until
+            self.last_refresh = time.monotonic()
+            if added:
+                logger.info(f"Ingredient index: +{added} recipes ({len(self.index)} total)")
+            return added
+
+    async def cookable(
+        self,
+        pantry: Iterable[str],
+        excluded: FrozenSet[str] = frozenset(),
+        limit: int = 10,
+        max_missing: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Indexed recipes ranked by how much of the pantry they use, with their content"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Serve from the index as it stands; the next read retries
+            logger.warning(f"Ingredient index refresh failed: {e}")
+
+        results = self.index.search(pantry, excluded, limit, max_missing)
+        if results:
+            contents = await get_shared_database().get_recipes([r["recipe_hash"] for r in results])
+            for result in results:
+                result["recipe"] = contents.get(result["recipe_hash"])
+        return results
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.index.stats(),
+            "synced_until": self.synced_until.isoformat() if self.synced_until else None,
+            "age_seconds": round(time.monotonic() - self.last_refresh, 1) if self.ready else None
+        }
@@ -1,41 +1,73 @@
-import google.generativeai as genai
-import json
-import re
-from typing import List, Optional, Dict, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 import logging
 from datetime import datetime
 import asyncio
+import hashlib
+import json
 
-from app.models.schemas import RecipeResponse, NutritionInfo, MoodEnum
+from app.models.schemas import RecipeResponse, MoodEnum
 from app.core.config import get_settings
+from app.services.llm_backend import LLMBackend, LLMResponse, create_llm_backend
+from app.services.recipe_cache import RecipeCache
+from app.utils.admission import remaining_budget
 from app.utils.exceptions import CustomException
+from app.utils.fair_scheduler import get_llm_scheduler, is_fair_share_rejection
+from app.utils.resilience import (
+    CircuitBreaker, CircuitOpenError, ErrorClass, RecipeParseError, RetryPolicy,
+    PROVIDER_FAILURES, RETRYABLE, classify_error
+)
+from app.utils.metrics import COALESCED_CALLS
+from app.utils.nutrition import compute_nutrition
+from app.utils.recipe_parser import parse_recipe
+from app.utils.recipe_schema import COMPUTED_FIELDS, build_response_schema
+from app.utils.singleflight import SingleFlight
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 class RecipeService:
-    def __init__(self):
+    def __init__(self, mood_analytics=None):
         self.settings = get_settings()
-        self.model = None
+        self.mood_analytics = mood_analytics
+        self.backend: Optional[LLMBackend] = None
         self.initialized = False
+        self.retry_policy = RetryPolicy(
+            base_delay=self.settings.GEMINI_RETRY_BASE_DELAY,
+            max_delay=self.settings.GEMINI_RETRY_MAX_DELAY
+        )
+        self.circuit_breaker = CircuitBreaker(
+            "gemini-recipe",
+            window_size=self.settings.CIRCUIT_BREAKER_WINDOW_SIZE,
+            failure_rate_threshold=self.settings.CIRCUIT_BREAKER_FAILURE_RATE,
+            min_calls=self.settings.CIRCUIT_BREAKER_MIN_CALLS,
+            reset_timeout=self.settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+        )
+        self.response_schema = build_response_schema(exclude=COMPUTED_FIELDS)
+        self.coalescer = SingleFlight("recipe")
+        self.cache = RecipeCache()
+        self.generation_stats = {
+            "recipes": 0,
+            "attempts": 0,
+            "local_repairs": 0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+            "prompt_tokens_saved_estimate": 0
+        }
     
     async def initialize(self):
+        if self.initialized:
+            # Never swap out or clear a backend that live traffic is using
+            return
         try:
-            # Configure Gemini API
-            genai.configure(api_key=self.settings.GEMINI_API_KEY)
-            
             # Use the working model
             model_name = 'gemini-2.0-flash-exp'
             
             logger.info(f"Initializing recipe model: {model_name}")
-            self.model = genai.GenerativeModel(model_name)
+            self.backend = create_llm_backend([model_name])
             
-            # Test the model
-            test_prompt = "Respond with 'OK' if working."
-            response = self.model.generate_content(test_prompt)
-            
-            if response and response.text and 'OK' in response.text.upper():
+            if await self.backend.initialize():
                 self.initialized = True
-                logger.info(f"✅ Recipe service initialized successfully with {model_name}")
+                logger.info(f"✅ Recipe service initialized successfully with {self.backend.name} backend")
             else:
                 raise Exception("Model test failed")
                     
@@ -44,6 +76,18 @@ async def initialize(self):
             logger.warning("Recipe generation will use fallback mode")
             self.initialized = False
     
+    async def health_check(self) -> bool:
+        """
+        Readiness re-check: initialized, the provider still accepts the key
+        and model, and the breaker is not open (quota exhaustion and outages
+        open it)
+        """
+        if not self.initialized:
+            return False
+        if self.circuit_breaker.snapshot()["state"] == CircuitBreaker.OPEN:
+            raise RuntimeError(f"circuit open, retry in {self.circuit_breaker.retry_after():.0f}s")
+        return await self.backend.health_check()
+    
     def _create_recipe_prompt(
         self, 
         ingredients: List[str], 
@@ -51,7 +95,10 @@ def _create_recipe_prompt(
         dietary_preferences: List[str],
         allergies: List[str], 
         health_goals: List[str],
-        cuisine_preference: Optional[str] = None
+        cuisine_preference: Optional[str] = None,
+        structured: bool = True,
+        cuisine_hint: Optional[List[str]] = None,
+        servings: int = 2
     ) -> str:
         mood_context = {
             MoodEnum.HAPPY: "energizing and colorful dishes that bring joy",
@@ -66,6 +113,13 @@ def _create_recipe_prompt(
         
         ingredients_list = '\n'.join([f"- {ing}" for ing in ingredients])
         
+        if cuisine_preference and cuisine_preference != 'any':
+            cuisine_line = cuisine_preference
+        elif cuisine_hint:
+            cuisine_line = f"Any cuisine (in this mood at this time of day people often enjoy {', '.join(cuisine_hint)})"
+        else:
+            cuisine_line = 'Any cuisine'
+        
         prompt = f"""
 You are an expert chef. Create a REAL, PRACTICAL recipe using the ingredients provided.
 
@@ -77,8 +131,8 @@ def _create_recipe_prompt(
 - Dietary Preferences: {', '.join(dietary_preferences) if dietary_preferences else 'None'}
 - Allergies to AVOID: {', '.join(allergies) if allergies else 'None'}
 - Health Goals: {', '.join(health_goals) if health_goals else 'General wellness'}
-- Cuisine Preference: {cuisine_preference if cuisine_preference and cuisine_preference != 'any' else 'Any cuisine'}
-- Servings: 2
+- Cuisine Preference: {cuisine_line}
+- Servings: {servings}
 
 CRITICAL RULES:
 1. Use ONLY the ingredients listed above as main ingredients
@@ -86,10 +140,17 @@ def _create_recipe_prompt(
 3. Create a REAL recipe that can actually be cooked
 4. Include ALL user's ingredients in the recipe
 5. Make it practical and delicious
-
+"""
+        if structured:
+            # The response schema carries the output format; no template needed
+            prompt += """6. Every ingredient starts with its quantity and unit (e.g. "500g chicken", "1 tbsp oil"); times are in minutes
+"""
+            return prompt.strip()
+        
+        prompt += """
 Return ONLY valid JSON (no markdown, no extra text):
 
-{{
+{
   "title": "Recipe Name",
   "description": "Brief description (1-2 sentences)",
   "ingredients": [
@@ -106,99 +167,83 @@ def _create_recipe_prompt(
   "prep_time": 15,
   "cook_time": 30,
   "total_time": 45,
-  "servings": 2,
+  "servings": """ + str(servings) + """,
   "difficulty": "easy",
   "cuisine_type": "italian",
-  "nutrition_info": {{
-    "calories": 380,
-    "protein": 35,
-    "carbs": 18,
-    "fat": 16,
-    "fiber": 4,
-    "sugar": 8,
-    "sodium": 480
-  }},
   "tags": ["mood-based", "homemade"]
-}}
+}
 
 Generate a real, cookable recipe now:
 """
         return prompt.strip()
     
+    def _generation_options(self) -> Dict[str, Any]:
+        options = {
+            "temperature": 0.7,
+            "top_p": 0.8,
+            "top_k": 40,
+            "max_output_tokens": 2048,
+            "timeout": self.settings.GEMINI_REQUEST_TIMEOUT
+        }
+        if self.settings.GEMINI_STRUCTURED_OUTPUT:
+            options["response_mime_type"] = "application/json"
+            options["response_schema"] = self.response_schema
+        return options
+    
+    @traced()
     def _parse_recipe_response(self, response_text: str) -> RecipeResponse:
         try:
-            # Clean up the response
-            cleaned_text = response_text.strip()
-            
-            # Remove markdown code blocks
-            if cleaned_text.startswith('```json'):
-                cleaned_text = cleaned_text[7:]
-            elif cleaned_text.startswith('```'):
-                cleaned_text = cleaned_text[3:]
-            
-            if cleaned_text.endswith('```'):
-                cleaned_text = cleaned_text[:-3]
-            
-            cleaned_text = cleaned_text.strip()
-            
-            # Try to extract JSON object
-            json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
-            if json_match:
-                cleaned_text = json_match.group()
-            
-            # Fix common JSON errors
-            cleaned_text = re.sub(r',(\s*[}\]])', r'\1', cleaned_text)
-            cleaned_text = re.sub(r'"\s*\n\s*"', '",\n"', cleaned_text)
-            
-            logger.info(f"Parsing JSON response (length: {len(cleaned_text)} chars)")
-            
-            try:
-                recipe_data = json.loads(cleaned_text)
-            except json.JSONDecodeError as json_error:
-                logger.error(f"JSON decode error at position {json_error.pos}")
-                # Try more aggressive cleaning
-                start = cleaned_text.find('{')
-                end = cleaned_text.rfind('}')
-                if start != -1 and end != -1:
-                    cleaned_text = cleaned_text[start:end+1]
-                    recipe_data = json.loads(cleaned_text)
-                else:
-                    raise
-            
-            # Extract and validate fields
-            nutrition_data = recipe_data.get('nutrition_info', {})
-            
-            nutrition_info = NutritionInfo(
-                calories=float(nutrition_data.get('calories', 300)),
-                protein=float(nutrition_data.get('protein', 15)),
-                carbs=float(nutrition_data.get('carbs', 30)),
-                fat=float(nutrition_data.get('fat', 10)),
-                fiber=float(nutrition_data.get('fiber', 5)),
-                sugar=float(nutrition_data.get('sugar', 5)),
-                sodium=float(nutrition_data.get('sodium', 400))
-            )
+            recipe, repaired_fields = parse_recipe(response_text)
+            # Derived locally, never taken from the model
+            recipe.nutrition_info = compute_nutrition(recipe.ingredients, recipe.servings)
             
-            recipe = RecipeResponse(
-                title=recipe_data.get('title', 'Generated Recipe'),
-                description=recipe_data.get('description', 'A delicious recipe'),
-                ingredients=recipe_data.get('ingredients', []),
-                instructions=recipe_data.get('instructions', []),
-                prep_time=int(recipe_data.get('prep_time', 15)),
-                cook_time=int(recipe_data.get('cook_time', 30)),
-                total_time=int(recipe_data.get('total_time', 45)),
-                servings=int(recipe_data.get('servings', 2)),
-                difficulty=recipe_data.get('difficulty', 'medium'),
-                cuisine_type=recipe_data.get('cuisine_type', 'fusion'),
-                nutrition_info=nutrition_info,
-                tags=recipe_data.get('tags', [])
-            )
+            # Missing or mistyped fields were repaired locally instead of re-rolling
+            if repaired_fields:
+                self.generation_stats["local_repairs"] += 1
+                logger.warning(f"Repaired recipe fields locally: {', '.join(repaired_fields)}")
             
             logger.info(f"✅ Successfully parsed recipe: {recipe.title}")
             return recipe
             
         except Exception as e:
             logger.error(f"Recipe parsing error: {str(e)}")
-            raise Exception(f"Failed to parse recipe: {str(e)}")
+            raise RecipeParseError(f"Failed to parse recipe: {str(e)}")
+    
+    def _record_generation(self, prompt: str, legacy_prompt: str, response: LLMResponse, attempts: int) -> int:
+        """Account tokens and attempts per recipe to measure what structured output saves; returns the tokens used"""
+        stats = self.generation_stats
+        prompt_tokens = response.prompt_tokens or len(prompt) // 4
+        output_tokens = response.output_tokens
+        
+        stats["recipes"] += 1
+        stats["attempts"] += attempts
+        stats["prompt_tokens"] += prompt_tokens
+        stats["output_tokens"] += output_tokens
+        # Scale the real token count by the character ratio of the two prompts
+        stats["prompt_tokens_saved_estimate"] += int(
+            prompt_tokens * (len(legacy_prompt) / max(len(prompt), 1)) - prompt_tokens
+        )
+        
+        logger.info(
+            f"Recipe used {attempts} attempt(s), {prompt_tokens} prompt + {output_tokens} output tokens"
+        )
+        return prompt_tokens + output_tokens
+    
+    def get_generation_stats(self) -> Dict[str, Any]:
+        stats = self.generation_stats
+        recipes = max(stats["recipes"], 1)
+        return {
+            **stats,
+            "structured_output": self.settings.GEMINI_STRUCTURED_OUTPUT,
+            "avg_attempts_per_recipe": round(stats["attempts"] / recipes, 2),
+            "avg_prompt_tokens_per_recipe": round(stats["prompt_tokens"] / recipes, 1),
+            "avg_output_tokens_per_recipe": round(stats["output_tokens"] / recipes, 1),
+            "avg_prompt_tokens_saved_per_recipe": round(stats["prompt_tokens_saved_estimate"] / recipes, 1),
+            # Every local repair is a round trip the old parser would have re-rolled
+            "avg_retries_saved_per_recipe": round(stats["local_repairs"] / recipes, 3),
+            # Model round trips skipped by sharing an identical in-flight generation
+            "coalesced_requests": int(COALESCED_CALLS.collect().get(("recipe", "follower"), 0))
+        }
     
     def _create_fallback_recipe(self, ingredients: List[str], mood: MoodEnum) -> RecipeResponse:
         """Only used if AI is completely unavailable"""
@@ -215,10 +260,11 @@ def _create_fallback_recipe(self, ingredients: List[str], mood: MoodEnum) -> Rec
         
         title = f"{mood_titles.get(mood, 'Simple')} {ingredients[0].title()} Dish"
         
-        return RecipeResponse(
+        lines = [f"{ingredient} (as needed)" for ingredient in ingredients] + ["Salt and pepper to taste"]
+        recipe = RecipeResponse(
             title=title,
             description=f"A simple {mood.value} recipe using {', '.join(ingredients[:3])}.",
-            ingredients=[f"{ingredient} (as needed)" for ingredient in ingredients] + ["Salt and pepper to taste"],
+            ingredients=lines,
             instructions=[
                 "Prepare all available ingredients.",
                 "Heat oil in a pan over medium heat.",
@@ -232,13 +278,47 @@ def _create_fallback_recipe(self, ingredients: List[str], mood: MoodEnum) -> Rec
             servings=2,
             difficulty="easy",
             cuisine_type="home-style",
-            nutrition_info=NutritionInfo(
-                calories=250, protein=12, carbs=25, fat=10,
-                fiber=4, sugar=6, sodium=400
-            ),
+            nutrition_info=compute_nutrition(lines, 2),
             tags=[mood.value, "simple", "homemade"]
         )
+        recipe._fallback = True
+        return recipe
     
+    @staticmethod
+    def is_fallback(recipe: RecipeResponse) -> bool:
+        """True for the placeholder served while the circuit is open; it is not worth keeping"""
+        return recipe._fallback
+    
+    @staticmethod
+    def _generation_key(
+        ingredients: List[str],
+        mood: MoodEnum,
+        dietary_preferences: List[str],
+        allergies: List[str],
+        health_goals: List[str],
+        cuisine_preference: Optional[str],
+        servings: int = 2
+    ) -> str:
+        """
+        Canonical form of the inputs that shape the prompt; order and case do
+        not matter. Keys both in-flight coalescing and the recipe cache.
+        """
+        def canonical(values: List[Any]) -> List[str]:
+            return sorted({str(getattr(v, "value", v)).strip().lower() for v in values if v})
+        
+        cuisine = (cuisine_preference or "").strip().lower()
+        payload = json.dumps([
+            canonical(ingredients),
+            mood.value,
+            canonical(dietary_preferences),
+            canonical(allergies),
+            canonical(health_goals),
+            "" if cuisine == "any" else cuisine,
+            servings
+        ], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    @traced()
     async def generate_recipe(
         self,
         ingredients: List[str],
@@ -247,7 +327,97 @@ async def generate_recipe(
         allergies: List[str] = [],
         health_goals: List[str] = [],
         cuisine_preference: Optional[str] = None,
-        max_retries: int = 3
+        max_retries: Optional[int] = None,
+        user_id: Optional[str] = None,
+        servings: int = 2,
+        reroll: Optional[Callable[[RecipeResponse], Awaitable[bool]]] = None
+    ) -> RecipeResponse:
+        """
+        Serves a cached recipe this user has not seen yet when there is one.
+        Otherwise concurrent calls with the same canonical inputs share one
+        generation; each caller gets its own copy of the recipe. A recipe
+        `reroll` turns down is replaced once, and dropped from the cache
+        first when it was generated for this caller.
+        """
+        key = self._generation_key(
+            ingredients, mood, dietary_preferences, allergies, health_goals, cuisine_preference, servings
+        )
+        caching = self.settings.ENABLE_RECIPE_CACHING and user_id is not None
+        
+        async def serve():
+            """The recipe, and whether this caller's own generation produced it"""
+            if caching:
+                cached = await self.cache.take(key, user_id)
+                if cached is not None:
+                    logger.info(f"⚡ Served cached recipe: {cached.title}")
+                    return cached, False
+            
+            led = []
+            def generate():
+                led.append(True)
+                return self._generate_recipe(
+                    ingredients, mood, dietary_preferences, allergies, health_goals, cuisine_preference, max_retries,
+                    cache_key=key if caching else None, cache_source="generated", served_to=[user_id], servings=servings
+                )
+            if not self.settings.ENABLE_REQUEST_COALESCING:
+                return await generate(), True
+            
+            # The shared call runs in the leader's fair share; its 429 is not a follower's
+            recipe = await self.coalescer.do(key, generate, rerun_on=is_fair_share_rejection)
+            if caching and not led:
+                # The leader cached this recipe as served to itself only
+                await self.cache.mark_served(key, user_id)
+            return recipe.model_copy(deep=True), bool(led)
+        
+        recipe, generated = await serve()
+        if reroll is not None and await reroll(recipe):
+            # One re-roll at most; a second near-duplicate is kept and flagged
+            logger.info("Recipe nearly repeats one in the user's history - re-rolling once")
+            if caching and generated:
+                await self.cache.discard(key, recipe)
+            recipe, _ = await serve()
+        return recipe
+    
+    async def pregenerate(
+        self,
+        user_id: str,
+        ingredients: List[str],
+        mood: MoodEnum,
+        dietary_preferences: List[str] = [],
+        allergies: List[str] = [],
+        health_goals: List[str] = []
+    ) -> Optional[int]:
+        """
+        Generate a recipe into the cache ahead of a likely request. Returns the
+        tokens spent, 0 when the cache already holds one this user has not
+        seen, or None when nothing usable was generated.
+        """
+        key = self._generation_key(ingredients, mood, dietary_preferences, allergies, health_goals, None)
+        if await self.cache.contains(key, user_id):
+            return 0
+        
+        usage: Dict[str, int] = {}
+        await self._generate_recipe(
+            ingredients, mood, dietary_preferences, allergies, health_goals, None, None,
+            cache_key=key, cache_source="speculative", served_to=[], usage=usage
+        )
+        # A circuit-open fallback recipe records no usage and is not cached
+        return usage.get("tokens")
+    
+    async def _generate_recipe(
+        self,
+        ingredients: List[str],
+        mood: MoodEnum,
+        dietary_preferences: List[str],
+        allergies: List[str],
+        health_goals: List[str],
+        cuisine_preference: Optional[str],
+        max_retries: Optional[int],
+        cache_key: Optional[str] = None,
+        cache_source: str = "generated",
+        served_to: List[str] = [],
+        usage: Optional[Dict[str, int]] = None,
+        servings: int = 2
     ) -> RecipeResponse:
         
         if not ingredients:
@@ -261,55 +431,118 @@ async def generate_recipe(
                 detail="AI service not available. Please check API configuration."
             )
         
-        prompt = self._create_recipe_prompt(
+        max_retries = max_retries or self.settings.MAX_RECIPE_GENERATION_RETRIES
+        
+        prompt_args = dict(
             ingredients=ingredients,
             mood=mood,
             dietary_preferences=dietary_preferences,
             allergies=allergies,
             health_goals=health_goals,
-            cuisine_preference=cuisine_preference
+            cuisine_preference=cuisine_preference,
+            servings=servings,
+            # Soft cross-user prior; only applies when no cuisine was asked for
+            cuisine_hint=self.mood_analytics.cuisine_hint(mood.value) if self.mood_analytics else None
+        )
+        prompt = self._create_recipe_prompt(
+            **prompt_args, structured=self.settings.GEMINI_STRUCTURED_OUTPUT
         )
+        legacy_prompt = self._create_recipe_prompt(**prompt_args, structured=False)
         
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"🔄 Generating recipe (attempt {attempt + 1}/{max_retries})")
-                
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        top_p=0.8,
-                        top_k=40,
-                        max_output_tokens=2048,
-                    ),
-                    request_options={"timeout": 120}
-                )
-                
-                if not response or not response.text:
-                    raise Exception("Empty response from AI model")
+        # One fair-share token covers every attempt; the slot itself is given up while backing off
+        async with get_llm_scheduler().slot():
+            for attempt in range(max_retries):
+                try:
+                    self.circuit_breaker.check()
+                except CircuitOpenError as e:
+                    return self._handle_open_circuit(e, ingredients, mood)
                 
-                logger.info(f"📥 Received response from Gemini ({len(response.text)} chars)")
-                
-                recipe = self._parse_recipe_response(response.text)
-                
-                # Validate recipe has minimum required data
-                if not recipe.ingredients or not recipe.instructions:
-                    raise Exception("Recipe missing essential data")
-                
-                logger.info(f"✅ Real recipe generated: {recipe.title}")
-                return recipe
+                try:
+                    logger.info(f"🔄 Generating recipe (attempt {attempt + 1}/{max_retries})")
                     
-            except Exception as e:
-                logger.error(f"❌ Attempt {attempt + 1} failed: {str(e)}")
-                
-                if attempt == max_retries - 1:
-                    logger.error("All attempts failed")
-                    raise CustomException(
-                        status_code=500,
-                        detail="Failed to generate recipe. Please try again."
-                    )
+                    try:
+                        response = await self.backend.generate(prompt, operation="recipe", **self._generation_options())
+                    except BaseException as e:
+                        if not isinstance(e, Exception) or isinstance(e, CustomException):
+                            # Neither success nor failure; without this a cancelled probe keeps the circuit half-open forever
+                            self.circuit_breaker.release_probe()
+                        raise
+                    
+                    # The provider answered; anything wrong from here on is a parse problem
+                    self.circuit_breaker.record_success()
+                    
+                    response_text = response.text
+                    
+                    if not response_text:
+                        raise RecipeParseError("Empty response from AI model")
+                    
+                    logger.info(f"📥 Received response from Gemini ({len(response_text)} chars)")
+                    
+                    recipe = self._parse_recipe_response(response_text)
+                    
+                    # Validate recipe has minimum required data
+                    if not recipe.ingredients or not recipe.instructions:
+                        raise RecipeParseError("Recipe missing essential data")
+                    
+                    tokens = self._record_generation(prompt, legacy_prompt, response, attempt + 1)
+                    if usage is not None:
+                        usage["tokens"] = tokens
+                    if cache_key is not None:
+                        await self.cache.put(cache_key, recipe, cache_source, served_to)
+                    logger.info(f"✅ Real recipe generated: {recipe.title}")
+                    return recipe
                 
-                await asyncio.sleep(1)
-        
+                except CustomException:
+                    # Raised on purpose; says nothing about the provider
+                    raise
+                except Exception as e:
+                    error_class = classify_error(e)
+                    logger.error(f"❌ Attempt {attempt + 1} failed ({error_class.value}): {str(e)}")
+                    
+                    if error_class in PROVIDER_FAILURES:
+                        self.circuit_breaker.record_failure()
+                    
+                    delay = self.retry_policy.backoff(attempt, error_class)
+                    # A retry that could only start after the request's deadline is not worth the wait
+                    budget = remaining_budget()
+                    out_of_time = budget is not None and delay >= budget
+                    if error_class not in RETRYABLE or attempt == max_retries - 1 or out_of_time:
+                        logger.error("All attempts failed")
+                        if error_class == ErrorClass.RATE_LIMITED:
+                            raise CustomException(
+                                status_code=503,
+                                detail="AI service is busy. Please try again shortly.",
+                                headers={"Retry-After": str(int(self.settings.GEMINI_RETRY_MAX_DELAY))}
+                            )
+                        raise CustomException(
+                            status_code=500,
+                            detail="Failed to generate recipe. Please try again."
+                        )
+                    
+                    logger.info(f"Retrying in {delay:.2f}s")
+                    async with get_llm_scheduler().paused():
+                        await asyncio.sleep(delay)
+            
         # This should never be reached
-        raise CustomException(status_code=500, detail="Recipe generation failed")
\ No newline at end of file
+        raise CustomException(status_code=500, detail="Recipe generation failed")
+    
+    def _handle_open_circuit(
+        self, 
+        error: CircuitOpenError, 
+        ingredients: List[str], 
+        mood: MoodEnum
+    ) -> RecipeResponse:
+        """Fail fast, or serve the fallback recipe, while Gemini is unhealthy"""
+        if self.settings.CIRCUIT_BREAKER_SERVE_FALLBACK:
+            logger.warning("Circuit open - serving fallback recipe")
+            return self._create_fallback_recipe(ingredients, mood)
+        
+        logger.warning(f"Circuit open - rejecting request (retry in {error.retry_after:.0f}s)")
+        raise CustomException(
+            status_code=503,
+            detail="AI service is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(max(1, int(error.retry_after)))}
+        )
+    
+    def get_circuit_state(self) -> Dict[str, Any]:
+        return self.circuit_breaker.snapshot()
\ No newline at end of file
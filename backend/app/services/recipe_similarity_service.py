@@ -0,0 +1,150 @@
+#recipe_similarity_service.py
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional
+import asyncio
+import logging
+import time
+
+from app.core.config import get_settings
+from app.database.mongodb import get_shared_database
+from app.utils.ingredients import canonical_set, conflicts
+from app.utils.similarity import SimilarityMatrix
+
+logger = logging.getLogger(__name__)
+
+class RecipeSimilarityService:
+    """
+    Similar-recipe lookups over every stored recipe, from a TF-IDF matrix kept
+    in memory. Like the ingredient index it grows incrementally from the
+    recipes collection on read. Snapshots are written periodically and at
+    shutdown, and a starting worker memory-maps the latest one and only pulls
+    the recipes stored after it.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.matrix = SimilarityMatrix(self.settings.SIMILARITY_FEATURES, self.settings.SIMILARITY_NUTRITION_WEIGHT)
+        self.synced_until: Optional[datetime] = None
+        self.last_refresh: Optional[float] = None
+        self.last_snapshot = time.monotonic()
+        self.snapshot_rows = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.last_refresh is not None
+
+    def is_stale(self) -> bool:
+        return not self.ready or time.monotonic() - self.last_refresh >= self.settings.SIMILARITY_REFRESH_SECONDS
+
+    async def warm_up(self):
+        if self.settings.SIMILARITY_SNAPSHOT_DIR and not len(self.matrix):
+            try:
+                await self._load_snapshot()
+            except Exception as e:
+                logger.warning(f"Similarity snapshot not loaded, rebuilding: {e}")
+        await self.refresh(force=True)
+
+    async def _load_snapshot(self):
+        matrix, meta = await asyncio.to_thread(
+            SimilarityMatrix.load,
+            self.settings.SIMILARITY_SNAPSHOT_DIR,
+            self.settings.SIMILARITY_FEATURES,
+            self.settings.SIMILARITY_NUTRITION_WEIGHT
+        )
+        if matrix is None:
+            return
+        async with self._lock:
+            self.matrix = matrix
+            self.snapshot_rows = len(matrix)
+            if meta.get("synced_until"):
+                self.synced_until = datetime.fromisoformat(meta["synced_until"])
+        logger.info(f"Similarity snapshot loaded: {len(matrix)} recipes")
+
+    async def refresh(self, force: bool = False) -> int:
+        """Append recipes stored since the last refresh; returns how many were added"""
+        if not force and not self.is_stale():
+            return 0
+        async with self._lock:
+            if not force and not self.is_stale():
+                return 0
+            db = get_shared_database()
+            added = 0
+            async for batch in db.iter_recipes_since(self.synced_until, self.settings.INGREDIENT_INDEX_BATCH_SIZE):
+                for doc in batch:
+                    if self.matrix.add(doc["_id"], doc.get("recipe") or {}):
+                        added += 1
+                self.synced_until = batch[-1].get("created_at") or self.synced_until
+            self.last_refresh = time.monotonic()
+            if added:
+                logger.info(f"Similarity matrix: +{added} recipes ({len(self.matrix)} total)")
+            if time.monotonic() - self.last_snapshot >= self.settings.SIMILARITY_SNAPSHOT_INTERVAL:
+                await self._save_snapshot()
+            return added
+
+    async def save_snapshot(self):
+        async with self._lock:
+            await self._save_snapshot()
+
+    async def _save_snapshot(self):
+        """Caller holds the lock, so no rows are appended while the arrays are written"""
+        self.last_snapshot = time.monotonic()
+        if not self.settings.SIMILARITY_SNAPSHOT_DIR or len(self.matrix) == self.snapshot_rows:
+            return
+        meta = {"synced_until": self.synced_until.isoformat() if self.synced_until else None}
+        try:
+            await asyncio.to_thread(self.matrix.save, self.settings.SIMILARITY_SNAPSHOT_DIR, meta)
+            self.snapshot_rows = len(self.matrix)
+        except Exception as e:
+            logger.warning(f"Similarity snapshot write failed: {e}")
+
+    async def similar(
+        self,
+        recipe: Dict[str, Any],
+        recipe_hash: Optional[str] = None,
+        excluded: FrozenSet[str] = frozenset(),
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Stored recipes most similar to `recipe`, with their content, skipping the recipe itself"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"Similarity matrix refresh failed: {e}")
+
+        # Over-fetch so results dropped for the user's allergies or diet still leave `limit`
+        fetch = limit * 2 if excluded else limit
+        async with self._lock:
+            # Numpy work off the event loop; the lock keeps refresh from appending rows meanwhile
+            matches = (await asyncio.to_thread(
+                self.matrix.similar, [recipe], fetch, [{recipe_hash}] if recipe_hash else None
+            ))[0]
+        if not matches:
+            return []
+        contents = await get_shared_database().get_recipes([match_hash for match_hash, _ in matches])
+
+        results = []
+        for match_hash, score in matches:
+            content = contents.get(match_hash)
+            if content is None:
+                continue
+            if excluded and any(conflicts(name, excluded) for name in canonical_set(content.get("ingredients") or [])):
+                continue
+            results.append({
+                "recipe_hash": match_hash,
+                "title": content.get("title"),
+                "cuisine_type": content.get("cuisine_type"),
+                "score": score,
+                "recipe": content
+            })
+            if len(results) == limit:
+                break
+        return results
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "recipes": len(self.matrix),
+            "features": self.matrix.dims,
+            "memory_mapped": not self.matrix.terms.flags.writeable,
+            "synced_until": self.synced_until.isoformat() if self.synced_until else None,
+            "age_seconds": round(time.monotonic() - self.last_refresh, 1) if self.ready else None
+        }
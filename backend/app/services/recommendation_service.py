@@ -0,0 +1,304 @@
+#recommendation_service.py
+from array import array
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from app.core.config import get_settings
+from app.database.mongodb import get_shared_database
+from app.utils.factorization import SparseMatrix, randomized_svd
+from app.utils.ingredients import PANTRY_STAPLES, canonical_set, conflicts
+from app.utils.recipe_schema import recipe_content_hash
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "user_recommendations"
+
+# How often each worker checks whether a rebuild is due
+POLL_SECONDS = 300
+
+TOP_INGREDIENTS = 10
+
+class InteractionCorpus:
+    """
+    Everything the factorization needs, gathered from streamed reads into
+    flat arrays: recipes as ingredient-id lists (CSR layout) and
+    (user, recipe, weight) interactions.
+    """
+
+    def __init__(self):
+        self.ingredient_ids: Dict[str, int] = {}
+        self.ingredient_names: List[str] = []
+        self.recipe_ids: Dict[str, int] = {}
+        self.recipe_hashes: List[str] = []
+        self.recipe_ptr = array("q", [0])
+        self.recipe_cols = array("I")
+        self.user_ids: Dict[str, int] = {}
+        self.users: List[str] = []
+        self.interaction_users = array("I")
+        self.interaction_recipes = array("I")
+        self.interaction_weights = array("f")
+
+    def add_recipe(self, recipe_hash: str, ingredients: List[str]) -> Optional[int]:
+        recipe_id = self.recipe_ids.get(recipe_hash)
+        if recipe_id is not None:
+            return recipe_id
+        names = canonical_set(ingredients)
+        if not names:
+            return None
+        for name in names:
+            ingredient_id = self.ingredient_ids.get(name)
+            if ingredient_id is None:
+                ingredient_id = self.ingredient_ids[name] = len(self.ingredient_names)
+                self.ingredient_names.append(name)
+            self.recipe_cols.append(ingredient_id)
+        self.recipe_ptr.append(len(self.recipe_cols))
+        recipe_id = self.recipe_ids[recipe_hash] = len(self.recipe_hashes)
+        self.recipe_hashes.append(recipe_hash)
+        return recipe_id
+
+    def add_interaction(self, user_id: str, recipe_id: int, weight: float):
+        user = self.user_ids.get(user_id)
+        if user is None:
+            user = self.user_ids[user_id] = len(self.users)
+            self.users.append(user_id)
+        self.interaction_users.append(user)
+        self.interaction_recipes.append(recipe_id)
+        self.interaction_weights.append(weight)
+
+    def arrays(self) -> Tuple["np.ndarray", ...]:
+        import numpy as np
+        return (
+            np.frombuffer(self.recipe_ptr, dtype=np.int64),
+            np.frombuffer(self.recipe_cols, dtype=np.uint32).astype(np.int64),
+            np.frombuffer(self.interaction_users, dtype=np.uint32).astype(np.int64),
+            np.frombuffer(self.interaction_recipes, dtype=np.uint32).astype(np.int64),
+            np.frombuffer(self.interaction_weights, dtype=np.float32)
+        )
+
+class RecommendationService:
+    """
+    Offline per-user recipe recommendations. A periodic batch job streams
+    recipe_history, favorites and ratings into a user x ingredient matrix
+    (interaction weights spread over each recipe's canonical ingredients,
+    log-damped and IDF-weighted), factorizes it with a randomized truncated
+    SVD and scores every stored recipe against each user's latent profile.
+    The top N per user are written to user_recommendations, so serving them
+    is a single document read.
+
+    Factorizing over ingredients rather than recipes matters here: most
+    recipes are generated for one user, so a user x recipe matrix would have
+    almost no overlap to learn from.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._task: Optional[asyncio.Task] = None
+        self.last_stats: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="user-recommendations")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(POLL_SECONDS)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Recommendation build failed: {e}")
+
+    async def run_once(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Build if no other worker holds the job and the last build is old enough; None when skipped"""
+        db = get_shared_database()
+        interval = 0 if force else self.settings.RECOMMENDATION_INTERVAL
+        if not await db.claim_job(JOB_NAME, self.settings.RECOMMENDATION_LEASE_SECONDS, interval):
+            return None
+        try:
+            stats = await self.build()
+        except Exception:
+            await db.release_job(JOB_NAME)
+            raise
+        await db.finish_job(JOB_NAME, stats)
+        self.last_stats = stats
+        return stats
+
+    async def build(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        generated_at = datetime.utcnow()
+        corpus = await self._collect()
+        collected = time.perf_counter()
+
+        stats = {
+            "users": len(corpus.users),
+            "recipes": len(corpus.recipe_hashes),
+            "ingredients": len(corpus.ingredient_names),
+            "interactions": len(corpus.interaction_weights),
+        }
+        if not corpus.users:
+            return {**stats, "written": 0, "seconds": round(collected - start, 2)}
+
+        # NumPy releases the GIL in the heavy parts; keep them off the event loop
+        documents = await asyncio.to_thread(self._recommend, corpus, generated_at)
+        ranked = time.perf_counter()
+
+        db = get_shared_database()
+        for offset in range(0, len(documents), 1000):
+            await db.save_recommendations(documents[offset:offset + 1000])
+        stale = await db.delete_recommendations_before(generated_at)
+
+        stats.update({
+            "written": len(documents),
+            "deleted_stale": stale,
+            "read_seconds": round(collected - start, 2),
+            "compute_seconds": round(ranked - collected, 2),
+            "seconds": round(time.perf_counter() - start, 2),
+            "generated_at": generated_at.isoformat()
+        })
+        logger.info(f"Recommendations built: {stats}")
+        return stats
+
+    async def _collect(self) -> InteractionCorpus:
+        """Stream recipes, favorites and history in bounded batches"""
+        db = get_shared_database()
+        batch_size = self.settings.RECOMMENDATION_BATCH_SIZE
+        corpus = InteractionCorpus()
+
+        async for batch in db.iter_batches("recipes", {"recipe.ingredients": 1}, batch_size):
+            for doc in batch:
+                corpus.add_recipe(doc["_id"], (doc.get("recipe") or {}).get("ingredients") or [])
+
+        # Favorites point at history entries
+        favorites = set()
+        async for batch in db.iter_batches("favorites", {"user_id": 1, "recipe_id": 1}, batch_size):
+            favorites.update((doc.get("user_id"), str(doc.get("recipe_id"))) for doc in batch)
+
+        projection = {"user_id": 1, "recipe_hash": 1, "rating": 1, "recipe": 1}
+        async for batch in db.iter_batches("recipe_history", projection, batch_size):
+            for entry in batch:
+                user_id = entry.get("user_id")
+                if not user_id:
+                    continue
+                recipe_id = corpus.recipe_ids.get(entry.get("recipe_hash"))
+                if recipe_id is None and entry.get("recipe"):
+                    # Entry still embeds its recipe (pre content-addressed store)
+                    recipe = entry["recipe"]
+                    recipe_id = corpus.add_recipe(recipe_content_hash(recipe), recipe.get("ingredients") or [])
+                if recipe_id is None:
+                    continue
+                weight = 1.0
+                if (user_id, str(entry["_id"])) in favorites:
+                    weight += self.settings.RECOMMENDATION_FAVORITE_WEIGHT
+                rating = entry.get("rating")
+                if isinstance(rating, (int, float)) and rating > 0:
+                    # 1-5 stars around a neutral 3
+                    weight *= rating / 3
+                corpus.add_interaction(user_id, recipe_id, weight)
+        return corpus
+
+    def _recommend(self, corpus: InteractionCorpus, generated_at: datetime) -> List[Dict[str, Any]]:
+        import numpy as np
+
+        recipe_ptr, recipe_cols, users, recipes, weights = corpus.arrays()
+        n_users, n_recipes, n_ingredients = len(corpus.users), len(corpus.recipe_hashes), len(corpus.ingredient_names)
+
+        document_frequency = np.bincount(recipe_cols, minlength=n_ingredients)
+        idf = (np.log((1 + n_recipes) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        # Spread each interaction over the recipe's ingredients: one COO entry per (interaction, ingredient)
+        lengths = recipe_ptr[recipes + 1] - recipe_ptr[recipes]
+        ends = np.cumsum(lengths)
+        positions = np.repeat(recipe_ptr[recipes] - (ends - lengths), lengths) + np.arange(ends[-1])
+        interactions = SparseMatrix(
+            np.repeat(users, lengths), recipe_cols[positions], np.repeat(weights, lengths), (n_users, n_ingredients)
+        )
+        interactions.values = (np.log1p(interactions.values) * idf[interactions.cols]).astype(np.float32)
+
+        u, singular, vt = randomized_svd(interactions, self.settings.RECOMMENDATION_FACTORS)
+        user_factors = (u * singular).astype(np.float32)
+        ingredient_factors = vt.T.astype(np.float32)
+
+        # A recipe sits at the IDF-weighted sum of its ingredients, unit length
+        recipe_rows = np.repeat(np.arange(n_recipes), np.diff(recipe_ptr))
+        recipe_factors = SparseMatrix(
+            recipe_rows, recipe_cols, idf[recipe_cols], (n_recipes, n_ingredients)
+        ).dot(ingredient_factors)
+        norms = np.linalg.norm(recipe_factors, axis=1, keepdims=True)
+        recipe_factors /= np.where(norms > 0, norms, 1)
+
+        staples = np.array([name in PANTRY_STAPLES for name in corpus.ingredient_names])
+        top_n = min(self.settings.RECOMMENDATION_TOP_N, n_recipes)
+        top_ingredients = min(TOP_INGREDIENTS, n_ingredients)
+        order = np.argsort(users, kind="stable")
+        seen_users, seen_recipes = users[order], recipes[order]
+
+        documents = []
+        chunk = self.settings.RECOMMENDATION_USER_CHUNK
+        for start in range(0, n_users, chunk):
+            end = min(start + chunk, n_users)
+            scores = user_factors[start:end] @ recipe_factors.T
+            # Never recommend what the user already has in their history
+            lo, hi = np.searchsorted(seen_users, [start, end])
+            scores[seen_users[lo:hi] - start, seen_recipes[lo:hi]] = -np.inf
+            best = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+            best = np.take_along_axis(best, np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1), axis=1)
+
+            affinity = user_factors[start:end] @ ingredient_factors.T
+            affinity[:, staples] = -np.inf
+            liked = np.argpartition(-affinity, top_ingredients - 1, axis=1)[:, :top_ingredients]
+            liked = np.take_along_axis(liked, np.argsort(-np.take_along_axis(affinity, liked, axis=1), axis=1), axis=1)
+
+            for row in range(end - start):
+                documents.append({
+                    "_id": corpus.users[start + row],
+                    "recipes": [
+                        {"recipe_hash": corpus.recipe_hashes[r], "score": round(float(scores[row, r]), 4)}
+                        for r in best[row] if np.isfinite(scores[row, r])
+                    ],
+                    "ingredients": [
+                        {"name": corpus.ingredient_names[i], "score": round(float(affinity[row, i]), 4)}
+                        for i in liked[row] if np.isfinite(affinity[row, i])
+                    ],
+                    "generated_at": generated_at
+                })
+        return documents
+
+    async def recommendations(self, user_id: str, excluded: FrozenSet[str] = frozenset(), limit: int = 10) -> Dict[str, Any]:
+        """The user's precomputed recommendations with recipe content, minus allergy or diet conflicts"""
+        db = get_shared_database()
+        doc = await db.get_recommendations(user_id)
+        if not doc:
+            return {"recipes": [], "ingredients": [], "generated_at": None}
+
+        ranked = doc.get("recipes") or []
+        contents = await db.get_recipes([item["recipe_hash"] for item in ranked])
+        recipes = []
+        for item in ranked:
+            content = contents.get(item["recipe_hash"])
+            if content is None:
+                continue
+            if excluded and any(conflicts(name, excluded) for name in canonical_set(content.get("ingredients") or [])):
+                continue
+            recipes.append({**item, "title": content.get("title"), "cuisine_type": content.get("cuisine_type"), "recipe": content})
+            if len(recipes) == limit:
+                break
+        return {
+            "recipes": recipes,
+            "ingredients": [item for item in doc.get("ingredients") or [] if not conflicts(item["name"], excluded)],
+            "generated_at": doc.get("generated_at")
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.settings.ENABLE_USER_RECOMMENDATIONS,
+            "running": self._task is not None,
+            "last_build": self.last_stats
+        }
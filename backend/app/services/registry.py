@@ -0,0 +1,54 @@
+#registry.py
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ServiceRegistry:
+    """
+    The app's service singletons. Built in lifespan rather than at import, so
+    importing main (workers, reloader, tooling) does not construct services
+    or load their dependencies.
+    """
+
+    def __init__(self):
+        self.auth = None
+        self.recipe = None
+        self.voice = None
+        self.pregeneration = None
+        self.search = None
+        self.similarity = None
+        self.recommendations = None
+        self.mood_analytics = None
+        self.dedup = None
+
+    @property
+    def built(self) -> bool:
+        return self.auth is not None
+
+    def build(self) -> "ServiceRegistry":
+        if self.built:
+            return self
+        from app.services.auth_service import AuthService
+        from app.services.mood_analytics_service import MoodAnalyticsService
+        from app.services.pregeneration_service import PregenerationService
+        from app.services.recipe_dedup_service import RecipeDedupService
+        from app.services.recipe_search_service import RecipeSearchService
+        from app.services.recipe_service import RecipeService
+        from app.services.recipe_similarity_service import RecipeSimilarityService
+        from app.services.recommendation_service import RecommendationService
+        from app.services.voice_ingredient_service import VoiceIngredientService
+
+        self.auth = AuthService()
+        self.mood_analytics = MoodAnalyticsService()
+        self.recipe = RecipeService(mood_analytics=self.mood_analytics)
+        self.voice = VoiceIngredientService()
+        self.pregeneration = PregenerationService(self.recipe)
+        self.search = RecipeSearchService()
+        self.similarity = RecipeSimilarityService()
+        self.recommendations = RecommendationService()
+        self.dedup = RecipeDedupService()
+        logger.info("Service registry built")
+        return self
+
+services = ServiceRegistry()
@@ -1,11 +1,12 @@
-import google.generativeai as genai
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 import asyncio
 
 from app.core.config import get_settings
+from app.services.llm_backend import LLMBackend, create_llm_backend
 from app.utils.exceptions import CustomException
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +15,7 @@ class VoiceIngredientService:
     
     def __init__(self):
         self.settings = get_settings()
-        self.model = None
+        self.backend: Optional[LLMBackend] = None
         self.initialized = False
         
         self.ingredient_database = {
@@ -41,24 +42,17 @@ def __init__(self):
     
     async def initialize(self):
         """Initialize Gemini AI model"""
+        if self.initialized:
+            # Never swap out or clear a backend that live traffic is using
+            return
         try:
-            genai.configure(api_key=self.settings.GEMINI_API_KEY)
-            
             model_options = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-2.0-flash-exp']
+            self.backend = create_llm_backend(model_options)
             
-            for model_name in model_options:
-                try:
-                    logger.info(f"Initializing model: {model_name}")
-                    self.model = genai.GenerativeModel(model_name)
-                    
-                    test_response = self.model.generate_content("Say OK")
-                    if test_response and test_response.text:
-                        self.initialized = True
-                        logger.info(f"Model initialized: {model_name}")
-                        return
-                except Exception as e:
-                    logger.warning(f"Model {model_name} failed: {e}")
-                    continue
+            if await self.backend.initialize():
+                self.initialized = True
+                logger.info(f"Voice service initialized with {self.backend.name} backend")
+                return
             
             raise Exception("No suitable model available")
                 
@@ -66,6 +60,11 @@ async def initialize(self):
             logger.error(f"Gemini initialization failed: {str(e)}")
             self.initialized = False
     
+    async def health_check(self) -> bool:
+        """Readiness re-check: initialized and the provider still accepts the key and model"""
+        return self.initialized and await self.backend.health_check()
+    
+    @traced()
     async def transcribe_and_extract_ingredients(self, audio_file_path: str) -> List[str]:
         """
         Extract ingredients from audio file
@@ -105,17 +104,11 @@ async def transcribe_and_extract_ingredients(self, audio_file_path: str) -> List
             - Separate with commas
             """
             
-            # Run in executor to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.model.generate_content(
-                    [prompt, {"mime_type": mime_type, "data": audio_data}],
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.1,
-                        max_output_tokens=500
-                    )
-                )
+            response = await self.backend.generate(
+                [prompt, {"mime_type": mime_type, "data": audio_data}],
+                operation="extract_audio",
+                temperature=0.1,
+                max_output_tokens=500
             )
             
             if not response or not response.text:
@@ -130,10 +123,13 @@ async def transcribe_and_extract_ingredients(self, audio_file_path: str) -> List
             logger.info(f"Extracted: {ingredients}")
             return ingredients
             
+        except CustomException:
+            raise
         except Exception as e:
             logger.error(f"Audio extraction error: {str(e)}")
             raise Exception(f"Failed to process audio: {str(e)}")
     
+    @traced()
     async def extract_from_text(self, text: str) -> List[str]:
         """Extract ingredients from text input"""
         try:
@@ -147,22 +143,19 @@ async def extract_from_text(self, text: str) -> List[str]:
             Return ONLY comma-separated ingredient names in lowercase.
             No extra text."""
             
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.model.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.1,
-                        max_output_tokens=300
-                    )
-                )
+            response = await self.backend.generate(
+                prompt,
+                operation="extract_text",
+                temperature=0.1,
+                max_output_tokens=300
             )
             
             ingredients = self._parse_ingredient_response(response.text)
             logger.info(f"Text extraction: {ingredients}")
             return ingredients
             
+        except CustomException:
+            raise
         except Exception as e:
             logger.error(f"Text extraction error: {str(e)}")
             return self._simple_text_extraction(text)
@@ -0,0 +1,240 @@
+#admission.py
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Pattern, Tuple
+import asyncio
+import json
+import math
+import re
+import time
+
+from app.utils.metrics import ADMISSION_DECISIONS, ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_WAIT
+
+# Routes that wait on the LLM; everything else is "default"
+LLM_ROUTES: List[Tuple[str, Pattern]] = [
+    ("POST", re.compile(r"^/recipes/generate$")),
+    ("POST", re.compile(r"^/ingredients/extract-from-(audio|text)$")),
+    ("POST", re.compile(r"^/system/test-voice$")),
+]
+
+# Long streamed responses; held in their own few slots so they neither block
+# nor skew the service time of the requests in "default"
+STREAM_ROUTES: List[Tuple[str, Pattern]] = [
+    ("GET", re.compile(r"^/recipes/history/export$")),
+]
+
+# Probes and scrapes must keep answering while the API sheds load
+EXEMPT_PATHS = ("/health", "/ready", "/metrics", "/admission")
+
+# Monotonic deadline of the admitted request this context serves
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left before the current request's deadline; None outside admission control"""
+    deadline = _request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class RouteClass:
+    """
+    Concurrency limit plus bounded FIFO wait queue for one class of routes.
+
+    Runs on the event loop only. A released slot is handed straight to the
+    oldest waiter, so a queued request cannot be overtaken by a newcomer.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, ewma_alpha: float = 0.2):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.ewma_alpha = ewma_alpha
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.service_seconds: Optional[float] = None
+        self.admitted = 0
+        self.shed = 0
+
+    def projected_wait(self, position: Optional[int] = None) -> float:
+        """Seconds until a request joining the queue at `position` gets a slot"""
+        if self.service_seconds is None:
+            return 0.0
+        position = len(self.waiters) + 1 if position is None else position
+        # Each of the `limit` slots drains one request per service time
+        return math.ceil(position / self.limit) * self.service_seconds
+
+    async def acquire(self, deadline: float):
+        if self.in_flight < self.limit and not self.waiters:
+            self._admit("admitted")
+            return
+
+        if len(self.waiters) >= self.max_queue:
+            self._reject("shed_queue_full")
+            raise Overloaded(f"{self.name} queue is full", self.projected_wait())
+
+        projected = self.projected_wait()
+        if time.monotonic() + projected > deadline:
+            self._reject("shed_deadline")
+            raise Overloaded(f"{self.name} projected wait exceeds the request deadline", projected)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self._publish()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self._reject("timed_out")
+            raise Overloaded(f"{self.name} request timed out waiting for a slot", self.projected_wait())
+        except BaseException:
+            # Cancelled (client gone); pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            self._publish()
+        ADMISSION_WAIT.observe(time.monotonic() - start, (self.name,))
+        self.admitted += 1
+        ADMISSION_DECISIONS.inc((self.name, "queued"))
+
+    def release(self, service_seconds: Optional[float] = None):
+        if service_seconds is not None:
+            if self.service_seconds is None:
+                self.service_seconds = service_seconds
+            else:
+                self.service_seconds += self.ewma_alpha * (service_seconds - self.service_seconds)
+
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                # The slot moves to the waiter; in_flight is unchanged
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    def _admit(self, outcome: str):
+        self.in_flight += 1
+        self.admitted += 1
+        ADMISSION_DECISIONS.inc((self.name, outcome))
+        self._publish()
+
+    def _reject(self, outcome: str):
+        self.shed += 1
+        ADMISSION_DECISIONS.inc((self.name, outcome))
+
+    def _publish(self):
+        ADMISSION_IN_FLIGHT.set(self.in_flight, (self.name,))
+        ADMISSION_QUEUED.set(len(self.waiters), (self.name,))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "max_queue": self.max_queue,
+            "utilization": round((self.in_flight + len(self.waiters)) / self.limit, 3),
+            "service_time_ms": round(self.service_seconds * 1000, 1) if self.service_seconds is not None else None,
+            "projected_wait_ms": round(self.projected_wait() * 1000, 1) if self.in_flight >= self.limit else 0.0,
+            "admitted": self.admitted,
+            "shed": self.shed
+        }
+
+class AdmissionController:
+    """
+    Splits `max_concurrent` request slots between LLM-bound routes and the
+    rest, so a slow model cannot starve cheap reads, and bounds how long a
+    request may wait for one before it is shed. Streamed exports get
+    `stream_limit` slots of their own on top.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        timeout: float,
+        llm_share: float = 0.25,
+        queue_size: int = 100,
+        stream_limit: int = 2
+    ):
+        llm_limit = max(1, int(max_concurrent * llm_share))
+        self.timeout = timeout
+        self.classes = {
+            "llm": RouteClass("llm", llm_limit, queue_size),
+            "default": RouteClass("default", max(1, max_concurrent - llm_limit), queue_size),
+            "stream": RouteClass("stream", max(1, stream_limit), max(1, stream_limit)),
+        }
+
+    def classify(self, method: str, path: str) -> Optional[str]:
+        if method == "OPTIONS" or path.startswith(EXEMPT_PATHS):
+            return None
+        for route_method, pattern in LLM_ROUTES:
+            if method == route_method and pattern.match(path):
+                return "llm"
+        for route_method, pattern in STREAM_ROUTES:
+            if method == route_method and pattern.match(path):
+                return "stream"
+        return "default"
+
+    def snapshot(self) -> Dict[str, Any]:
+        classes = {name: route_class.snapshot() for name, route_class in self.classes.items()}
+        return {
+            "timeout_seconds": self.timeout,
+            # Scale out when the busiest class stays above 1.0; a few long exports are no reason to
+            "saturation": max(c["utilization"] for name, c in classes.items() if name != "stream"),
+            "classes": classes
+        }
+
+class AdmissionMiddleware:
+    """ASGI middleware answering 503 + Retry-After instead of queueing past the deadline"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = self.controller.classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self.controller.classes[name]
+        deadline = time.monotonic() + self.controller.timeout
+        try:
+            await route_class.acquire(deadline)
+        except Overloaded as e:
+            await self._reject(send, name, e)
+            return
+
+        # The LLM scheduler and the recipe retry loop budget against the same deadline
+        token = _request_deadline.set(deadline)
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_deadline.reset(token)
+            route_class.release(time.monotonic() - start)
+
+    async def _reject(self, send, name: str, error: Overloaded):
+        retry_after = min(max(1, math.ceil(error.retry_after)), max(1, math.ceil(self.controller.timeout)))
+        body = json.dumps({"detail": f"Server is busy: {error.reason}", "route_class": name}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(retry_after).encode("latin-1")),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,162 @@
+#compression.py
+from typing import List, Optional, Tuple
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+def _parse_accept_encoding(header: str) -> dict:
+    weights = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name.strip().lower()] = quality
+    return weights
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Brotli when the client takes it and the module is installed, else gzip"""
+    weights = _parse_accept_encoding(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = weights.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+class _Encoder:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+class CompressionMiddleware:
+    """
+    ASGI middleware applying negotiated brotli/gzip to JSON and text bodies of
+    at least `minimum_size` bytes. Streaming responses are compressed chunk by
+    chunk. Strong ETags get a content-coding suffix so each variant keeps a
+    distinct validator.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = start_message.get("headers", [])
+                if not self._should_compress(start_message["status"], headers, body, more_body):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                compressed = encoder.compress(body)
+                if not more_body:
+                    compressed += encoder.flush()
+                await send({**start_message, "headers": self._rewrite_headers(headers, encoding, compressed, more_body)})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+
+            chunk = encoder.compress(body)
+            if not more_body:
+                chunk += encoder.flush()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, more_body: bool) -> bool:
+        if status < 200 or status in (204, 304):
+            return False
+        content_type = b""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        if not content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES):
+            return False
+        # Streaming bodies are compressed regardless of the first chunk's size
+        return more_body or len(body) >= self.minimum_size
+
+    def _rewrite_headers(
+        self, headers: List[Tuple[bytes, bytes]], encoding: str, body: bytes, more_body: bool
+    ) -> List[Tuple[bytes, bytes]]:
+        token = encoding.encode("latin-1")
+        rewritten = []
+        vary_set = False
+        for name, value in headers:
+            if name == b"content-length":
+                continue
+            if name == b"etag" and value.endswith(b'"') and not value.startswith(b"W/"):
+                value = value[:-1] + b"-" + token + b'"'
+            if name == b"vary":
+                vary_set = True
+                if b"accept-encoding" not in value.lower():
+                    value += b", Accept-Encoding"
+            rewritten.append((name, value))
+        rewritten.append((b"content-encoding", token))
+        if not vary_set:
+            rewritten.append((b"vary", b"Accept-Encoding"))
+        if not more_body:
+            rewritten.append((b"content-length", str(len(body)).encode("latin-1")))
+        return rewritten
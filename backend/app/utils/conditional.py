@@ -0,0 +1,43 @@
+#conditional.py
+from typing import Any
+import hashlib
+
+from fastapi import Request, Response
+
+# Content-coding suffixes CompressionMiddleware appends to strong ETags
+ENCODING_SUFFIXES = ("-gzip", "-br")
+
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(user_id: str, resource: str, *parts: Any) -> str:
+    """
+    Strong ETag for a per-user resource. `parts` are the user's version
+    counters the resource depends on plus any query parameters, so the tag
+    changes exactly when the payload can.
+    """
+    key = ":".join([user_id, resource, *(str(part) for part in parts)])
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest()[:24] + '"'
+
+def _normalize(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison; any content-coding variant of the tag matches"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(_normalize(candidate) == etag for candidate in header.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
@@ -0,0 +1,80 @@
+#export.py
+from typing import Any, Dict, Iterable, List
+import csv
+import io
+
+from app.utils.nutrition import NUTRIENTS
+from app.utils.responses import dumps
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+_BASE_COLUMNS = (
+    "id", "created_at", "title", "description", "cuisine_type", "difficulty", "prep_time", "cook_time",
+    "total_time", "servings", *NUTRIENTS, "ingredients", "instructions", "tags", "ingredients_used",
+    "input_method", "recipe_hash", "near_duplicate_of",
+)
+
+# A text cell starting with one of these is run as a formula by spreadsheet apps
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def export_record(entry: Dict[str, Any], include_mood: bool) -> Dict[str, Any]:
+    """A hydrated history entry as exported: `_id` as `id`, mood only when asked for"""
+    record = {"id": str(entry["_id"]), **{k: v for k, v in entry.items() if k not in ("_id", "user_id")}}
+    if not include_mood:
+        record.pop("mood", None)
+    return record
+
+def csv_columns(include_mood: bool, include_favorites: bool) -> List[str]:
+    columns = list(_BASE_COLUMNS)
+    if include_mood:
+        columns.insert(2, "mood")
+    if include_favorites:
+        columns.append("favorite")
+    return columns
+
+def _csv_row(record: Dict[str, Any], columns: List[str]) -> List[Any]:
+    """
+    One flat row: recipe fields and nutrition lifted to the top, lists joined
+    with ' | '. Text that a spreadsheet would read as a formula is prefixed
+    with a quote (the model writes these fields, so treat them as untrusted).
+    """
+    recipe = record.get("recipe") or {}
+    nutrition = recipe.get("nutrition_info") or {}
+    if nutrition.get("available") is False:
+        # Zeros stand in for unknown values; leave the cells empty
+        nutrition = {}
+    flat = {**recipe, **nutrition, **record}
+    duplicate = record.get("near_duplicate_of")
+    flat["near_duplicate_of"] = duplicate.get("recipe_hash") if isinstance(duplicate, dict) else duplicate
+    created = flat.get("created_at")
+    if hasattr(created, "isoformat"):
+        flat["created_at"] = created.isoformat()
+    row = []
+    for column in columns:
+        value = flat.get(column)
+        if isinstance(value, (list, tuple)):
+            value = " | ".join(str(item) for item in value)
+        if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+            value = "'" + value
+        row.append("" if value is None else value)
+    return row
+
+def encode_ndjson(records: Iterable[Dict[str, Any]]) -> bytes:
+    return b"".join(dumps(record) + b"\n" for record in records)
+
+class CSVEncoder:
+    """Encodes batches of export records to CSV, the header ahead of the first batch"""
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\r\n")
+        self._writer.writerow(columns)
+
+    def encode(self, records: Iterable[Dict[str, Any]]) -> bytes:
+        self._writer.writerows(_csv_row(record, self.columns) for record in records)
+        data = self._buffer.getvalue().encode("utf-8")
+        # Reuse the buffer so memory stays at one batch
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
@@ -0,0 +1,77 @@
+#factorization.py
+from typing import Tuple
+
+import numpy as np
+
+class SparseMatrix:
+    """
+    Minimal compressed sparse matrix on plain NumPy arrays: just what a
+    randomized SVD needs, A @ X and A.T @ X for dense X. Entries are kept
+    twice, sorted by row and sorted by column, so both products are a gather
+    plus a segmented sum.
+    """
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray, shape: Tuple[int, int]):
+        self.shape = shape
+        # Sum duplicate (row, col) entries
+        keys = rows.astype(np.int64) * shape[1] + cols
+        keys, inverse = np.unique(keys, return_inverse=True)
+        values = np.bincount(inverse, weights=values).astype(np.float32)
+        self.rows = (keys // shape[1]).astype(np.int64)
+        self.cols = (keys % shape[1]).astype(np.int64)
+        self.values = values
+        self._by_col = np.argsort(self.cols, kind="stable")
+
+    @property
+    def nnz(self) -> int:
+        return len(self.values)
+
+    @staticmethod
+    def _segment_sum(products: np.ndarray, segments: np.ndarray, size: int) -> np.ndarray:
+        out = np.zeros((size, products.shape[1]), dtype=np.float32)
+        if len(segments) == 0:
+            return out
+        # Entries are sorted by segment, so each run is one reduceat slice
+        starts = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+        out[segments[starts]] = np.add.reduceat(products, starts, axis=0)
+        return out
+
+    def dot(self, dense: np.ndarray) -> np.ndarray:
+        """A @ dense"""
+        return self._segment_sum(self.values[:, None] * dense[self.cols], self.rows, self.shape[0])
+
+    def tdot(self, dense: np.ndarray) -> np.ndarray:
+        """A.T @ dense"""
+        order = self._by_col
+        return self._segment_sum(
+            self.values[order, None] * dense[self.rows[order]], self.cols[order], self.shape[1]
+        )
+
+def randomized_svd(
+    matrix: SparseMatrix,
+    rank: int,
+    oversample: int = 10,
+    power_iterations: int = 2,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Truncated SVD by random projection (Halko, Martinsson & Tropp): sample the
+    range of A with a Gaussian sketch, sharpen it with a few power iterations,
+    then take the exact SVD of the small projected matrix. Returns U, S, Vt
+    with `rank` components.
+    """
+    rank = max(1, min(rank, *matrix.shape))
+    width = min(rank + oversample, *matrix.shape)
+    rng = np.random.default_rng(seed)
+
+    sketch = matrix.dot(rng.standard_normal((matrix.shape[1], width)).astype(np.float32))
+    basis, _ = np.linalg.qr(sketch)
+    for _ in range(power_iterations):
+        # Re-orthonormalise each half step so small singular values survive float32
+        basis, _ = np.linalg.qr(matrix.tdot(basis))
+        basis, _ = np.linalg.qr(matrix.dot(basis))
+
+    projected = matrix.tdot(basis).T  # (width x cols) = Q.T @ A
+    small_u, singular, vt = np.linalg.svd(projected, full_matrices=False)
+    u = basis @ small_u
+    return u[:, :rank], singular[:rank], vt[:rank]
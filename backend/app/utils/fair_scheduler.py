@@ -0,0 +1,274 @@
+#fair_scheduler.py
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+from app.core.config import get_settings
+from app.utils.admission import remaining_budget
+from app.utils.exceptions import CustomException
+from app.utils.metrics import (
+    LLM_SCHEDULER_DECISIONS, LLM_SCHEDULER_QUEUED, LLM_SCHEDULER_WAIT, REGISTRY, DerivedGauge
+)
+
+ANONYMOUS = "anonymous"
+
+# (key, weight) of whoever the current request runs for; set by get_current_user
+_scheduling_key: ContextVar[Tuple[str, float]] = ContextVar("llm_scheduling_key", default=(ANONYMOUS, 1.0))
+# The slot held in this context; nested slot() calls of its task run inside it.
+# Tasks spawned meanwhile copy the context, hence the task check.
+_slot_holder: ContextVar[Optional["HeldSlot"]] = ContextVar("llm_slot_holder", default=None)
+
+def set_scheduling_key(key: str, weight: float = 1.0):
+    _scheduling_key.set((key, weight))
+
+def current_scheduling_key() -> Tuple[str, float]:
+    return _scheduling_key.get()
+
+def is_fair_share_rejection(error: BaseException) -> bool:
+    """True for a 429 charged to one user's bucket or queue; another user's call may well go through"""
+    return isinstance(error, CustomException) and error.error_code == "LLM_FAIR_SHARE_EXCEEDED"
+
+class UserState:
+    def __init__(self, key: str, burst: float, now: float):
+        self.key = key
+        self.tokens = burst
+        self.refilled_at = now
+        self.last_finish = 0.0
+        self.queued = 0
+        self.in_flight = 0
+        self.dispatched = 0
+        self.throttled = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "tokens": round(self.tokens, 2),
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "dispatched": self.dispatched,
+            "throttled": self.throttled
+        }
+
+class HeldSlot:
+    def __init__(self, task: Optional[asyncio.Task], user: UserState, weight: float):
+        self.task = task
+        self.user: Optional[UserState] = user
+        self.weight = weight
+
+class FairScheduler:
+    """
+    Weighted fair queueing of LLM calls across users (self-clocked: the
+    virtual clock is the finish tag of the last call dispatched).
+
+    Each call gets finish tag max(virtual time, user's last finish) + 1/weight
+    and waiting calls are dispatched lowest tag first. A user who keeps many
+    calls queued pushes their own tags ahead, so another user's next call
+    overtakes them. Per-user token buckets cap the sustained call rate and
+    a per-user queue cap bounds what one user can park here.
+    Runs on the event loop only.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        rate_per_minute: float,
+        burst: int,
+        max_queued_per_user: int,
+        queue_timeout: float
+    ):
+        self.capacity = capacity
+        self.rate = rate_per_minute / 60
+        self.burst = float(burst)
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.virtual_time = 0.0
+        self.users: Dict[str, UserState] = {}
+        self._heap: List[Tuple[float, int, asyncio.Future, UserState]] = []
+        self._sequence = itertools.count()
+        self._calls = 0
+
+    def _user(self, key: str, now: float) -> UserState:
+        user = self.users.get(key)
+        if user is None:
+            user = self.users[key] = UserState(key, self.burst, now)
+        return user
+
+    def _refill(self, user: UserState, now: float):
+        user.tokens = min(self.burst, user.tokens + (now - user.refilled_at) * self.rate)
+        user.refilled_at = now
+
+    def _refund(self, user: UserState):
+        """Give back the token of a call that never ran"""
+        user.tokens = min(self.burst, user.tokens + 1)
+
+    def _reject(self, user: UserState, outcome: str, status_code: int, detail: str, retry_after: float):
+        user.throttled += 1
+        LLM_SCHEDULER_DECISIONS.inc((outcome,))
+        raise CustomException(
+            status_code=status_code,
+            detail=detail,
+            error_code="LLM_FAIR_SHARE_EXCEEDED" if status_code == 429 else "LLM_QUEUE_TIMEOUT",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def acquire(self, key: str, weight: float = 1.0, charge: bool = True) -> UserState:
+        """Wait for a slot; charge=False re-takes one for a call already paid for and admitted"""
+        now = time.monotonic()
+        self._calls += 1
+        if self._calls % 256 == 0:
+            self._prune(now)
+
+        user = self._user(key, now)
+        self._refill(user, now)
+        if charge:
+            if user.tokens < 1:
+                self._reject(user, "throttled", 429, "Too many AI requests. Please slow down.", (1 - user.tokens) / self.rate)
+            if user.queued >= self.max_queued_per_user:
+                self._reject(user, "queue_full", 429, "Too many AI requests waiting. Please retry shortly.", 1 / self.rate)
+            user.tokens -= 1
+
+        finish = max(self.virtual_time, user.last_finish) + 1 / weight
+        user.last_finish = finish
+
+        if self.in_flight < self.capacity:
+            self._dispatch(user, finish)
+            LLM_SCHEDULER_DECISIONS.inc(("dispatched",))
+            return user
+
+        # Never queue past the request's own deadline
+        timeout = self.queue_timeout
+        budget = remaining_budget()
+        if budget is not None:
+            timeout = max(0.0, min(timeout, budget))
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (finish, next(self._sequence), waiter, user))
+        user.queued += 1
+        LLM_SCHEDULER_QUEUED.inc()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if charge:
+                self._refund(user)
+            self._reject(user, "timed_out", 503, "AI service is busy. Please try again shortly.", self.queue_timeout)
+        except BaseException:
+            # Cancelled; give back the token, and a slot that was already handed over
+            if charge:
+                self._refund(user)
+            if waiter.done() and not waiter.cancelled():
+                self.release(user)
+            raise
+        finally:
+            user.queued -= 1
+            LLM_SCHEDULER_QUEUED.dec()
+        LLM_SCHEDULER_WAIT.observe(time.monotonic() - start)
+        LLM_SCHEDULER_DECISIONS.inc(("queued",))
+        return user
+
+    def _dispatch(self, user: UserState, finish: float):
+        self.in_flight += 1
+        user.in_flight += 1
+        user.dispatched += 1
+        self.virtual_time = max(self.virtual_time, finish)
+
+    def release(self, user: UserState):
+        self.in_flight -= 1
+        user.in_flight -= 1
+        while self._heap:
+            finish, _, waiter, next_user = heapq.heappop(self._heap)
+            if not waiter.done():
+                self._dispatch(next_user, finish)
+                waiter.set_result(None)
+                return
+
+    @asynccontextmanager
+    async def slot(self, key: Optional[str] = None, weight: Optional[float] = None):
+        """
+        Hold one LLM slot for the duration of a call; defaults to the current
+        request's user. Re-entrant: calls made while the task already holds a
+        slot (every attempt of a retry loop) run in it and cost no token.
+        """
+        task = asyncio.current_task()
+        held = _slot_holder.get()
+        if held is not None and held.task is task:
+            yield
+            return
+        current_key, current_weight = current_scheduling_key()
+        weight = weight or current_weight
+        held = HeldSlot(task, await self.acquire(key or current_key, weight), weight)
+        holder = _slot_holder.set(held)
+        try:
+            yield
+        finally:
+            _slot_holder.reset(holder)
+            if held.user is not None:
+                self.release(held.user)
+
+    @asynccontextmanager
+    async def paused(self):
+        """
+        Give up the slot this task holds for a while (a retry backoff) and
+        take it back afterwards, queueing fairly but without another token.
+        A no-op outside slot().
+        """
+        held = _slot_holder.get()
+        if held is None or held.task is not asyncio.current_task() or held.user is None:
+            yield
+            return
+        user, held.user = held.user, None
+        self.release(user)
+        try:
+            yield
+        finally:
+            held.user = await self.acquire(user.key, held.weight, charge=False)
+
+    def _prune(self, now: float):
+        """Forget idle users whose bucket is full again and who hold no fair-share credit"""
+        for key in [k for k, user in self.users.items() if not user.queued and not user.in_flight]:
+            user = self.users[key]
+            self._refill(user, now)
+            if user.tokens >= self.burst and user.last_finish <= self.virtual_time:
+                del self.users[key]
+
+    def active_users(self) -> List[UserState]:
+        return [user for user in self.users.values() if user.queued or user.in_flight]
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        """Aggregate state plus the busiest users' counters, without their ids"""
+        busiest = sorted(self.users.values(), key=lambda u: (-(u.queued + u.in_flight), -u.throttled))[:top]
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queued": len([entry for entry in self._heap if not entry[2].done()]),
+            "tracked_users": len(self.users),
+            "rate_per_minute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "max_queued_per_user": self.max_queued_per_user,
+            "users": [user.snapshot() for user in busiest]
+        }
+
+@lru_cache()
+def get_llm_scheduler() -> FairScheduler:
+    settings = get_settings()
+    return FairScheduler(
+        capacity=settings.LLM_MAX_CONCURRENCY,
+        rate_per_minute=settings.LLM_USER_RATE_PER_MINUTE,
+        burst=settings.LLM_USER_BURST,
+        max_queued_per_user=settings.LLM_USER_MAX_QUEUED,
+        queue_timeout=settings.LLM_QUEUE_TIMEOUT
+    )
+
+# Only users with calls queued or running appear, which keeps label cardinality bounded
+REGISTRY.register(DerivedGauge(
+    "llm_scheduler_user_queued", "LLM calls waiting per active user", ("user",),
+    lambda: {(user.key,): user.queued for user in get_llm_scheduler().active_users()}))
+REGISTRY.register(DerivedGauge(
+    "llm_scheduler_user_in_flight", "LLM calls running per active user", ("user",),
+    lambda: {(user.key,): user.in_flight for user in get_llm_scheduler().active_users()}))
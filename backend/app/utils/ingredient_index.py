@@ -0,0 +1,158 @@
+#ingredient_index.py
+from array import array
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+import heapq
+
+from app.utils.ingredients import PANTRY_STAPLES, canonical_set, conflicts
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+class IngredientIndex:
+    """
+    In-memory inverted index from canonical ingredient ids to recipes.
+
+    Ingredient names and recipes both get dense integer ids. Each ingredient
+    keeps a posting list of recipe ids in an unsigned int array (ids only
+    ever grow, so appends keep it sorted), and each recipe keeps its
+    ingredients as a bitset over ingredient ids, so pantry and exclusion
+    checks are single AND operations.
+    """
+
+    def __init__(self):
+        self.ingredient_ids: Dict[str, int] = {}
+        self.ingredient_names: List[str] = []
+        self.postings: Dict[int, array] = {}
+        self.recipe_ids: Dict[str, int] = {}
+        self.recipes: List[Dict[str, Any]] = []
+        self.recipe_bits: List[int] = []
+        self.staple_bits = 0
+        self._exclusions: Dict[FrozenSet[str], int] = {}
+        self._exclusions_vocabulary = 0
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def __contains__(self, recipe_hash: str) -> bool:
+        return recipe_hash in self.recipe_ids
+
+    def _ingredient_id(self, name: str) -> int:
+        ingredient_id = self.ingredient_ids.get(name)
+        if ingredient_id is None:
+            ingredient_id = self.ingredient_ids[name] = len(self.ingredient_names)
+            self.ingredient_names.append(name)
+            self.postings[ingredient_id] = array("I")
+            if name in PANTRY_STAPLES:
+                self.staple_bits |= 1 << ingredient_id
+        return ingredient_id
+
+    def bits_for(self, names: Iterable[str]) -> int:
+        bits = 0
+        for name in names:
+            ingredient_id = self.ingredient_ids.get(name)
+            if ingredient_id is not None:
+                bits |= 1 << ingredient_id
+        return bits
+
+    def names_for(self, bits: int) -> List[str]:
+        names = []
+        while bits:
+            low = bits & -bits
+            names.append(self.ingredient_names[low.bit_length() - 1])
+            bits ^= low
+        return names
+
+    def add(self, recipe_hash: str, recipe: Dict[str, Any]) -> bool:
+        """Index one recipe; False when it is already indexed or has no usable ingredients"""
+        if recipe_hash in self.recipe_ids:
+            return False
+        names = canonical_set(recipe.get("ingredients") or [])
+        if not names:
+            return False
+
+        recipe_id = len(self.recipes)
+        bits = 0
+        for name in names:
+            ingredient_id = self._ingredient_id(name)
+            self.postings[ingredient_id].append(recipe_id)
+            bits |= 1 << ingredient_id
+
+        self.recipe_ids[recipe_hash] = recipe_id
+        self.recipe_bits.append(bits)
+        self.recipes.append({
+            "recipe_hash": recipe_hash,
+            "title": recipe.get("title"),
+            "cuisine_type": recipe.get("cuisine_type"),
+            "total_time": recipe.get("total_time"),
+        })
+        return True
+
+    def exclusion_bits(self, excluded: FrozenSet[str]) -> int:
+        """Bitset of every indexed ingredient that hits an excluded name or word"""
+        if not excluded:
+            return 0
+        if self._exclusions_vocabulary != len(self.ingredient_names):
+            # New ingredients arrived; cached masks may miss them
+            self._exclusions = {}
+            self._exclusions_vocabulary = len(self.ingredient_names)
+        bits = self._exclusions.get(excluded)
+        if bits is None:
+            bits = 0
+            for ingredient_id, name in enumerate(self.ingredient_names):
+                if conflicts(name, excluded):
+                    bits |= 1 << ingredient_id
+            self._exclusions[excluded] = bits
+        return bits
+
+    def search(
+        self,
+        pantry: Iterable[str],
+        excluded: FrozenSet[str] = frozenset(),
+        limit: int = 10,
+        max_missing: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recipes sharing at least one ingredient with the pantry, ranked by how
+        many pantry ingredients they use, then by fewest missing ones. Pantry
+        staples never count as missing; excluded ingredients drop a recipe.
+        """
+        pantry_names = canonical_set(pantry)
+        pantry_ids = [self.ingredient_ids[name] for name in pantry_names if name in self.ingredient_ids]
+        if not pantry_ids:
+            return []
+        have = self.bits_for(pantry_names) | self.staple_bits
+        exclude = self.exclusion_bits(excluded)
+
+        # Merge the posting lists: how many pantry ingredients each recipe uses
+        matched = Counter()
+        for ingredient_id in pantry_ids:
+            matched.update(self.postings[ingredient_id])
+
+        candidates = []
+        for recipe_id, used in matched.items():
+            bits = self.recipe_bits[recipe_id]
+            if bits & exclude:
+                continue
+            missing = popcount(bits & ~have)
+            if max_missing is not None and missing > max_missing:
+                continue
+            candidates.append((used, -missing, -recipe_id, recipe_id))
+
+        results = []
+        for used, negative_missing, _, recipe_id in heapq.nlargest(limit, candidates):
+            bits = self.recipe_bits[recipe_id]
+            results.append({
+                **self.recipes[recipe_id],
+                "coverage": round(used / len(pantry_names), 3),
+                "matched_ingredients": self.names_for(bits & have & ~self.staple_bits),
+                "missing_ingredients": self.names_for(bits & ~have),
+            })
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "recipes": len(self.recipes),
+            "ingredients": len(self.ingredient_names),
+            "postings": sum(len(p) for p in self.postings.values())
+        }
@@ -0,0 +1,171 @@
+#ingredients.py
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Set
+import re
+
+# Units and sizes that precede the ingredient in "2 cups diced tomatoes"
+UNITS = {
+    "g", "gram", "kg", "kilogram", "mg", "ml", "l", "liter", "litre", "cup", "tbsp", "tablespoon",
+    "tsp", "teaspoon", "oz", "ounce", "lb", "pound", "pinch", "dash", "can", "jar", "package",
+    "packet", "slice", "piece", "handful", "bunch", "stalk", "sprig", "clove", "head", "fillet",
+    "large", "medium", "small", "whole", "half", "quarter", "few", "some", "of", "a", "an",
+}
+
+# Preparation and cut words that do not change what the ingredient is
+DESCRIPTORS = {
+    "fresh", "freshly", "chopped", "finely", "roughly", "diced", "minced", "sliced", "thinly",
+    "grated", "shredded", "crushed", "ground", "cooked", "uncooked", "raw", "boneless", "skinless",
+    "breast", "thigh", "drumstick", "peeled", "deveined", "dried", "frozen", "canned", "ripe",
+    "optional", "organic", "plain", "unsalted", "salted", "extra", "virgin", "lean", "cubed",
+    "halved", "beaten", "softened", "melted", "boiled", "steamed", "roasted", "toasted", "leftover",
+}
+
+ALIASES = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "garbanzo bean": "chickpea",
+    "garbanzo": "chickpea",
+    "coriander leaf": "cilantro",
+    "capsicum": "bell pepper",
+    "aubergine": "eggplant",
+    "courgette": "zucchini",
+    "prawn": "shrimp",
+    "mince": "beef",
+    "minced meat": "beef",
+    "curd": "yogurt",
+    "yoghurt": "yogurt",
+    "chilli": "chili",
+    "chile": "chili",
+    "spaghetti": "pasta",
+    "penne": "pasta",
+    "macaroni": "pasta",
+    "olive oil": "oil",
+    "vegetable oil": "oil",
+    "canola oil": "oil",
+    "sunflower oil": "oil",
+    "black pepper": "pepper",
+    "sea salt": "salt",
+    "kosher salt": "salt",
+}
+
+# Assumed to be in every kitchen; the recipe prompt lets the model add them freely
+PANTRY_STAPLES = frozenset({"salt", "pepper", "oil", "water", "sugar", "butter"})
+
+# Plurals the suffix rules below get wrong
+_IRREGULAR = {"leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife", "molasses": "molasses",
+              "hummus": "hummus", "couscous": "couscous", "asparagus": "asparagus", "citrus": "citrus",
+              "swiss": "swiss", "lentils": "lentil", "greens": "greens", "oats": "oat"}
+
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+# Numbers, ranges and units glued to them: "2", "1/2", "2-3", "500g", "8oz"
+_QUANTITY = re.compile(r"\d+(?:[.,/-]\d+)*\s?(?:g|kg|mg|ml|l|oz|lbs?)?\b|[¼-¾⅐-⅞]")
+_NON_WORD = re.compile(r"[^a-z\s-]")
+
+def _singular(word: str) -> str:
+    if word in _IRREGULAR:
+        return _IRREGULAR[word]
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+@lru_cache(maxsize=8192)
+def canonical_ingredient(text: str) -> str:
+    """
+    Reduce a free-text ingredient line to a canonical name:
+    "2 cups finely chopped Tomatoes (ripe), to taste" -> "tomato".
+    Returns "" when nothing ingredient-like is left.
+    """
+    text = _PARENTHETICAL.sub(" ", text.lower())
+    # "chicken, diced" / "basil for garnish" / "salt to taste"
+    text = re.split(r",|\bfor\b|\bto taste\b|\bor\b", text)[0]
+    text = _QUANTITY.sub(" ", text)
+    text = _NON_WORD.sub(" ", text)
+    words = [_singular(w) for w in text.replace("-", " ").split()]
+    words = [w for w in words if w not in UNITS and w not in DESCRIPTORS]
+    name = " ".join(words)
+    return ALIASES.get(name, name)
+
+def canonical_set(items: Iterable[str]) -> Set[str]:
+    """Canonical names of a list of ingredient lines; "salt and pepper" counts as two"""
+    names = set()
+    for item in items:
+        for part in re.split(r"\band\b|&", item):
+            name = canonical_ingredient(part)
+            if name:
+                names.add(name)
+    return names
+
+# Ingredient groups behind allergies and dietary restrictions. A recipe
+# ingredient conflicts when its name, or any word of it, is in the group
+# ("almond flour" hits tree nuts), which errs on the side of excluding.
+MEAT = frozenset({
+    "chicken", "beef", "pork", "lamb", "bacon", "ham", "sausage", "turkey", "duck", "veal", "steak",
+    "prosciutto", "salami", "chorizo", "pepperoni", "goat", "venison", "meatball", "gelatin",
+})
+FISH = frozenset({"fish", "salmon", "tuna", "cod", "tilapia", "sardine", "anchovy", "mackerel", "trout", "halibut", "fish sauce"})
+SHELLFISH = frozenset({"shrimp", "crab", "lobster", "scallop", "mussel", "clam", "oyster", "squid", "octopus"})
+DAIRY = frozenset({
+    "milk", "butter", "cheese", "cream", "yogurt", "parmesan", "mozzarella", "cheddar", "feta", "ghee",
+    "paneer", "ricotta", "sour cream", "cream cheese", "buttermilk", "whey", "custard", "ice cream",
+})
+EGG = frozenset({"egg", "mayonnaise", "meringue"})
+GLUTEN = frozenset({
+    "flour", "wheat", "bread", "pasta", "noodle", "couscous", "barley", "rye", "breadcrumb", "tortilla",
+    "soy sauce", "seitan", "bulgur", "semolina", "cracker", "pita", "bun", "croissant", "spelt",
+})
+TREE_NUTS = frozenset({"almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia", "nut", "praline"})
+PEANUT = frozenset({"peanut", "peanut butter"})
+SOY = frozenset({"soy", "soy sauce", "tofu", "edamame", "tempeh", "miso", "soybean"})
+SESAME = frozenset({"sesame", "tahini"})
+HIGH_CARB = frozenset({"rice", "pasta", "bread", "potato", "flour", "noodle", "tortilla", "oat", "corn", "sugar", "honey", "couscous", "quinoa"})
+GRAINS = frozenset({"rice", "pasta", "bread", "flour", "noodle", "tortilla", "oat", "corn", "couscous", "quinoa", "barley", "wheat"})
+LEGUMES = frozenset({"bean", "lentil", "chickpea", "peanut", "soy", "tofu", "pea"})
+
+ALLERGEN_GROUPS: Dict[str, FrozenSet[str]] = {
+    "nut": TREE_NUTS | PEANUT,
+    "tree nut": TREE_NUTS,
+    "peanut": PEANUT,
+    "dairy": DAIRY,
+    "milk": DAIRY,
+    "lactose": DAIRY,
+    "egg": EGG,
+    "gluten": GLUTEN,
+    "wheat": GLUTEN,
+    "celiac": GLUTEN,
+    "fish": FISH,
+    "shellfish": SHELLFISH,
+    "seafood": FISH | SHELLFISH,
+    "soy": SOY,
+    "sesame": SESAME,
+}
+
+DIET_EXCLUSIONS: Dict[str, FrozenSet[str]] = {
+    "vegetarian": MEAT | FISH | SHELLFISH,
+    "vegan": MEAT | FISH | SHELLFISH | DAIRY | EGG | frozenset({"honey"}),
+    "gluten_free": GLUTEN,
+    "dairy_free": DAIRY,
+    "nut_free": TREE_NUTS | PEANUT,
+    "keto": HIGH_CARB,
+    "low_carb": HIGH_CARB,
+    "paleo": GRAINS | LEGUMES | DAIRY | frozenset({"sugar"}),
+}
+
+def excluded_names(allergies: Iterable[str], dietary_preferences: Iterable[str]) -> FrozenSet[str]:
+    """Ingredient names and words a user must not be served"""
+    names: Set[str] = set()
+    for allergy in allergies:
+        name = canonical_ingredient(allergy)
+        if name:
+            names |= ALLERGEN_GROUPS.get(name, {name})
+    for preference in dietary_preferences:
+        names |= DIET_EXCLUSIONS.get(str(getattr(preference, "value", preference)), frozenset())
+    return frozenset(names)
+
+def conflicts(name: str, excluded: FrozenSet[str]) -> bool:
+    return name in excluded or any(word in excluded for word in name.split())
@@ -0,0 +1,341 @@
+#metrics.py
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+import threading
+import time
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+class _ShardedValues:
+    """
+    One value dict per writing thread.
+
+    A writer only ever touches its own dict, so the hot path takes no lock;
+    the registration lock is hit once per thread. Scrapes merge the shards.
+    Event-loop code and Motor's worker threads (Mongo listener) both write here.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._register_lock = threading.Lock()
+
+    def shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._register_lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def snapshots(self) -> List[dict]:
+        with self._register_lock:
+            shards = list(self._shards)
+        # dict.copy() runs under the GIL, so a concurrent writer cannot tear it
+        return [shard.copy() for shard in shards]
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = _ShardedValues()
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        shard = self._values.shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def collect(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for shard in self._values.snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def samples(self):
+        for labels, value in sorted(self.collect().items()):
+            yield "_total", labels, value
+
+class Gauge(Counter):
+    """Up/down gauge; use either set() or inc()/dec() on a given label set"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._fixed: Dict[Labels, float] = {}
+
+    def dec(self, labels: Labels = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Labels = ()):
+        self._fixed[labels] = value
+
+    def collect(self) -> Dict[Labels, float]:
+        totals = super().collect()
+        for labels, value in self._fixed.copy().items():
+            totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def samples(self):
+        for labels, value in sorted(self.collect().items()):
+            yield "", labels, value
+
+class DerivedGauge(Metric):
+    """Gauge computed at scrape time, e.g. a ratio of two counters"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], compute: Callable[[], Dict[Labels, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.compute = compute
+
+    def samples(self):
+        for labels, value in sorted(self.compute().items()):
+            yield "", labels, value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = _ShardedValues()
+
+    def observe(self, value: float, labels: Labels = ()):
+        shard = self._values.shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts (+Inf last), then sum, then count
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, labels: Labels = ()):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, labels)
+
+    def samples(self):
+        merged: Dict[Labels, list] = {}
+        for shard in self._values.snapshots():
+            for labels, state in shard.items():
+                state = list(state)
+                if labels in merged:
+                    merged[labels] = [a + b for a, b in zip(merged[labels], state)]
+                else:
+                    merged[labels] = state
+
+        for labels, state in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                yield "_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield "_sum", labels, state[-2]
+            yield "_count", labels, state[-1]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Labels, values: tuple) -> str:
+    if not values:
+        return ""
+    pairs = []
+    for index, value in enumerate(values):
+        # Histogram buckets append ("le", bound) after the declared labels
+        name, value = value if isinstance(value, tuple) else (names[index], value)
+        pairs.append(f'{name}="{_escape(value)}"')
+    return "{" + ",".join(pairs) + "}"
+
+REGISTRY = MetricsRegistry()
+
+# HTTP
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests", "HTTP requests by route template and status", ("method", "route", "status")))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")))
+HTTP_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served"))
+
+# LLM backends (Gemini or the local stand-in)
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "llm_requests", "LLM calls by backend, operation and outcome", ("backend", "operation", "outcome")))
+LLM_LATENCY = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "LLM call latency", ("backend", "operation")))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "llm_requests_in_flight", "LLM calls currently awaiting a response", ("backend",)))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens", "Tokens reported by the LLM backend", ("backend", "operation", "kind")))
+
+# Per-user fair scheduling of LLM calls
+LLM_SCHEDULER_DECISIONS = REGISTRY.register(Counter(
+    "llm_scheduler_decisions", "LLM scheduler decisions by outcome", ("outcome",)))
+LLM_SCHEDULER_WAIT = REGISTRY.register(Histogram(
+    "llm_scheduler_queue_wait_seconds", "Time LLM calls spent waiting for a fair-share slot"))
+LLM_SCHEDULER_QUEUED = REGISTRY.register(Gauge(
+    "llm_scheduler_queued", "LLM calls waiting for a slot"))
+
+# Google Cloud Vision
+VISION_REQUESTS = REGISTRY.register(Counter(
+    "vision_requests", "Vision API calls by feature and outcome", ("feature", "outcome")))
+VISION_LATENCY = REGISTRY.register(Histogram(
+    "vision_request_duration_seconds", "Vision API call latency", ("feature",)))
+VISION_QUOTA_REMAINING = REGISTRY.register(Gauge(
+    "vision_quota_remaining", "Vision API units left in the monthly budget"))
+
+# MongoDB
+MONGO_COMMANDS = REGISTRY.register(Counter(
+    "mongo_commands", "MongoDB commands by name and outcome", ("command", "outcome")))
+MONGO_LATENCY = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("command",), buckets=MONGO_BUCKETS))
+
+# Admission control
+ADMISSION_DECISIONS = REGISTRY.register(Counter(
+    "admission_decisions", "Admission decisions by route class and outcome", ("route_class", "outcome")))
+ADMISSION_WAIT = REGISTRY.register(Histogram(
+    "admission_queue_wait_seconds", "Time admitted requests spent queued", ("route_class",)))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "admission_in_flight", "Requests holding an admission slot", ("route_class",)))
+ADMISSION_QUEUED = REGISTRY.register(Gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot", ("route_class",)))
+
+# Single-flight coalescing
+COALESCED_CALLS = REGISTRY.register(Counter(
+    "coalesced_calls", "Calls by group and role; each follower is a call that shared a leader's result", ("group", "role")))
+
+# Speculative recipe pre-generation
+PREGENERATED_RECIPES = REGISTRY.register(Counter(
+    "pregenerated_recipes", "Speculative recipes by outcome (generated, failed, served)", ("outcome",)))
+
+# Caches
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "cache_requests", "Cache lookups by cache and result", ("cache", "result")))
+
+def _cache_hit_ratios() -> Dict[Labels, float]:
+    lookups: Dict[str, List[float]] = {}
+    for (cache, result), value in CACHE_REQUESTS.collect().items():
+        hits_total = lookups.setdefault(cache, [0.0, 0.0])
+        hits_total[1] += value
+        if result == "hit":
+            hits_total[0] += value
+    return {(cache,): hits / total for cache, (hits, total) in lookups.items() if total}
+
+CACHE_HIT_RATIO = REGISTRY.register(DerivedGauge(
+    "cache_hit_ratio", "Share of cache lookups served from the cache", ("cache",), _cache_hit_ratios))
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc((cache, "hit" if hit else "miss"))
+
+@contextmanager
+def observe_call(counter: Counter, histogram: Histogram, labels: Labels, classify: Optional[Callable[[Exception], str]] = None):
+    """Time a dependency call and count it as ok or by error class"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        counter.inc(labels + (classify(e) if classify else "error",))
+        raise
+    else:
+        counter.inc(labels + ("ok",))
+    finally:
+        histogram.observe(time.perf_counter() - start, labels)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo listener; runs on Motor's worker threads"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc((event.command_name, "ok"))
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, (event.command_name,))
+
+    def failed(self, event):
+        MONGO_COMMANDS.inc((event.command_name, "error"))
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, (event.command_name,))
+
+MONGO_COMMAND_LISTENER = MongoCommandMetrics()
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count and latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            # Label with the route template, not the raw path, to keep cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUESTS.inc((method, path, str(status[0])))
+            HTTP_LATENCY.observe(time.perf_counter() - start, (method, path))
@@ -0,0 +1,156 @@
+#minhash.py
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+import re
+import zlib
+
+import numpy as np
+
+from app.utils.ingredients import canonical_set
+
+_MAX = np.uint64(0xFFFFFFFF)
+_SHIFT = np.uint64(32)
+# Shingles hashed per matrix product in a batch
+CHUNK_SHINGLES = 65536
+# Words per instruction shingle
+SHINGLE_WORDS = 3
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+def recipe_shingles(recipe: Dict[str, Any]) -> np.ndarray:
+    """
+    Hashed shingles of a recipe: title words, canonical ingredient names and
+    3-word runs of the instructions, each under its own prefix so a word in
+    the title never matches the same word in a step.
+    """
+    items: Set[str] = {"t:" + word for word in _WORD_RE.findall(str(recipe.get("title") or "").lower())}
+    items |= {"i:" + name for name in canonical_set(str(line) for line in recipe.get("ingredients") or [])}
+    words = _WORD_RE.findall(" ".join(str(step) for step in recipe.get("instructions") or []).lower())
+    for start in range(max(len(words) - SHINGLE_WORDS + 1, 0)):
+        items.add("s:" + " ".join(words[start:start + SHINGLE_WORDS]))
+    return np.unique(np.fromiter((zlib.crc32(item.encode("utf-8")) for item in items), dtype=np.uint64, count=len(items)))
+
+class MinHasher:
+    """
+    MinHash signatures with banded LSH keys. Two recipes agree on a signature
+    position with probability equal to the Jaccard similarity of their
+    shingle sets; they share at least one band key with probability
+    1 - (1 - J**rows)**bands, which is high above the duplicate threshold and
+    small well below it.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: the high 32 bits of a * x + b (mod 2**64), odd a
+        self.a = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        # Odd multipliers fold a band's rows into one 32-bit key
+        self.band_mix = rng.integers(0, 2 ** 31, self.rows, dtype=np.uint64) * 2 + 1
+        self.band_offsets = np.arange(bands, dtype=np.int64) << 32
+
+    @property
+    def params(self) -> List[int]:
+        return [self.num_perm, self.bands]
+
+    def signature(self, shingles: np.ndarray) -> Optional[np.ndarray]:
+        """uint32 signature of one shingle set; None when it is empty"""
+        if len(shingles) == 0:
+            return None
+        hashed = (self.a[:, None] * shingles[None, :] + self.b[:, None]) >> _SHIFT
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def signatures(self, shingle_sets: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        Signatures of many recipes, one row each. Shingles are concatenated
+        and hashed in large chunks, and each recipe's minimum is one
+        reduceat slice. Rows of empty sets are all 0xFFFFFFFF.
+        """
+        out = np.full((len(shingle_sets), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        start = 0
+        while start < len(shingle_sets):
+            end, total = start, 0
+            while end < len(shingle_sets) and (end == start or total + len(shingle_sets[end]) <= CHUNK_SHINGLES):
+                total += len(shingle_sets[end])
+                end += 1
+            chunk = [(i, s) for i, s in enumerate(shingle_sets[start:end], start) if len(s)]
+            if chunk:
+                flat = np.concatenate([s for _, s in chunk])
+                hashed = (self.a[:, None] * flat[None, :] + self.b[:, None]) >> _SHIFT
+                offsets = np.cumsum([0] + [len(s) for _, s in chunk[:-1]])
+                out[[i for i, _ in chunk]] = np.minimum.reduceat(hashed, offsets, axis=1).T.astype(np.uint32)
+            start = end
+        return out
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """int64 LSH keys, bands per signature; the band number sits in the high bits"""
+        rows = signatures.reshape(-1, self.bands, self.rows).astype(np.uint64)
+        folded = (rows * self.band_mix).sum(axis=2) & _MAX
+        keys = folded.astype(np.int64) | self.band_offsets
+        return keys if signatures.ndim > 1 else keys[0]
+
+@lru_cache(maxsize=4)
+def get_minhasher(num_perm: int, bands: int) -> MinHasher:
+    return MinHasher(num_perm, bands)
+
+def similarity(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of one signature to each row of `others`"""
+    return (others == signature).mean(axis=-1)
+
+class LSHIndex:
+    """
+    In-memory banded LSH over signatures, for passes over a whole collection.
+    Written recipes are matched against MongoDB instead (a multikey index on
+    the stored band keys), so every worker sees the same index.
+    """
+
+    def __init__(self, hasher: MinHasher):
+        self.hasher = hasher
+        self.ids: List[Hashable] = []
+        self.signatures = np.zeros((0, hasher.num_perm), dtype=np.uint32)
+        self.buckets: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _grow(self, rows: int):
+        capacity = max(rows, len(self.signatures) * 2, 1024)
+        grown = np.zeros((capacity, self.hasher.num_perm), dtype=np.uint32)
+        grown[:len(self.ids)] = self.signatures[:len(self.ids)]
+        self.signatures = grown
+
+    def add(self, key: Hashable, signature: np.ndarray, band_keys: np.ndarray):
+        row = len(self.ids)
+        if row >= len(self.signatures):
+            self._grow(row + 1)
+        self.ids.append(key)
+        self.signatures[row] = signature
+        for band_key in band_keys.tolist():
+            self.buckets.setdefault(band_key, []).append(row)
+
+    def best_match(self, signature: np.ndarray, band_keys: np.ndarray) -> Tuple[Optional[Hashable], float]:
+        """The indexed id most similar to `signature` among its LSH candidates"""
+        rows: Set[int] = set()
+        for band_key in band_keys.tolist():
+            rows.update(self.buckets.get(band_key, ()))
+        if not rows:
+            return None, 0.0
+        candidates = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        scores = similarity(signature, self.signatures[candidates])
+        best = int(np.argmax(scores))
+        return self.ids[candidates[best]], float(scores[best])
+
+def minhash_fields(recipe: Dict[str, Any], hasher: MinHasher) -> Dict[str, Any]:
+    """What the recipes collection stores per recipe for write-time matching; empty without shingles"""
+    signature = hasher.signature(recipe_shingles(recipe))
+    if signature is None:
+        return {}
+    return {
+        "minhash": signature.tobytes(),
+        "minhash_bands": hasher.band_keys(signature).tolist(),
+        "minhash_params": hasher.params
+    }
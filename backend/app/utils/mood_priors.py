@@ -0,0 +1,148 @@
+#mood_priors.py
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.models.schemas import CuisineEnum, MoodEnum
+
+MOODS = tuple(mood.value for mood in MoodEnum)
+CUISINES = tuple(cuisine.value for cuisine in CuisineEnum if cuisine != CuisineEnum.ANY) + ("other",)
+# Hours are UTC; users carry no timezone
+TIME_SLOTS = ("night", "morning", "afternoon", "evening")
+
+MOOD_INDEX = {mood: i for i, mood in enumerate(MOODS)}
+CUISINE_INDEX = {cuisine: i for i, cuisine in enumerate(CUISINES)}
+
+# Additive smoothing for every conditional probability
+SMOOTHING = 1.0
+
+def time_slot(when: datetime) -> int:
+    hour = when.hour
+    if 5 <= hour < 11:
+        return 1
+    if 11 <= hour < 17:
+        return 2
+    if 17 <= hour < 22:
+        return 3
+    return 0
+
+def cuisine_index(value: Any) -> int:
+    """Free-text cuisine_type to a CUISINES index; anything unlisted is "other" """
+    return CUISINE_INDEX.get(str(value or "").strip().lower(), CUISINE_INDEX["other"])
+
+def _conditional(counts: np.ndarray, axis: int) -> np.ndarray:
+    """Smoothed P(value along `axis` | the other axes)"""
+    return (counts + SMOOTHING) / (counts.sum(axis=axis, keepdims=True) + SMOOTHING * counts.shape[axis])
+
+def _ranked(lift: np.ndarray, cells: np.ndarray) -> List[int]:
+    """Cuisine indexes by lift, best first; unseen cuisines only have smoothing behind them"""
+    return [int(c) for c in np.argsort(-lift, kind="stable") if cells[c] > 0]
+
+def cramers_v(table: np.ndarray) -> float:
+    """Association strength of a 2-D contingency table, 0 (none) to 1"""
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    total = table.sum()
+    if total == 0 or min(table.shape) < 2:
+        return 0.0
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / total
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    return float(np.sqrt(chi2 / (total * (min(table.shape) - 1))))
+
+class MoodPriors:
+    """
+    Cross-user mood x cuisine x time-of-day statistics. Only the raw counts
+    are stored; lift is derived on load:
+
+        lift(cuisine | mood, slot) = P(cuisine | mood, slot) / P(cuisine | slot)
+
+    so values above 1 mean people in that mood pick the cuisine more often
+    than everyone else at the same time of day.
+    """
+
+    def __init__(self, counts: np.ndarray, mood_slots: np.ndarray, generated_at: Optional[datetime] = None):
+        self.counts = counts.astype(np.int64)  # mood x cuisine x slot, from recipe history
+        self.mood_slots = mood_slots.astype(np.int64)  # mood x slot, from mood logs
+        self.generated_at = generated_at
+
+        self.lift = _conditional(self.counts, 1) / _conditional(self.counts.sum(axis=0, keepdims=True), 1)
+        overall = self.counts.sum(axis=2)
+        self.overall_lift = _conditional(overall, 1) / _conditional(overall.sum(axis=0, keepdims=True), 1)
+        self.support = self.counts.sum(axis=1)  # mood x slot
+        self.association = cramers_v(overall)
+
+    @classmethod
+    def empty(cls) -> "MoodPriors":
+        return cls(np.zeros((len(MOODS), len(CUISINES), len(TIME_SLOTS))), np.zeros((len(MOODS), len(TIME_SLOTS))))
+
+    def top_cuisines(self, mood: str, when: datetime, k: int, min_support: int, min_lift: float) -> List[str]:
+        """
+        Cuisines over-chosen in this mood at this time of day, best first.
+        Falls back to the mood across all slots when the slot is thin, and
+        returns nothing when the mood itself is.
+        """
+        m = MOOD_INDEX.get(mood)
+        if m is None:
+            return []
+        slot = time_slot(when)
+        if self.support[m, slot] >= min_support:
+            lift, cells = self.lift[m, :, slot], self.counts[m, :, slot]
+        elif self.support[m].sum() >= min_support:
+            lift, cells = self.overall_lift[m], self.counts[m].sum(axis=1)
+        else:
+            return []
+        other = CUISINE_INDEX["other"]
+        return [CUISINES[c] for c in _ranked(lift, cells) if c != other and lift[c] >= min_lift][:k]
+
+    def summary(self, top: int = 3) -> Dict[str, Any]:
+        moods = {}
+        for m, mood in enumerate(MOODS):
+            moods[mood] = {
+                "recipes": int(self.support[m].sum()),
+                "top_cuisines": [
+                    {"cuisine": CUISINES[c], "lift": round(float(self.overall_lift[m, c]), 3)}
+                    for c in _ranked(self.overall_lift[m], self.counts[m].sum(axis=1))[:top]
+                ],
+                "by_time_of_day": {
+                    slot_name: {
+                        "recipes": int(self.support[m, slot]),
+                        "top_cuisines": [
+                            {"cuisine": CUISINES[c], "lift": round(float(self.lift[m, c, slot]), 3)}
+                            for c in _ranked(self.lift[m, :, slot], self.counts[m, :, slot])[:top]
+                        ]
+                    }
+                    for slot, slot_name in enumerate(TIME_SLOTS)
+                }
+            }
+        slot_totals = self.mood_slots.sum(axis=0)
+        return {
+            "generated_at": self.generated_at,
+            "recipes": int(self.counts.sum()),
+            "mood_logs": int(self.mood_slots.sum()),
+            "mood_cuisine_association": round(self.association, 4),
+            "moods": moods,
+            "mood_share_by_time_of_day": {
+                slot_name: {
+                    mood: round(float(self.mood_slots[m, slot] / slot_totals[slot]), 4) if slot_totals[slot] else 0.0
+                    for m, mood in enumerate(MOODS)
+                }
+                for slot, slot_name in enumerate(TIME_SLOTS)
+            }
+        }
+
+    def to_document(self) -> Dict[str, Any]:
+        return {
+            "moods": list(MOODS),
+            "cuisines": list(CUISINES),
+            "time_slots": list(TIME_SLOTS),
+            "counts": self.counts.tolist(),
+            "mood_slots": self.mood_slots.tolist(),
+            "generated_at": self.generated_at
+        }
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> Optional["MoodPriors"]:
+        """None when the snapshot was built with different moods, cuisines or slots"""
+        if (doc.get("moods"), doc.get("cuisines"), doc.get("time_slots")) != (list(MOODS), list(CUISINES), list(TIME_SLOTS)):
+            return None
+        return cls(np.array(doc["counts"]), np.array(doc["mood_slots"]), doc.get("generated_at"))
@@ -0,0 +1,372 @@
+#nutrition.py
+from array import array
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import re
+
+from app.models.schemas import NutritionInfo
+from app.utils.ingredients import canonical_ingredient
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium")
+
+# Per 100 g: kcal, protein g, carbs g, fat g, fiber g, sugar g, sodium mg.
+# Keyed by canonical_ingredient() names; meat, fish and dry goods are raw/uncooked,
+# beans and lentils cooked or canned, the way recipes usually list them.
+NUTRIENT_TABLE: Dict[str, Tuple[float, ...]] = {
+    # Meat, fish, eggs, tofu
+    "chicken": (143, 21.2, 0, 6.0, 0, 0, 70),
+    "beef": (254, 17.2, 0, 20.0, 0, 0, 66),
+    "steak": (217, 26.0, 0, 12.0, 0, 0, 56),
+    "pork": (242, 27.0, 0, 14.0, 0, 0, 62),
+    "lamb": (282, 16.6, 0, 23.4, 0, 0, 59),
+    "turkey": (135, 24.0, 0, 4.0, 0, 0, 60),
+    "bacon": (541, 37.0, 1.4, 42.0, 0, 0, 1717),
+    "ham": (145, 21.0, 1.5, 5.5, 0, 0, 1203),
+    "sausage": (301, 12.0, 2.0, 27.0, 0, 1.0, 749),
+    "fish": (105, 20.0, 0, 2.5, 0, 0, 70),
+    "salmon": (208, 20.0, 0, 13.0, 0, 0, 59),
+    "tuna": (132, 28.0, 0, 1.3, 0, 0, 47),
+    "cod": (82, 18.0, 0, 0.7, 0, 0, 54),
+    "shrimp": (85, 20.0, 0, 0.5, 0, 0, 119),
+    "egg": (143, 12.6, 0.7, 9.5, 0, 0.4, 142),
+    "tofu": (144, 15.8, 2.8, 8.7, 2.3, 0.6, 14),
+    # Dairy
+    "milk": (61, 3.2, 4.8, 3.3, 0, 5.0, 43),
+    "butter": (717, 0.9, 0.1, 81.0, 0, 0.1, 11),
+    "ghee": (900, 0, 0, 100.0, 0, 0, 2),
+    "cream": (340, 2.8, 2.7, 36.0, 0, 2.9, 38),
+    "sour cream": (198, 2.4, 4.6, 19.0, 0, 3.4, 31),
+    "cream cheese": (342, 6.0, 4.0, 34.0, 0, 3.2, 321),
+    "yogurt": (61, 3.5, 4.7, 3.3, 0, 4.7, 46),
+    "cheese": (402, 25.0, 1.3, 33.0, 0, 0.5, 621),
+    "parmesan": (431, 38.0, 4.1, 29.0, 0, 0.9, 1529),
+    "mozzarella": (280, 28.0, 3.1, 17.0, 0, 1.0, 627),
+    "feta": (264, 14.0, 4.0, 21.0, 0, 4.0, 1116),
+    "paneer": (321, 21.0, 3.6, 25.0, 0, 2.6, 18),
+    # Grains and starches
+    "rice": (365, 7.1, 80.0, 0.7, 1.3, 0.1, 5),
+    "pasta": (371, 13.0, 75.0, 1.5, 3.2, 2.7, 6),
+    "noodle": (384, 14.0, 71.0, 4.4, 3.3, 1.9, 21),
+    "bread": (265, 9.0, 49.0, 3.2, 2.7, 5.0, 491),
+    "tortilla": (306, 8.2, 50.0, 8.0, 3.5, 3.0, 736),
+    "flour": (364, 10.0, 76.0, 1.0, 2.7, 0.3, 2),
+    "cornstarch": (381, 0.3, 91.0, 0.1, 0.9, 0, 9),
+    "oat": (389, 16.9, 66.0, 6.9, 10.6, 1.0, 2),
+    "quinoa": (368, 14.0, 64.0, 6.0, 7.0, 0, 5),
+    "couscous": (376, 12.8, 77.0, 0.6, 5.0, 0, 10),
+    "potato": (77, 2.0, 17.0, 0.1, 2.2, 0.8, 6),
+    "sweet potato": (86, 1.6, 20.0, 0.1, 3.0, 4.2, 55),
+    # Vegetables
+    "tomato": (18, 0.9, 3.9, 0.2, 1.2, 2.6, 5),
+    "tomato paste": (82, 4.3, 19.0, 0.5, 4.1, 12.0, 59),
+    "tomato sauce": (24, 1.2, 5.3, 0.3, 1.5, 3.6, 474),
+    "onion": (40, 1.1, 9.3, 0.1, 1.7, 4.2, 4),
+    "green onion": (32, 1.8, 7.3, 0.2, 2.6, 2.3, 16),
+    "garlic": (149, 6.4, 33.0, 0.5, 2.1, 1.0, 17),
+    "ginger": (80, 1.8, 18.0, 0.8, 2.0, 1.7, 13),
+    "carrot": (41, 0.9, 9.6, 0.2, 2.8, 4.7, 69),
+    "bell pepper": (31, 1.0, 6.0, 0.3, 2.1, 4.2, 4),
+    "chili": (40, 1.9, 8.8, 0.4, 1.5, 5.3, 9),
+    "broccoli": (34, 2.8, 6.6, 0.4, 2.6, 1.7, 33),
+    "cauliflower": (25, 1.9, 5.0, 0.3, 2.0, 1.9, 30),
+    "spinach": (23, 2.9, 3.6, 0.4, 2.2, 0.4, 79),
+    "kale": (35, 2.9, 4.4, 1.5, 4.1, 1.0, 53),
+    "lettuce": (15, 1.4, 2.9, 0.2, 1.3, 0.8, 28),
+    "cabbage": (25, 1.3, 5.8, 0.1, 2.5, 3.2, 18),
+    "mushroom": (22, 3.1, 3.3, 0.3, 1.0, 2.0, 5),
+    "zucchini": (17, 1.2, 3.1, 0.3, 1.0, 2.5, 8),
+    "eggplant": (25, 1.0, 5.9, 0.2, 3.0, 3.5, 2),
+    "cucumber": (15, 0.7, 3.6, 0.1, 0.5, 1.7, 2),
+    "celery": (16, 0.7, 3.0, 0.2, 1.6, 1.3, 80),
+    "asparagus": (20, 2.2, 3.9, 0.1, 2.1, 1.9, 2),
+    "green bean": (31, 1.8, 7.0, 0.2, 2.7, 3.3, 6),
+    "pea": (81, 5.4, 14.0, 0.4, 5.7, 5.7, 5),
+    "corn": (86, 3.3, 19.0, 1.4, 2.0, 6.3, 15),
+    "pumpkin": (26, 1.0, 6.5, 0.1, 0.5, 2.8, 1),
+    "avocado": (160, 2.0, 8.5, 14.7, 6.7, 0.7, 7),
+    "olive": (115, 0.8, 6.0, 10.7, 3.2, 0, 735),
+    # Fruit
+    "lemon": (29, 1.1, 9.3, 0.3, 2.8, 2.5, 2),
+    "lime": (30, 0.7, 10.5, 0.2, 2.8, 1.7, 2),
+    "apple": (52, 0.3, 14.0, 0.2, 2.4, 10.0, 1),
+    "banana": (89, 1.1, 23.0, 0.3, 2.6, 12.0, 1),
+    "orange": (47, 0.9, 12.0, 0.1, 2.4, 9.4, 0),
+    "mango": (60, 0.8, 15.0, 0.4, 1.6, 13.7, 1),
+    "strawberry": (32, 0.7, 7.7, 0.3, 2.0, 4.9, 1),
+    "blueberry": (57, 0.7, 14.0, 0.3, 2.4, 10.0, 1),
+    "coconut": (354, 3.3, 15.0, 33.0, 9.0, 6.0, 20),
+    # Legumes, nuts, seeds
+    "bean": (127, 8.7, 22.8, 0.5, 6.4, 0.3, 2),
+    "chickpea": (164, 8.9, 27.0, 2.6, 7.6, 4.8, 7),
+    "lentil": (116, 9.0, 20.0, 0.4, 7.9, 1.8, 2),
+    "almond": (579, 21.0, 22.0, 50.0, 12.5, 4.4, 1),
+    "walnut": (654, 15.0, 14.0, 65.0, 6.7, 2.6, 2),
+    "cashew": (553, 18.0, 30.0, 44.0, 3.3, 5.9, 12),
+    "peanut": (567, 26.0, 16.0, 49.0, 8.5, 4.0, 18),
+    "peanut butter": (588, 25.0, 20.0, 50.0, 6.0, 9.0, 459),
+    "sesame": (573, 17.7, 23.0, 50.0, 11.8, 0.3, 11),
+    # Fats, sweeteners, sauces, liquids
+    "oil": (884, 0, 0, 100.0, 0, 0, 0),
+    "sugar": (387, 0, 100.0, 0, 0, 100.0, 1),
+    "honey": (304, 0.3, 82.0, 0, 0.2, 82.0, 4),
+    "chocolate": (546, 4.9, 61.0, 31.0, 7.0, 48.0, 24),
+    "coconut milk": (230, 2.3, 6.0, 24.0, 2.2, 3.3, 15),
+    "soy sauce": (53, 8.0, 4.9, 0.6, 0.8, 0.4, 5493),
+    "vinegar": (18, 0, 0.04, 0, 0, 0.04, 2),
+    "mayonnaise": (680, 1.0, 0.6, 75.0, 0, 0.6, 635),
+    "ketchup": (112, 1.7, 26.0, 0.1, 0.3, 22.0, 907),
+    "mustard": (60, 3.7, 5.8, 3.3, 4.0, 0.9, 1135),
+    "broth": (7, 1.0, 0.4, 0.2, 0, 0.2, 343),
+    "stock": (7, 1.0, 0.4, 0.2, 0, 0.2, 343),
+    "water": (0, 0, 0, 0, 0, 0, 0),
+    # Herbs and spices
+    "salt": (0, 0, 0, 0, 0, 0, 38758),
+    "pepper": (251, 10.0, 64.0, 3.3, 25.0, 0.6, 20),
+    "basil": (23, 3.2, 2.7, 0.6, 1.6, 0.3, 4),
+    "cilantro": (23, 2.1, 3.7, 0.5, 2.8, 0.9, 46),
+    "parsley": (36, 3.0, 6.3, 0.8, 3.3, 0.9, 56),
+    "mint": (70, 3.8, 15.0, 0.9, 8.0, 0, 31),
+    "oregano": (265, 9.0, 69.0, 4.3, 42.5, 4.1, 25),
+    "thyme": (101, 5.6, 24.0, 1.7, 14.0, 0, 9),
+    "rosemary": (131, 3.3, 21.0, 5.9, 14.1, 0, 26),
+    "cumin": (375, 17.8, 44.0, 22.0, 10.5, 2.3, 168),
+    "paprika": (282, 14.0, 54.0, 13.0, 35.0, 10.0, 68),
+    "turmeric": (312, 9.7, 67.0, 3.3, 22.7, 3.2, 27),
+    "cinnamon": (247, 4.0, 81.0, 1.2, 53.0, 2.2, 10),
+    "curry powder": (325, 14.0, 58.0, 14.0, 53.0, 2.8, 52),
+    "garam masala": (379, 14.0, 45.0, 15.0, 33.0, 0, 96),
+    "chili powder": (282, 13.5, 50.0, 14.0, 35.0, 7.2, 2867),
+}
+
+NAMES = tuple(NUTRIENT_TABLE)
+NAME_INDEX = {name: i for i, name in enumerate(NAMES)}
+
+@lru_cache()
+def nutrient_matrix():
+    """One row per table entry, per gram; built on first use so importing this module does not load numpy"""
+    import numpy as np
+    return np.array([NUTRIENT_TABLE[name] for name in NAMES], dtype=np.float64) / 100.0
+
+# Surface forms to canonical units
+UNIT_ALIASES = {
+    "g": "g", "gr": "g", "gram": "g", "grams": "g", "kg": "kg", "kgs": "kg", "kilogram": "kg", "kilograms": "kg",
+    "mg": "mg", "oz": "oz", "ounce": "oz", "ounces": "oz", "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "ml": "ml", "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+    "l": "l", "liter": "l", "liters": "l", "litre": "l", "litres": "l",
+    "tsp": "tsp", "tsps": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+    "tbsp": "tbsp", "tbsps": "tbsp", "tbs": "tbsp", "tbl": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "cup": "cup", "cups": "cup",
+    "pinch": "pinch", "pinches": "pinch", "dash": "dash", "dashes": "dash",
+    "clove": "clove", "cloves": "clove", "can": "can", "cans": "can", "tin": "can", "tins": "can",
+    "jar": "jar", "jars": "jar", "package": "package", "packages": "package", "pkg": "package",
+    "packet": "package", "packets": "package", "slice": "slice", "slices": "slice",
+    "piece": "piece", "pieces": "piece", "pc": "piece", "pcs": "piece", "fillet": "fillet", "fillets": "fillet",
+    "handful": "handful", "handfuls": "handful", "bunch": "bunch", "bunches": "bunch",
+    "stalk": "stalk", "stalks": "stalk", "sprig": "sprig", "sprigs": "sprig",
+    "head": "head", "heads": "head", "inch": "inch", "inches": "inch",
+}
+
+MASS_UNITS = {"mg": 0.001, "g": 1.0, "kg": 1000.0, "oz": 28.35, "lb": 453.6}
+VOLUME_UNITS = {"ml": 1.0, "tsp": 4.93, "tbsp": 14.79, "cup": 240.0, "l": 1000.0}
+# Units that are one piece of the ingredient when we know its piece weight
+PIECE_UNITS = {"piece", "slice", "fillet", "head", "stalk"}
+# Grams per unit otherwise
+COUNT_UNITS = {
+    "pinch": 0.35, "dash": 0.6, "clove": 5.0, "can": 400.0, "jar": 350.0, "package": 250.0,
+    "handful": 30.0, "bunch": 100.0, "sprig": 1.0, "inch": 5.0,
+    "piece": 100.0, "slice": 30.0, "fillet": 150.0, "head": 500.0, "stalk": 40.0,
+}
+
+SIZES = {"small": 0.7, "medium": 1.0, "large": 1.35}
+
+# g/ml for volume measures; anything unlisted is assumed chopped and loosely packed
+DENSITIES = {
+    "water": 1.0, "milk": 1.03, "cream": 1.0, "yogurt": 1.03, "sour cream": 0.97, "coconut milk": 0.97,
+    "broth": 1.0, "stock": 1.0, "soy sauce": 1.15, "vinegar": 1.0, "oil": 0.92, "butter": 0.96, "ghee": 0.91,
+    "honey": 1.42, "sugar": 0.85, "salt": 1.2, "flour": 0.53, "cornstarch": 0.54, "oat": 0.41, "rice": 0.85,
+    "quinoa": 0.72, "couscous": 0.73, "pasta": 0.42, "noodle": 0.42, "lentil": 0.8, "bean": 0.75, "chickpea": 0.68,
+    "pea": 0.6, "corn": 0.65, "cheese": 0.45, "parmesan": 0.4, "mozzarella": 0.47, "feta": 0.63,
+    "spinach": 0.13, "kale": 0.28, "lettuce": 0.2, "basil": 0.09, "cilantro": 0.07, "parsley": 0.25, "mint": 0.1,
+    "pepper": 0.48, "cumin": 0.4, "paprika": 0.46, "turmeric": 0.55, "cinnamon": 0.55, "oregano": 0.2,
+    "curry powder": 0.42, "garam masala": 0.42, "chili powder": 0.54, "almond": 0.6, "walnut": 0.5,
+    "cashew": 0.58, "peanut": 0.6, "peanut butter": 1.07, "mayonnaise": 0.93, "ketchup": 1.14,
+    "tomato paste": 1.1, "tomato sauce": 1.03,
+}
+DEFAULT_DENSITY = 0.7
+
+# Grams of one medium piece: "2 onions", "1 large egg"
+PIECE_GRAMS = {
+    "egg": 50, "onion": 110, "green onion": 15, "garlic": 5, "tomato": 120, "potato": 170, "sweet potato": 130,
+    "carrot": 60, "bell pepper": 120, "chili": 15, "zucchini": 200, "eggplant": 450, "cucumber": 300,
+    "mushroom": 18, "broccoli": 350, "cauliflower": 575, "lettuce": 300, "cabbage": 900, "celery": 40,
+    "avocado": 170, "lemon": 60, "lime": 45, "apple": 180, "banana": 120, "orange": 130, "mango": 200,
+    "chicken": 170, "steak": 225, "salmon": 150, "fish": 150, "cod": 150, "shrimp": 12, "sausage": 75,
+    "bacon": 12, "bread": 30, "tortilla": 45, "ginger": 10,
+}
+DEFAULT_PIECE_GRAMS = 100.0
+
+_FRACTIONS = {"¼": 0.25, "½": 0.5, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125, "⅜": 0.375, "⅝": 0.625, "⅞": 0.875}
+_NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?\s*[¼½¾⅓⅔⅛⅜⅝⅞]?|[¼½¾⅓⅔⅛⅜⅝⅞]|an?\b"
+_QUANTITY_RE = re.compile(
+    rf"^\s*(?P<amount>{_NUMBER})(?:\s*(?:-|–|to)\s*(?P<upper>{_NUMBER}))?"
+    r"\s*(?P<unit>[a-zA-Z]+\b\.?)?\s*",
+    re.IGNORECASE
+)
+_SIZE_RE = re.compile(r"^(small|medium|large)\b\s*", re.IGNORECASE)
+_OF_RE = re.compile(r"^of\b\s*", re.IGNORECASE)
+# "a few basil leaves" is not one of anything
+_VAGUE = {"few", "little", "bit", "couple", "splash", "drizzle", "dollop", "sprinkle"}
+
+class Quantity(NamedTuple):
+    """One ingredient line split into amount, unit and the rest: "1-2 large onions, diced" """
+    amount: Optional[float]  # None for "salt to taste"
+    upper: Optional[float]  # top of a range, "2-3 cloves"
+    unit: Optional[str]  # canonical unit, None for a plain count
+    size: Optional[str]  # small/medium/large
+    name: str  # everything after the quantity, as written
+
+def _number(text: str) -> float:
+    text = text.strip().lower()
+    if text in ("a", "an"):
+        return 1.0
+    if text[-1] in _FRACTIONS:
+        whole = text[:-1].strip()
+        return (float(whole) if whole else 0.0) + _FRACTIONS[text[-1]]
+    if "/" in text:
+        whole, _, fraction = text.rpartition(" ")
+        numerator, denominator = fraction.split("/")
+        value = float(numerator) / float(denominator) if float(denominator) else 0.0
+        return value + (float(whole) if whole else 0.0)
+    return float(text)
+
+@lru_cache(maxsize=16384)
+def parse_quantity(line: str) -> Quantity:
+    """
+    Split "500g chicken", "1 1/2 cups rice", "2-3 large tomatoes, chopped" or
+    "a pinch of salt" into amount, unit, size and name. Lines without a
+    leading amount come back with amount None and the whole line as name.
+    """
+    text = line.strip()
+    match = _QUANTITY_RE.match(text)
+    if match is None:
+        return Quantity(None, None, None, None, text)
+
+    amount = _number(match.group("amount"))
+    upper = _number(match.group("upper")) if match.group("upper") else None
+    unit_text = match.group("unit")
+    unit = UNIT_ALIASES.get(unit_text.rstrip(".").lower()) if unit_text else None
+    # "1 tsp salt" consumes the unit; "2 onions" leaves the word in the name
+    rest = text[match.end():] if unit else text[match.end("upper") if upper is not None else match.end("amount"):].lstrip()
+    if match.group("amount").lower() in ("a", "an") and rest.split(" ", 1)[0].lower() in _VAGUE:
+        return Quantity(None, None, None, None, text)
+
+    size_match = _SIZE_RE.match(rest)
+    size = size_match.group(1).lower() if size_match else None
+    if size_match:
+        rest = rest[size_match.end():]
+    rest = _OF_RE.sub("", rest)
+    return Quantity(amount, upper, unit, size, rest.strip())
+
+@lru_cache(maxsize=4096)
+def nutrient_name(name: str) -> Optional[str]:
+    """
+    The NUTRIENT_TABLE entry for an ingredient name: its canonical form, or
+    else its longest known trailing words ("red bell pepper" -> "bell pepper").
+    """
+    canonical = canonical_ingredient(name)
+    if canonical in NAME_INDEX:
+        return canonical
+    words = canonical.split()
+    for start in range(1, len(words)):
+        tail = " ".join(words[start:])
+        if tail in NAME_INDEX:
+            return tail
+    return None
+
+def ingredient_grams(quantity: Quantity, name: Optional[str]) -> Optional[float]:
+    """Weight of one parsed line, or None when it has no usable amount"""
+    if quantity.amount is None:
+        return None
+    amount = quantity.amount if quantity.upper is None else (quantity.amount + quantity.upper) / 2
+    unit = quantity.unit
+    if unit in MASS_UNITS:
+        return amount * MASS_UNITS[unit]
+    if unit in VOLUME_UNITS:
+        return amount * VOLUME_UNITS[unit] * DENSITIES.get(name, DEFAULT_DENSITY)
+    size = SIZES.get(quantity.size, 1.0)
+    if unit is None or (unit in PIECE_UNITS and name in PIECE_GRAMS):
+        return amount * size * PIECE_GRAMS.get(name, DEFAULT_PIECE_GRAMS)
+    return amount * size * COUNT_UNITS[unit]
+
+@lru_cache(maxsize=16384)
+def _line_weight(line: str) -> Tuple[int, float]:
+    """Table row and grams for one ingredient line; row -1 when it cannot be counted"""
+    quantity = parse_quantity(line)
+    name = nutrient_name(quantity.name)
+    grams = ingredient_grams(quantity, name)
+    if name is None or grams is None or grams <= 0:
+        return -1, 0.0
+    return NAME_INDEX[name], grams
+
+def unmatched_lines(ingredients: Sequence[str]) -> List[str]:
+    """Lines that contribute nothing: no amount, or an ingredient missing from the table"""
+    return [line for line in ingredients if _line_weight(line)[0] < 0]
+
+def nutrition_matrix(recipes: Sequence[Tuple[Sequence[str], int]]) -> "np.ndarray":
+    """
+    Per-serving nutrients for many (ingredients, servings) pairs at once, one
+    row per recipe in NUTRIENTS order. Every counted line becomes a (recipe,
+    table row, grams) triple; the totals are one gather and a segmented sum.
+    """
+    import numpy as np
+
+    owners, rows, grams = array("I"), array("I"), array("d")
+    servings = np.ones(len(recipes), dtype=np.float64)
+    for i, (ingredients, count) in enumerate(recipes):
+        servings[i] = max(int(count or 1), 1)
+        for line in ingredients:
+            row, weight = _line_weight(line)
+            if row >= 0:
+                owners.append(i)
+                rows.append(row)
+                grams.append(weight)
+
+    totals = np.zeros((len(recipes), len(NUTRIENTS)), dtype=np.float64)
+    if len(owners):
+        owners_np = np.frombuffer(owners, dtype=np.uint32)
+        contributions = nutrient_matrix()[np.frombuffer(rows, dtype=np.uint32)] * np.frombuffer(grams)[:, None]
+        # Lines arrive grouped by recipe, so each run is one reduceat slice
+        starts = np.flatnonzero(np.r_[True, owners_np[1:] != owners_np[:-1]])
+        totals[owners_np[starts]] = np.add.reduceat(contributions, starts, axis=0)
+    return totals / servings[:, None]
+
+def nutrition_values(row: Sequence[float]) -> Dict[str, float]:
+    # Calories and sodium in whole units, the rest to a tenth of a gram. The
+    # first rounding drops summation-order noise, so ties round the same way
+    # here and in nutrition_matrix.
+    values = [round(float(value), 6) for value in row]
+    return {
+        name: float(round(value)) if name in ("calories", "sodium") else round(value, 1)
+        for name, value in zip(NUTRIENTS, values)
+    }
+
+def compute_nutrition(ingredients: Sequence[str], servings: int) -> NutritionInfo:
+    """
+    Per-serving NutritionInfo of one recipe from its ingredient lines;
+    NutritionInfo.unavailable() when no line can be counted, so zeros are
+    never passed off as an estimate. Plain Python: for a single recipe that beats
+    building arrays.
+    """
+    totals = [0.0] * len(NUTRIENTS)
+    counted = False
+    for line in ingredients:
+        row, grams = _line_weight(line)
+        if row < 0:
+            continue
+        counted = True
+        for i, per_100g in enumerate(NUTRIENT_TABLE[NAMES[row]]):
+            totals[i] += per_100g / 100.0 * grams
+    if not counted:
+        return NutritionInfo.unavailable()
+    share = max(int(servings or 1), 1)
+    return NutritionInfo(**nutrition_values([total / share for total in totals]))
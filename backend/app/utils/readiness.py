@@ -0,0 +1,126 @@
+#readiness.py
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+Check = Callable[[], Any]
+
+class DependencyProbe:
+    def __init__(self, name: str, check: Check, warm_up: Optional[Callable[[], Awaitable[Any]]] = None, required: bool = True):
+        self.name = name
+        self.check = check
+        self.warm_up = warm_up
+        self.required = required
+        self.ready = False
+        self.warmed_up = warm_up is None
+        self.ever_ready = False
+        self.last_checked: Optional[datetime] = None
+        self.latency_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.consecutive_failures = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "required": self.required,
+            "warmed_up": self.warmed_up,
+            "last_checked": self.last_checked.isoformat() if self.last_checked else None,
+            "latency_ms": self.latency_ms,
+            "error": self.error
+        }
+
+class ReadinessMonitor:
+    """
+    Warms dependencies up concurrently in the background and keeps their
+    readiness cached. Each probe re-checks every `interval` seconds; a probe
+    that is not ready retries sooner, with backoff. Warm-up re-runs only until
+    the dependency is first ready: after that a failed check just marks it not
+    ready, and recovery is left to the dependency (driver reconnects, circuit
+    breaker half-open probes) rather than re-initializing it under live traffic.
+    """
+
+    def __init__(self, interval: float = 15.0, timeout: float = 5.0, min_retry: float = 1.0):
+        self.interval = interval
+        self.timeout = timeout
+        self.min_retry = min_retry
+        self.started_at = time.monotonic()
+        self.probes: Dict[str, DependencyProbe] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, name: str, check: Check, warm_up: Optional[Callable[[], Awaitable[Any]]] = None, required: bool = True):
+        self.probes[name] = DependencyProbe(name, check, warm_up, required)
+
+    def start(self):
+        """Schedule every probe; returns immediately"""
+        self.started_at = time.monotonic()
+        for probe in self.probes.values():
+            self._tasks.append(asyncio.create_task(self._watch(probe), name=f"readiness-{probe.name}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run_check(self, probe: DependencyProbe) -> bool:
+        start = time.perf_counter()
+        try:
+            result = probe.check()
+            if inspect.isawaitable(result):
+                result = await asyncio.wait_for(result, self.timeout)
+            probe.error = None if result else "not ready"
+            return bool(result)
+        except asyncio.TimeoutError:
+            probe.error = f"check timed out after {self.timeout}s"
+            return False
+        except Exception as e:
+            probe.error = str(e)
+            return False
+        finally:
+            probe.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+            probe.last_checked = datetime.utcnow()
+
+    async def _watch(self, probe: DependencyProbe):
+        while True:
+            if not probe.warmed_up:
+                try:
+                    await probe.warm_up()
+                    probe.warmed_up = True
+                except Exception as e:
+                    probe.error = f"warm-up failed: {e}"
+                    logger.warning(f"⚠️ Warm-up of {probe.name} failed: {e}")
+
+            was_ready = probe.ready
+            probe.ready = probe.warmed_up and await self._run_check(probe)
+
+            if probe.ready:
+                probe.ever_ready = True
+                if not was_ready:
+                    logger.info(f"✅ {probe.name} ready after {time.monotonic() - self.started_at:.1f}s")
+                probe.consecutive_failures = 0
+                delay = self.interval
+            else:
+                if was_ready:
+                    logger.warning(f"⚠️ {probe.name} no longer ready: {probe.error}")
+                probe.consecutive_failures += 1
+                # Only a dependency that never came up is warmed up again
+                if probe.warm_up is not None and not probe.ever_ready:
+                    probe.warmed_up = False
+                delay = min(self.interval, self.min_retry * 2 ** min(probe.consecutive_failures - 1, 6))
+            await asyncio.sleep(delay)
+
+    @property
+    def ready(self) -> bool:
+        return all(p.ready for p in self.probes.values() if p.required)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "dependencies": {name: probe.snapshot() for name, probe in self.probes.items()}
+        }
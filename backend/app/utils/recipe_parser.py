@@ -0,0 +1,193 @@
+#recipe_parser.py
+from typing import Any, List, Tuple
+import json
+import logging
+import re
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.models.schemas import NutritionInfo, RecipeResponse
+from app.utils.recipe_schema import repair_recipe_payload
+
+try:
+    import orjson
+
+    def _loads(text: str) -> Any:
+        return orjson.loads(text)
+
+    _DECODE_ERRORS = (orjson.JSONDecodeError, ValueError)
+except ImportError:  # pragma: no cover - orjson is optional
+    _loads = json.loads
+    _DECODE_ERRORS = (ValueError,)
+
+logger = logging.getLogger(__name__)
+
+RECIPE_ADAPTER = TypeAdapter(RecipeResponse)
+
+# Strings (possibly unterminated), structural characters, or bare scalars
+_TOKEN_RE = re.compile(r'[{}\[\]:,]|"[^"\\]*(?:\\.[^"\\]*)*"?|[^\s{}\[\]:,"]+')
+_NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?$')
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null', 'True': 'true', 'False': 'false', 'None': 'null'}
+# The two slips models make most often; patched with regexes before falling back to the tokenizer
+_TRAILING_COMMA_RE = re.compile(r',(?=\s*[}\]])')
+_MISSING_COMMA_RE = re.compile(r'"(?=\s*\n\s*")')
+
+class PayloadDecodeError(ValueError):
+    pass
+
+def _is_closed(string_token: str) -> bool:
+    if len(string_token) < 2 or string_token[-1] != '"':
+        return False
+    if string_token[-2] != '\\':
+        return True
+    # An odd run of backslashes escapes the final quote
+    backslashes = len(string_token) - 1 - len(string_token[:-1].rstrip('\\'))
+    return backslashes % 2 == 0
+
+def _is_scalar(token: str) -> bool:
+    return token in _LITERALS or _NUMBER_RE.match(token) is not None
+
+def repair_json(text: str) -> str:
+    """
+    Single-pass repair of a model's JSON object.
+
+    Skips prose/markdown around the first object, drops trailing commas,
+    inserts missing commas and colons, escapes raw newlines in strings,
+    ignores anything after the closing brace and closes truncated output.
+    """
+    start = text.find('{')
+    if start == -1:
+        raise PayloadDecodeError("No JSON object found in response")
+
+    out: List[str] = []
+    # One entry per open container: [closer, expecting, rollback position]
+    # expecting is one of: key, colon, value, comma
+    stack: List[List[Any]] = []
+
+    for token in _TOKEN_RE.findall(text, start):
+        first = token[0]
+        top = stack[-1] if stack else None
+
+        if first == '"':
+            if top is None:
+                continue
+            if top[1] == 'comma':
+                out.append(',')
+                top[1] = 'key' if top[0] == '}' else 'value'
+            elif top[1] == 'colon':
+                out.append(':')
+                top[1] = 'value'
+            if top[1] == 'key':
+                top[2] = len(out)
+            if not _is_closed(token):
+                # Truncated inside a string
+                token = token.rstrip('\\') + '"'
+            if '\n' in token or '\r' in token:
+                token = token.replace('\r', '').replace('\n', '\\n')
+            out.append(token)
+            top[1] = 'colon' if top[1] == 'key' else 'comma'
+
+        elif first == '{' or first == '[':
+            if top is not None:
+                if top[1] == 'comma':
+                    out.append(',')
+                elif top[1] == 'colon':
+                    out.append(':')
+                top[1] = 'comma'
+            out.append(first)
+            stack.append(['}' if first == '{' else ']', 'key' if first == '{' else 'value', len(out)])
+
+        elif first == '}' or first == ']':
+            if top is None:
+                continue
+            _close(out, stack.pop())
+            if not stack:
+                break
+
+        elif first == ',':
+            if top is not None and top[1] == 'comma':
+                out.append(',')
+                top[1] = 'key' if top[0] == '}' else 'value'
+
+        elif first == ':':
+            if top is not None and top[1] == 'colon':
+                out.append(':')
+                top[1] = 'value'
+
+        elif top is not None and top[1] in ('value', 'comma', 'colon') and _is_scalar(token):
+            # Bare number or literal; anything else ("minutes", "kcal") is prose
+            if top[1] == 'comma':
+                out.append(',')
+            elif top[1] == 'colon':
+                out.append(':')
+            out.append(_LITERALS.get(token, token))
+            top[1] = 'comma'
+
+    # Close whatever a truncated response left open
+    while stack:
+        _close(out, stack.pop())
+
+    return ''.join(out)
+
+def _close(out: List[str], container: List[Any]):
+    if out and out[-1] in (',', ':'):
+        out.pop()
+    if container[0] == '}' and container[1] in ('colon', 'value'):
+        # Key without a value; drop it
+        del out[container[2]:]
+        if out and out[-1] == ',':
+            out.pop()
+    out.append(container[0])
+
+def decode_recipe_json(text: str) -> Any:
+    """
+    orjson on the clean structured-output path, then on the object sliced out
+    of fences or prose, then with trailing/missing commas patched by regex;
+    single-pass repair only when all of those fail
+    """
+    stripped = text.strip()
+    if stripped.startswith('{'):
+        try:
+            return _loads(stripped)
+        except _DECODE_ERRORS:
+            pass
+    start = stripped.find('{')
+    end = stripped.rfind('}')
+    if start != -1 and end > start:
+        candidate = stripped[start:end + 1]
+        # Fenced or prose-wrapped but otherwise valid
+        if start > 0 or end < len(stripped) - 1:
+            try:
+                return _loads(candidate)
+            except _DECODE_ERRORS:
+                pass
+        patched = _MISSING_COMMA_RE.sub('",', _TRAILING_COMMA_RE.sub('', candidate))
+        if patched != candidate:
+            try:
+                return _loads(patched)
+            except _DECODE_ERRORS:
+                pass
+    try:
+        return _loads(repair_json(stripped))
+    except _DECODE_ERRORS as e:
+        raise PayloadDecodeError(f"Unrecoverable JSON: {e}")
+
+def parse_recipe(text: str) -> Tuple[RecipeResponse, List[str]]:
+    """
+    Parse a model response into a RecipeResponse.
+    Returns the recipe and the fields that had to be repaired locally.
+    Nutrition from the model is dropped and left unavailable; RecipeService
+    computes it from the ingredient lines.
+    """
+    data = decode_recipe_json(text)
+    placeholder = NutritionInfo.unavailable()
+    recipe, repaired_fields = None, []
+    if isinstance(data, dict):
+        try:
+            recipe = RECIPE_ADAPTER.validate_python({**data, "nutrition_info": placeholder})
+        except ValidationError:
+            pass
+    if recipe is None:
+        repaired_data, repaired_fields = repair_recipe_payload(data)
+        recipe = RECIPE_ADAPTER.validate_python({**repaired_data, "nutrition_info": placeholder})
+    return recipe, repaired_fields
@@ -0,0 +1,134 @@
+#recipe_schema.py
+from typing import Any, Dict, List, Tuple
+import hashlib
+import json
+import re
+
+from app.models.schemas import RecipeResponse
+
+# Fields the server fills in itself; the model is never asked for them
+SERVER_FIELDS = {"id", "generated_at"}
+
+# Keys of the pydantic JSON schema that Gemini's OpenAPI subset understands
+_SUPPORTED_KEYS = {"type", "properties", "required", "items", "description", "enum"}
+
+# Used when the model omits or garbles a field, instead of paying for a re-roll
+RECIPE_DEFAULTS: Dict[str, Any] = {
+    "title": "Generated Recipe",
+    "description": "A delicious recipe",
+    "ingredients": [],
+    "instructions": [],
+    "prep_time": 15,
+    "cook_time": 30,
+    "total_time": 45,
+    "servings": 2,
+    "difficulty": "medium",
+    "cuisine_type": "fusion",
+    "tags": [],
+}
+
+# Derived locally from the generated fields (app/utils/nutrition.py); never asked of the model
+COMPUTED_FIELDS = ("nutrition_info",)
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+# "- ", "• ", "3. ", "2) "; not the quantity in "500g chicken"
+_LIST_MARKER_RE = re.compile(r"^(?:[-•*]+|\d+[.)])\s*")
+
+def _inline(node: Any, defs: Dict[str, Any]) -> Any:
+    if isinstance(node, list):
+        return [_inline(item, defs) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return _inline(defs[node["$ref"].split("/")[-1]], defs)
+    if "anyOf" in node:
+        # Optional[X] -> X; the model should always fill the field
+        options = [opt for opt in node["anyOf"] if opt.get("type") != "null"]
+        return _inline(options[0], defs)
+    cleaned = {}
+    for key, value in node.items():
+        if key not in _SUPPORTED_KEYS:
+            continue
+        if key == "properties":
+            cleaned[key] = {name: _inline(prop, defs) for name, prop in value.items()}
+        else:
+            cleaned[key] = _inline(value, defs)
+    return cleaned
+
+def build_response_schema(exclude: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """Derive Gemini's response_schema from RecipeResponse/NutritionInfo"""
+    raw = RecipeResponse.model_json_schema()
+    schema = _inline(raw, raw.get("$defs", {}))
+    skipped = SERVER_FIELDS | set(exclude)
+    schema["properties"] = {
+        name: prop for name, prop in schema["properties"].items() if name not in skipped
+    }
+    # Every generated field is required so the model cannot silently drop one
+    schema["required"] = list(schema["properties"].keys())
+    return schema
+
+def _to_number(value: Any, integer: bool) -> Any:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(round(value)) if integer else float(value)
+    if isinstance(value, str):
+        # "15 minutes", "about 380 kcal", "35g"
+        match = _NUMBER_RE.search(value.replace(",", ""))
+        if match:
+            number = float(match.group())
+            return int(round(number)) if integer else number
+    return None
+
+def _to_string_list(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    if isinstance(value, str):
+        lines = [_LIST_MARKER_RE.sub("", line.strip()).strip() for line in value.splitlines()]
+        return [line for line in lines if line]
+    return []
+
+def repair_recipe_payload(data: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Coerce a decoded recipe payload into the RecipeResponse shape.
+    Returns the repaired dict and the names of the fields that needed fixing.
+    """
+    if not isinstance(data, dict):
+        data = {}
+    repaired: List[str] = []
+    result: Dict[str, Any] = {}
+
+    for field, default in RECIPE_DEFAULTS.items():
+        value = data.get(field)
+        if isinstance(default, list):
+            fixed = _to_string_list(value)
+        elif isinstance(default, int):
+            fixed = _to_number(value, integer=True)
+        else:
+            fixed = str(value).strip() if isinstance(value, (str, int, float)) and str(value).strip() else None
+
+        if fixed is None:
+            fixed = default
+        if fixed != value:
+            repaired.append(field)
+        result[field] = fixed
+
+    # A missing total is better derived than defaulted
+    if _to_number(data.get("total_time"), integer=True) is None:
+        result["total_time"] = result["prep_time"] + result["cook_time"]
+
+    return result, repaired
+
+def recipe_content(recipe: Dict[str, Any]) -> Dict[str, Any]:
+    """The stored part of a recipe: everything but the server fields"""
+    return {key: value for key, value in recipe.items() if key not in SERVER_FIELDS}
+
+def recipe_content_hash(recipe: Dict[str, Any]) -> str:
+    """
+    Stable SHA-256 of the recipe content, used as its key in the recipes
+    collection. Computed fields are left out: they are derived from the
+    hashed ones, so recomputing them keeps the key.
+    """
+    identity = {key: value for key, value in recipe_content(recipe).items() if key not in COMPUTED_FIELDS}
+    canonical = json.dumps(identity, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,203 @@
+#resilience.py
+from enum import Enum
+from collections import deque
+from typing import Dict, Any, Optional
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+class ErrorClass(str, Enum):
+    RATE_LIMITED = "rate_limited"
+    TIMEOUT = "timeout"
+    UNAVAILABLE = "unavailable"
+    PARSE = "parse"
+    FATAL = "fatal"
+
+# Errors that say something about the health of the provider. Parse failures
+# mean the provider answered, so they never count against the breaker.
+PROVIDER_FAILURES = {ErrorClass.RATE_LIMITED, ErrorClass.TIMEOUT, ErrorClass.UNAVAILABLE, ErrorClass.FATAL}
+RETRYABLE = {ErrorClass.RATE_LIMITED, ErrorClass.TIMEOUT, ErrorClass.UNAVAILABLE, ErrorClass.PARSE}
+
+class RecipeParseError(Exception):
+    """Raised when the model answered but the payload could not be used"""
+
+class LLMError(Exception):
+    """Provider-neutral failure raised by an LLM backend"""
+
+class LLMRateLimitError(LLMError):
+    pass
+
+class LLMTimeoutError(LLMError):
+    pass
+
+class LLMUnavailableError(LLMError):
+    pass
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+def classify_error(error: Exception) -> ErrorClass:
+    """Map an exception raised around a model call to a retry class"""
+    if isinstance(error, RecipeParseError):
+        return ErrorClass.PARSE
+    if isinstance(error, LLMRateLimitError):
+        return ErrorClass.RATE_LIMITED
+    if isinstance(error, (LLMTimeoutError, asyncio.TimeoutError, TimeoutError)):
+        return ErrorClass.TIMEOUT
+    if isinstance(error, LLMUnavailableError):
+        return ErrorClass.UNAVAILABLE
+
+    try:
+        from google.api_core import exceptions as google_exceptions
+    except ImportError:
+        google_exceptions = None
+
+    if google_exceptions is not None:
+        if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return ErrorClass.RATE_LIMITED
+        if isinstance(error, (google_exceptions.DeadlineExceeded, google_exceptions.GatewayTimeout)):
+            return ErrorClass.TIMEOUT
+        if isinstance(error, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError)):
+            return ErrorClass.UNAVAILABLE
+        if isinstance(error, google_exceptions.GoogleAPICallError):
+            return ErrorClass.FATAL
+
+    message = str(error).lower()
+    if "429" in message or "quota" in message or "rate limit" in message:
+        return ErrorClass.RATE_LIMITED
+    if "timeout" in message or "timed out" in message or "deadline" in message:
+        return ErrorClass.TIMEOUT
+    if "503" in message or "unavailable" in message or "connection" in message:
+        return ErrorClass.UNAVAILABLE
+    return ErrorClass.FATAL
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, base_delay: float, max_delay: float, multiplier: float = 2.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def backoff(self, attempt: int, error_class: ErrorClass) -> float:
+        base = self.base_delay
+        if error_class == ErrorClass.RATE_LIMITED:
+            # Quota errors need more room than a transient blip
+            base *= 4
+        elif error_class == ErrorClass.PARSE:
+            # The provider is healthy; a short pause is enough
+            base /= 2
+        ceiling = min(self.max_delay, base * (self.multiplier ** attempt))
+        return random.uniform(0, ceiling)
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over a sliding window of recent calls"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.window_size = window_size
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at: Optional[float] = None
+        self.open_count = 0
+        self.rejected_count = 0
+        self._outcomes = deque(maxlen=window_size)
+        self._probe_in_flight = False
+
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go through; moves open -> half-open after the timeout"""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                self.rejected_count += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"Circuit '{self.name}' half-open, allowing a probe call")
+
+        # Half-open: exactly one probe at a time
+        if self._probe_in_flight:
+            self.rejected_count += 1
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def check(self):
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_after() or self.reset_timeout)
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            logger.info(f"Circuit '{self.name}' closed after successful probe")
+            self.state = self.CLOSED
+            self._outcomes.clear()
+            self._probe_in_flight = False
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self._trip()
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls and self.failure_rate() >= self.failure_rate_threshold:
+            self._trip()
+
+    def release_probe(self):
+        """A call that ended with no outcome (cancelled, or turned away before the provider) frees the probe"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def _trip(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.open_count += 1
+        self._probe_in_flight = False
+        logger.warning(
+            f"Circuit '{self.name}' opened (failure rate {self.failure_rate():.0%}, "
+            f"retry in {self.reset_timeout:.0f}s)"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Reading the state should reflect an expired open period
+        state = self.state
+        if state == self.OPEN and self.retry_after() == 0:
+            state = self.HALF_OPEN
+        return {
+            "state": state,
+            "failure_rate": round(self.failure_rate(), 3),
+            "window_calls": len(self._outcomes),
+            "open_count": self.open_count,
+            "rejected_calls": self.rejected_count,
+            "retry_after_seconds": round(self.retry_after(), 1)
+        }
@@ -0,0 +1,54 @@
+#responses.py
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+import json
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+def bson_default(obj: Any) -> Any:
+    """Encode the BSON and Python types JSON has no native form for"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # orjson writes datetime (same isoformat output) and Enum natively; default covers the rest
+        return orjson.dumps(content, default=bson_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=bson_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class BSONResponse(JSONResponse):
+    """
+    JSON response that encodes Mongo documents directly: ObjectId as its hex
+    string, datetimes as ISO 8601. Returning one from a handler skips
+    FastAPI's jsonable_encoder pass and any per-document conversion loop.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
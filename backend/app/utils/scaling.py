@@ -0,0 +1,150 @@
+#scaling.py
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.nutrition import Quantity, compute_nutrition, parse_quantity
+
+# Each family is converted through its smallest unit; larger units take over
+# from the listed threshold (in the smallest unit) upwards
+_FAMILIES = {
+    "metric_mass": (("g", 1.0, 0), ("kg", 1000.0, 1000)),
+    "imperial_mass": (("oz", 1.0, 0), ("lb", 16.0, 16)),
+    "metric_volume": (("ml", 1.0, 0), ("l", 1000.0, 1000)),
+    # A quarter cup and up reads better in cups, a tablespoon and up in tablespoons
+    "us_volume": (("tsp", 1.0, 0), ("tbsp", 3.0, 3), ("cup", 48.0, 12)),
+}
+_UNIT_FAMILY = {unit: family for family, units in _FAMILIES.items() for unit, _, _ in units}
+_UNIT_SIZE = {unit: size for units in _FAMILIES.values() for unit, size, _ in units}
+# Written straight after the number: "750g", "1.5l"
+_METRIC = {"mg", "g", "kg", "ml", "l"}
+
+_PLURAL_UNITS = {
+    "cup": "cups", "clove": "cloves", "can": "cans", "jar": "jars", "package": "packages", "slice": "slices",
+    "piece": "pieces", "fillet": "fillets", "handful": "handfuls", "bunch": "bunches", "stalk": "stalks",
+    "sprig": "sprigs", "head": "heads", "pinch": "pinches", "dash": "dashes", "inch": "inches",
+}
+
+_GLYPHS = {0.125: "⅛", 0.25: "¼", 1 / 3: "⅓", 0.5: "½", 2 / 3: "⅔", 0.75: "¾"}
+
+def _nearest(value: float, steps: Tuple[float, ...]) -> float:
+    """Round to the nearest whole-plus-fraction; never down to nothing"""
+    whole = int(value)
+    candidates = [whole + step for step in (0.0,) + steps + (1.0,)]
+    best = min(candidates, key=lambda c: abs(c - value))
+    return best if best > 0 else min(s for s in steps)
+
+def _round_amount(value: float, unit: Optional[str]) -> float:
+    if unit in _METRIC:
+        if unit in ("kg", "l"):
+            return round(value, 2)
+        if value >= 100:
+            return max(round(value / 5) * 5, 5)
+        return round(value) if value >= 10 else max(round(value, 1), 0.1)
+    if unit in ("tsp", "tbsp", "cup"):
+        return _nearest(value, (0.125, 0.25, 1 / 3, 0.5, 2 / 3, 0.75) if unit == "tsp" else (0.25, 1 / 3, 0.5, 2 / 3, 0.75))
+    if value >= 10:
+        return float(round(value))
+    return _nearest(value, (0.25, 0.5, 0.75) if value < 2 else (0.5,))
+
+def _format_number(value: float, unit: Optional[str]) -> str:
+    if unit in _METRIC:
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    whole = int(value)
+    fraction = value - whole
+    for step, glyph in _GLYPHS.items():
+        if abs(fraction - step) < 1e-6:
+            return f"{whole}{glyph}" if whole else glyph
+    return str(whole) if fraction < 1e-6 else f"{value:.2f}".rstrip("0").rstrip(".")
+
+def normalize(amount: float, unit: Optional[str]) -> Tuple[float, Optional[str]]:
+    """Move to the unit that reads best within the same system: 1500 g -> 1.5 kg, 6 tsp -> 2 tbsp"""
+    family = _UNIT_FAMILY.get(unit)
+    if family is None:
+        return amount, unit
+    base = amount * _UNIT_SIZE[unit]
+    best = _FAMILIES[family][0][0]
+    for candidate, _, threshold in _FAMILIES[family]:
+        if base >= threshold:
+            best = candidate
+    return base / _UNIT_SIZE[best], best
+
+def _inflect(name: str, plural: bool) -> str:
+    """Pluralize or singularize the noun of a counted ingredient: "large egg" <-> "large eggs" """
+    head, sep, tail = name.partition(",")
+    words = head.rstrip().split(" ")
+    if not words or not words[-1].isalpha():
+        return name
+    word = words[-1]
+    if plural and not word.endswith("s"):
+        if word.endswith("y") and word[-2:-1] not in "aeiou":
+            word = word[:-1] + "ies"
+        elif word.endswith(("ch", "sh", "x", "to")):
+            word += "es"
+        else:
+            word += "s"
+    elif not plural and word.endswith("s") and not word.endswith("ss"):
+        if word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif word.endswith(("ches", "shes", "xes", "toes")):
+            word = word[:-2]
+        else:
+            word = word[:-1]
+    words[-1] = word
+    return " ".join(words) + (sep + tail if sep else "")
+
+def _render(amount: float, upper: Optional[float], unit: Optional[str], quantity: Quantity) -> str:
+    number = _format_number(amount, unit)
+    if upper is not None:
+        number += "-" + _format_number(upper, unit)
+    top = upper if upper is not None else amount
+    parts = [number]
+    if unit in _METRIC:
+        parts[0] += unit
+    elif unit is not None:
+        parts.append(_PLURAL_UNITS.get(unit, unit) if top > 1 else unit)
+    if quantity.size:
+        parts.append(quantity.size)
+    name = quantity.name
+    if unit is None and name:
+        before = quantity.upper if quantity.upper is not None else quantity.amount
+        if (top > 1) != (before > 1):
+            name = _inflect(name, plural=top > 1)
+    if name:
+        parts.append(name)
+    return " ".join(parts)
+
+@lru_cache(maxsize=16384)
+def scale_ingredient(line: str, factor: float) -> str:
+    """
+    One ingredient line scaled by `factor` with its unit normalized:
+    ("500g chicken", 3) -> "1.5kg chicken", ("1 tbsp oil", 0.5) -> "1½ tsp oil".
+    Lines without a leading amount ("salt to taste") come back unchanged.
+    """
+    quantity = parse_quantity(line)
+    if quantity.amount is None or factor == 1:
+        return line
+    amount, unit = normalize(quantity.amount * factor, quantity.unit)
+    upper = None
+    if quantity.upper is not None:
+        # Both ends of a range in the unit picked for the lower one
+        upper = quantity.upper * factor * _UNIT_SIZE.get(quantity.unit, 1.0) / _UNIT_SIZE.get(unit, 1.0)
+        upper = _round_amount(upper, unit)
+    amount = _round_amount(amount, unit)
+    if upper is not None and upper <= amount:
+        upper = None
+    return _render(amount, upper, unit, quantity)
+
+def scale_recipe(recipe: Dict[str, Any], servings: int) -> Dict[str, Any]:
+    """
+    A copy of a stored recipe for a different number of servings. Quantities
+    are scaled and normalized locally; nutrition stays per serving and is
+    recomputed from the scaled lines, so it only moves by their rounding.
+    """
+    original = max(int(recipe.get("servings") or 1), 1)
+    factor = servings / original
+    ingredients = [scale_ingredient(str(line), factor) for line in recipe.get("ingredients") or []]
+    scaled = dict(recipe)
+    scaled["ingredients"] = ingredients
+    scaled["servings"] = servings
+    scaled["nutrition_info"] = compute_nutrition(ingredients, servings).model_dump()
+    return scaled
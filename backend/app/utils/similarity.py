@@ -0,0 +1,234 @@
+#similarity.py
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import json
+import os
+import time
+import warnings
+import zlib
+
+import numpy as np
+
+from app.utils.ingredients import canonical_set
+from app.utils.nutrition import NUTRIENTS
+
+# Rows per matmul when a pass over the whole matrix needs a temporary
+CHUNK_ROWS = 8192
+
+SNAPSHOT_META = "current.json"
+
+def recipe_terms(recipe: Dict[str, Any]) -> List[str]:
+    """Canonical ingredients, cuisine and tags, prefixed so the three never collide"""
+    terms = [f"i:{name}" for name in canonical_set(recipe.get("ingredients") or [])]
+    cuisine = str(recipe.get("cuisine_type") or "").strip().lower()
+    if cuisine:
+        terms.append(f"c:{cuisine}")
+    terms.extend(f"t:{tag.strip().lower()}" for tag in recipe.get("tags") or [] if str(tag).strip())
+    return terms
+
+class SimilarityMatrix:
+    """
+    Dense TF-IDF matrix over stored recipes, one float32 row per recipe, plus
+    a small nutrition matrix. Terms are hashed into a fixed number of columns,
+    so a new ingredient never reshapes the matrix and appending a recipe is a
+    single row write into spare capacity.
+
+    Rows keep raw term counts; IDF weights are applied at query time, so
+    appends never rewrite earlier rows. Cosine similarity is computed for a
+    whole batch of queries with one matrix product.
+    """
+
+    def __init__(self, dims: int = 1024, nutrition_weight: float = 0.2):
+        self.dims = dims
+        self.nutrition_weight = nutrition_weight
+        self.hashes: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.terms = np.zeros((0, dims), dtype=np.float32)
+        self.nutrition = np.zeros((0, len(NUTRIENTS)), dtype=np.float32)
+        self.df = np.zeros(dims, dtype=np.float64)
+        self._cache: Optional[Tuple[int, np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __contains__(self, recipe_hash: str) -> bool:
+        return recipe_hash in self.rows
+
+    def _column(self, term: str) -> int:
+        # crc32 rather than hash(): columns must agree across processes and snapshots
+        return zlib.crc32(term.encode("utf-8")) % self.dims
+
+    def vectorize(self, recipe: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        terms = np.zeros(self.dims, dtype=np.float32)
+        for term in recipe_terms(recipe):
+            terms[self._column(term)] += 1
+        info = recipe.get("nutrition_info") or {}
+        if info.get("available") is False:
+            # Zeros stand in for unknown values; compare as missing
+            info = {}
+        nutrition = np.array(
+            [info.get(name) if isinstance(info.get(name), (int, float)) else np.nan for name in NUTRIENTS],
+            dtype=np.float32
+        )
+        return terms, nutrition
+
+    def _reserve(self, rows: int):
+        """Grow capacity geometrically; also copies a read-only snapshot into memory"""
+        capacity = self.terms.shape[0]
+        if rows <= capacity and self.terms.flags.writeable:
+            return
+        capacity = max(rows, capacity * 2, 256)
+        terms = np.zeros((capacity, self.dims), dtype=np.float32)
+        nutrition = np.full((capacity, len(NUTRIENTS)), np.nan, dtype=np.float32)
+        terms[:len(self)] = self.terms[:len(self)]
+        nutrition[:len(self)] = self.nutrition[:len(self)]
+        self.terms, self.nutrition = terms, nutrition
+
+    def add(self, recipe_hash: str, recipe: Dict[str, Any]) -> bool:
+        """Append one recipe; False when it is already in the matrix or has no terms"""
+        if recipe_hash in self.rows:
+            return False
+        terms, nutrition = self.vectorize(recipe)
+        if not terms.any():
+            return False
+        row = len(self)
+        self._reserve(row + 1)
+        self.terms[row] = terms
+        self.nutrition[row] = nutrition
+        self.df += terms > 0
+        self.rows[recipe_hash] = row
+        self.hashes.append(recipe_hash)
+        self._cache = None
+        return True
+
+    def _corpus(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Squared IDF weights, row norms and unit nutrition rows; cached until the next append"""
+        n = len(self)
+        if self._cache is not None and self._cache[0] == n:
+            return self._cache[1:]
+
+        idf = np.log((1 + n) / (1 + self.df)) + 1
+        idf_sq = (idf * idf).astype(np.float32)
+        norms = np.empty(n, dtype=np.float32)
+        for start in range(0, n, CHUNK_ROWS):
+            chunk = self.terms[start:min(start + CHUNK_ROWS, n)]
+            norms[start:start + len(chunk)] = np.sqrt(np.square(chunk) @ idf_sq)
+
+        nutrition = self._scale_nutrition(self.nutrition[:n], self.nutrition[:n])
+        self._cache = (n, idf_sq, norms, nutrition)
+        return idf_sq, norms, nutrition
+
+    @staticmethod
+    def _scale_nutrition(values: np.ndarray, corpus: np.ndarray) -> np.ndarray:
+        """Log-scaled z-scores against the corpus, as unit rows; unknown values count as average"""
+        logs = np.log1p(np.clip(values, 0, None))
+        corpus_logs = np.log1p(np.clip(corpus, 0, None))
+        with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+            # Columns no recipe has a value for come out NaN and then zero
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.nanmean(corpus_logs, axis=0)
+            std = np.nanstd(corpus_logs, axis=0)
+            scaled = np.nan_to_num((logs - mean) / np.where(std > 0, std, 1))
+            norms = np.linalg.norm(scaled, axis=1, keepdims=True)
+        return (scaled / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+    def similar(
+        self,
+        recipes: List[Dict[str, Any]],
+        k: int = 10,
+        exclude: Optional[List[Set[str]]] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k most similar stored recipes for each query recipe, as
+        (recipe_hash, score) pairs. Score blends TF-IDF cosine with nutrition
+        cosine by `nutrition_weight`.
+        """
+        n = len(self)
+        if not recipes or n == 0:
+            return [[] for _ in recipes]
+        idf_sq, norms, corpus_nutrition = self._corpus()
+
+        vectors = [self.vectorize(recipe) for recipe in recipes]
+        queries = np.stack([terms for terms, _ in vectors])
+        query_norms = np.sqrt(np.square(queries) @ idf_sq)
+        query_nutrition = self._scale_nutrition(
+            np.stack([nutrition for _, nutrition in vectors]), self.nutrition[:n]
+        )
+
+        # (n x dims) @ (dims x batch): one product scores every query
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = (self.terms[:n] @ (queries * idf_sq).T) / np.outer(norms, query_norms)
+        scores = np.nan_to_num(scores, nan=0.0, posinf=0.0)
+        scores = (1 - self.nutrition_weight) * scores + self.nutrition_weight * (corpus_nutrition @ query_nutrition.T)
+
+        results = []
+        for column in range(len(recipes)):
+            column_scores = scores[:, column]
+            for recipe_hash in (exclude[column] if exclude else ()):
+                row = self.rows.get(recipe_hash)
+                if row is not None:
+                    column_scores[row] = -np.inf
+            top = min(k, n)
+            candidates = np.argpartition(-column_scores, top - 1)[:top]
+            ranked = candidates[np.argsort(-column_scores[candidates], kind="stable")]
+            results.append([
+                (self.hashes[row], round(float(column_scores[row]), 4))
+                for row in ranked if np.isfinite(column_scores[row])
+            ])
+        return results
+
+    def save(self, directory: str, meta: Optional[Dict[str, Any]] = None):
+        """
+        Write a snapshot that load() can memory-map. Arrays go to new files and
+        current.json is swapped in last, so readers never see a torn snapshot.
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        n = len(self)
+        stamp = f"{int(time.time() * 1000)}-{os.getpid()}"
+        terms_file, nutrition_file = f"terms-{stamp}.npy", f"nutrition-{stamp}.npy"
+        np.save(path / terms_file, self.terms[:n])
+        np.save(path / nutrition_file, self.nutrition[:n])
+
+        tmp = path / f"{SNAPSHOT_META}.{stamp}.tmp"
+        tmp.write_text(json.dumps({
+            **(meta or {}),
+            "dims": self.dims,
+            "hashes": self.hashes[:n],
+            "terms_file": terms_file,
+            "nutrition_file": nutrition_file
+        }))
+        os.replace(tmp, path / SNAPSHOT_META)
+
+        # Drop array files no snapshot refers to any more. Another worker may
+        # have swapped in its own snapshot meanwhile, so keep whatever the
+        # current meta names and anything written in the last minute.
+        keep = {terms_file, nutrition_file}
+        current = json.loads((path / SNAPSHOT_META).read_text())
+        keep.update((current.get("terms_file"), current.get("nutrition_file")))
+        for old in path.glob("*.npy"):
+            try:
+                if old.name not in keep and time.time() - old.stat().st_mtime > 60:
+                    old.unlink()
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def load(cls, directory: str, dims: int, nutrition_weight: float) -> Tuple[Optional["SimilarityMatrix"], Dict[str, Any]]:
+        """Memory-map a snapshot; (None, {}) when there is none or it was built with other dims"""
+        path = Path(directory)
+        try:
+            meta = json.loads((path / SNAPSHOT_META).read_text())
+        except FileNotFoundError:
+            return None, {}
+        if meta.get("dims") != dims:
+            return None, {}
+
+        matrix = cls(dims, nutrition_weight)
+        matrix.terms = np.load(path / meta["terms_file"], mmap_mode="r")
+        matrix.nutrition = np.load(path / meta["nutrition_file"], mmap_mode="r")
+        matrix.hashes = list(meta["hashes"])
+        matrix.rows = {recipe_hash: row for row, recipe_hash in enumerate(matrix.hashes)}
+        for start in range(0, len(matrix.hashes), CHUNK_ROWS):
+            matrix.df += (matrix.terms[start:start + CHUNK_ROWS] > 0).sum(axis=0)
+        return matrix, meta
@@ -0,0 +1,73 @@
+#singleflight.py
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import asyncio
+import logging
+
+from app.utils.metrics import COALESCED_CALLS
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+
+    The first caller (leader) starts the work as its own task; callers that
+    arrive while it runs (followers) await the same task. Each caller waits
+    through asyncio.shield, so one caller disconnecting never cancels the
+    shared work; it is only cancelled when every caller has gone. The key is
+    forgotten as soon as the work finishes, so nothing is cached.
+
+    The work runs in the leader's context (its user, its fair share). A
+    follower whose flight fails with an error `rerun_on` says belongs to the
+    leader alone runs its own work instead of inheriting that error.
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        work: Callable[[], Awaitable[Any]],
+        rerun_on: Optional[Callable[[BaseException], bool]] = None
+    ) -> Any:
+        flight = self._flights.get(key)
+        leader = flight is None or flight.task.done()
+        if leader:
+            # The task copies this context, so the leader's trace and user carry over
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(work()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            COALESCED_CALLS.inc((self.group, "leader"))
+        else:
+            COALESCED_CALLS.inc((self.group, "follower"))
+            logger.info(f"🔗 Joined in-flight {self.group} call ({flight.waiters} already waiting)")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        except Exception as e:
+            if leader or rerun_on is None or not rerun_on(e):
+                raise
+        finally:
+            flight.waiters -= 1
+
+        logger.info(f"Re-running {self.group} call after the leader's own rejection")
+        return await self.do(key, work)
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,319 @@
+#tracing.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+from pymongo import monitoring
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "sampled")
+
+    def __init__(self, sampled: bool):
+        self.trace_id = "%032x" % random.getrandbits(128)
+        self.spans: List["Span"] = []
+        self.sampled = sampled
+
+class Span:
+    __slots__ = ("name", "trace", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace: Trace, parent_id: Optional[str] = None,
+                 kind: int = SPAN_KIND_INTERNAL, start_ns: Optional[int] = None):
+        self.name = name
+        self.trace = trace
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        # list.append is atomic, so Motor's worker threads can add spans too
+        trace.spans.append(self)
+
+    def end(self, end_ns: Optional[int] = None):
+        self.end_ns = end_ns or time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """Child span of the current one; a no-op outside a traced request"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace, parent.span_id, kind)
+    child.attributes.update(attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end()
+        _current_span.reset(token)
+
+def traced(name: Optional[str] = None):
+    """Decorator: run the function inside a span named after its qualified name"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# ============== MOTOR COMMANDS ==============
+
+def propagate_context_to_motor():
+    """
+    Motor runs pymongo on a thread pool via run_in_executor, which does not
+    carry contextvars across. Wrap its executor hook so command listeners see
+    the span of the coroutine that issued the command.
+    """
+    from motor.frameworks import asyncio as motor_asyncio
+    from contextvars import copy_context
+
+    original = motor_asyncio.run_on_executor
+    if getattr(original, "propagates_context", False):
+        return
+
+    def run_on_executor(loop, fn, *args, **kwargs):
+        return original(loop, copy_context().run, functools.partial(fn, *args, **kwargs))
+
+    run_on_executor.propagates_context = True
+    motor_asyncio.run_on_executor = run_on_executor
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """One client span per Motor command, parented to the issuing coroutine's span"""
+
+    def started(self, event):
+        pass
+
+    def _record(self, event, error: Optional[str] = None):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        end_ns = time.time_ns()
+        child = Span(
+            f"mongo.{event.command_name}", parent.trace, parent.span_id,
+            SPAN_KIND_CLIENT, start_ns=end_ns - event.duration_micros * 1000
+        )
+        child.attributes["db.system"] = "mongodb"
+        child.attributes["db.operation"] = event.command_name
+        child.error = error
+        child.end(end_ns)
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event, error=str(event.failure))
+
+MONGO_COMMAND_TRACER = MongoCommandTracer()
+
+# ============== EXPORT ==============
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest, as the collector's file exporter writes it"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [
+                    {
+                        "traceId": s.trace.trace_id,
+                        "spanId": s.span_id,
+                        "parentSpanId": s.parent_id or "",
+                        "name": s.name,
+                        "kind": s.kind,
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                    }
+                    for s in spans
+                ]
+            }]
+        }]
+    }
+
+class SpanExporter:
+    """
+    Ships finished traces from a background thread so that file and network
+    I/O never runs on the event loop. Batches go to a JSONL file and/or an
+    OTLP/HTTP collector endpoint (e.g. http://localhost:4318/v1/traces).
+    """
+
+    def __init__(self, file_path: str = "", otlp_endpoint: str = "", service_name: str = "recipe-api",
+                 batch_size: int = 256, flush_interval: float = 2.0):
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.otlp_endpoint)
+
+    def export(self, trace: Trace):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(trace.spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = []
+            if item is None:
+                self._flush(batch)
+                return
+            batch.extend(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, spans: List[Span]):
+        if not spans:
+            return
+        payload = to_otlp(spans, self.service_name)
+        if self.file_path:
+            try:
+                directory = os.path.dirname(self.file_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.file_path, "a") as f:
+                    f.write(json.dumps(payload) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not write spans to {self.file_path}: {e}")
+        if self.otlp_endpoint:
+            try:
+                import httpx
+                httpx.post(self.otlp_endpoint, json=payload, timeout=5.0).raise_for_status()
+            except Exception as e:
+                logger.warning(f"Could not export spans to {self.otlp_endpoint}: {e}")
+
+# ============== MIDDLEWARE ==============
+
+_TOKEN_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+def server_timing(trace: Trace, root: Span, limit: int = 20) -> str:
+    """Server-Timing value: total plus time summed per span name, largest first"""
+    totals: Dict[str, float] = {}
+    for s in trace.spans:
+        if s is root or s.end_ns is None:
+            continue
+        totals[s.name] = totals.get(s.name, 0.0) + s.duration_ms
+    entries = [f"total;dur={root.duration_ms:.1f}"]
+    for name, duration in sorted(totals.items(), key=lambda item: -item[1])[:limit]:
+        entries.append(f"{_TOKEN_UNSAFE.sub('_', name)};dur={duration:.1f}")
+    return ", ".join(entries)
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each request"""
+
+    def __init__(self, app, exporter: Optional[SpanExporter] = None):
+        self.app = app
+        self.settings = get_settings()
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = random.random() < self.settings.TRACING_SAMPLE_RATE
+        trace = Trace(sampled)
+        root = Span(f"{scope['method']} {scope['path']}", trace, kind=SPAN_KIND_SERVER)
+        root.attributes["http.method"] = scope["method"]
+        root.attributes["http.target"] = scope["path"]
+        token = _current_span.set(root)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                if self.settings.TRACING_SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(trace, root).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+                root.attributes["http.route"] = route.path
+            root.end()
+            if trace.sampled and self.exporter is not None and self.exporter.enabled:
+                self.exporter.export(trace)
@@ -0,0 +1,127 @@
+"""
+Worker cold-start benchmark.
+
+Imports a module (default: main) in fresh interpreters with `-X importtime`
+and reports the cumulative import time, whole-process wall time and the
+slowest modules. Autoscaled and restarted workers pay this on every start.
+
+    python -m benchmarks.bench_import_time [--runs 5] [--module main] [--top 15]
+    python -m benchmarks.bench_import_time --output import-results.json --baseline old.json
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def profile_once(module: str) -> Dict:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = {
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2
+            }
+    return {"wall_ms": wall * 1000, "modules": modules}
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level and package imports to list")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed import-time growth before failing")
+    args = parser.parse_args()
+
+    # The first run warms the filesystem cache and writes .pyc files
+    profile_once(args.module)
+    runs = [profile_once(args.module) for _ in range(args.runs)]
+
+    import_ms = [run["modules"][args.module]["cumulative_us"] / 1000 for run in runs]
+    wall_ms = [run["wall_ms"] for run in runs]
+
+    # Median cumulative time per module across runs
+    names = set().union(*(run["modules"] for run in runs))
+    per_module: List[Dict] = []
+    for name in names:
+        samples = [run["modules"][name] for run in runs if name in run["modules"]]
+        per_module.append({
+            "module": name,
+            "cumulative_ms": round(statistics.median(s["cumulative_us"] for s in samples) / 1000, 2),
+            "self_ms": round(statistics.median(s["self_us"] for s in samples) / 1000, 2),
+        })
+    per_module.sort(key=lambda m: -m["cumulative_ms"])
+    top_level = [m for m in per_module if "." not in m["module"] and m["module"] != args.module][:args.top]
+
+    results = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms": {
+            "median": round(statistics.median(import_ms), 1),
+            "min": round(min(import_ms), 1),
+            "max": round(max(import_ms), 1),
+        },
+        "process_wall_ms": {
+            "median": round(statistics.median(wall_ms), 1),
+            "min": round(min(wall_ms), 1),
+            "max": round(max(wall_ms), 1),
+        },
+        "module_count": len(names),
+        "slowest_top_level": top_level,
+    }
+
+    print(f"import {args.module}: median {results['import_ms']['median']} ms "
+          f"(min {results['import_ms']['min']}, max {results['import_ms']['max']}) over {args.runs} runs")
+    print(f"process wall time: median {results['process_wall_ms']['median']} ms, {len(names)} modules loaded")
+    print(f"\n{'top-level package':40} {'cumulative ms':>14} {'self ms':>9}")
+    for entry in top_level:
+        print(f"{entry['module']:40} {entry['cumulative_ms']:>14.1f} {entry['self_ms']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        before = baseline["import_ms"]["median"]
+        after = results["import_ms"]["median"]
+        change = (after - before) / before
+        print(f"\nvs {args.baseline} (revision {baseline.get('revision')}): "
+              f"{before} -> {after} ms ({change:+.1%})")
+        if change > args.tolerance:
+            print("REGRESSION: cold-start import time grew past tolerance")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
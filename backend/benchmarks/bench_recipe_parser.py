@@ -0,0 +1,136 @@
+"""
+Recipe parser benchmark.
+
+Compares the original regex/json parser with app.utils.recipe_parser over a
+corpus of model outputs (clean, fenced, prose-wrapped, trailing commas,
+missing commas, truncated, ...).
+
+    python -m benchmarks.bench_recipe_parser [--iterations 2000] [--output results.json]
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from app.models.schemas import RecipeResponse, NutritionInfo
+from app.utils.recipe_parser import parse_recipe
+
+CORPUS_PATH = Path(__file__).parent / "corpus" / "malformed_recipe_outputs.jsonl"
+
+def legacy_parse(response_text: str) -> RecipeResponse:
+    """The parser RecipeService used before the single-pass parser, kept verbatim for comparison"""
+    cleaned_text = response_text.strip()
+    if cleaned_text.startswith('```json'):
+        cleaned_text = cleaned_text[7:]
+    elif cleaned_text.startswith('```'):
+        cleaned_text = cleaned_text[3:]
+    if cleaned_text.endswith('```'):
+        cleaned_text = cleaned_text[:-3]
+    cleaned_text = cleaned_text.strip()
+
+    json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
+    if json_match:
+        cleaned_text = json_match.group()
+
+    cleaned_text = re.sub(r',(\s*[}\]])', r'\1', cleaned_text)
+    cleaned_text = re.sub(r'"\s*\n\s*"', '",\n"', cleaned_text)
+
+    try:
+        recipe_data = json.loads(cleaned_text)
+    except json.JSONDecodeError:
+        start = cleaned_text.find('{')
+        end = cleaned_text.rfind('}')
+        if start != -1 and end != -1:
+            recipe_data = json.loads(cleaned_text[start:end+1])
+        else:
+            raise
+
+    nutrition_data = recipe_data.get('nutrition_info', {})
+    nutrition_info = NutritionInfo(
+        calories=float(nutrition_data.get('calories', 300)),
+        protein=float(nutrition_data.get('protein', 15)),
+        carbs=float(nutrition_data.get('carbs', 30)),
+        fat=float(nutrition_data.get('fat', 10)),
+        fiber=float(nutrition_data.get('fiber', 5)),
+        sugar=float(nutrition_data.get('sugar', 5)),
+        sodium=float(nutrition_data.get('sodium', 400))
+    )
+    return RecipeResponse(
+        title=recipe_data.get('title', 'Generated Recipe'),
+        description=recipe_data.get('description', 'A delicious recipe'),
+        ingredients=recipe_data.get('ingredients', []),
+        instructions=recipe_data.get('instructions', []),
+        prep_time=int(recipe_data.get('prep_time', 15)),
+        cook_time=int(recipe_data.get('cook_time', 30)),
+        total_time=int(recipe_data.get('total_time', 45)),
+        servings=int(recipe_data.get('servings', 2)),
+        difficulty=recipe_data.get('difficulty', 'medium'),
+        cuisine_type=recipe_data.get('cuisine_type', 'fusion'),
+        nutrition_info=nutrition_info,
+        tags=recipe_data.get('tags', [])
+    )
+
+def new_parse(response_text: str) -> RecipeResponse:
+    return parse_recipe(response_text)[0]
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def measure(parser, text: str, iterations: int):
+    try:
+        parser(text)
+    except Exception as e:
+        return {"ok": False, "error": type(e).__name__}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parser(text)
+    elapsed = time.perf_counter() - start
+    return {"ok": True, "us_per_parse": round(elapsed / iterations * 1e6, 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    rows = []
+    for case in corpus:
+        rows.append({
+            "case": case["name"],
+            "bytes": len(case["text"]),
+            "legacy": measure(legacy_parse, case["text"], args.iterations),
+            "new": measure(new_parse, case["text"], args.iterations),
+        })
+
+    print(f"{'case':40} {'legacy us':>12} {'new us':>12} {'speedup':>8}")
+    for row in rows:
+        legacy, new = row["legacy"], row["new"]
+        legacy_cell = f"{legacy['us_per_parse']:.1f}" if legacy["ok"] else f"FAIL ({legacy['error']})"
+        new_cell = f"{new['us_per_parse']:.1f}" if new["ok"] else f"FAIL ({new['error']})"
+        speedup = (
+            f"{legacy['us_per_parse'] / new['us_per_parse']:.2f}x"
+            if legacy["ok"] and new["ok"] else "-"
+        )
+        print(f"{row['case']:40} {legacy_cell:>12} {new_cell:>12} {speedup:>8}")
+
+    both = [r for r in rows if r["legacy"]["ok"] and r["new"]["ok"]]
+    summary = {
+        "cases": len(rows),
+        "legacy_parsed": sum(r["legacy"]["ok"] for r in rows),
+        "new_parsed": sum(r["new"]["ok"] for r in rows),
+        "legacy_parses_per_sec": round(len(both) / sum(r["legacy"]["us_per_parse"] for r in both) * 1e6) if both else None,
+        "new_parses_per_sec": round(len(both) / sum(r["new"]["us_per_parse"] for r in both) * 1e6) if both else None,
+    }
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summary": summary, "cases": rows}, f, indent=2)
+    return 0 if summary["new_parsed"] == summary["cases"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
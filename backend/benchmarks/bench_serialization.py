@@ -0,0 +1,119 @@
+"""
+History page serialization benchmark.
+
+Encodes a page of recipe_history documents (ObjectId ids, datetimes, nested
+recipe and nutrition) the way the handlers used to - ObjectId-to-str loop,
+then FastAPI's jsonable_encoder and JSONResponse - and with BSONResponse.
+
+    python -m benchmarks.bench_serialization [--page-size 100] [--iterations 500] [--output results.json]
+"""
+import argparse
+import copy
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.utils import responses
+from app.utils.responses import BSONResponse
+
+def make_history_page(size: int):
+    now = datetime.utcnow()
+    page = []
+    for i in range(size):
+        page.append({
+            "_id": ObjectId(),
+            "user_id": str(ObjectId()),
+            "recipe": {
+                "title": f"Smoky Chickpea and Spinach Stew #{i}",
+                "description": "A hearty one-pot stew with warming spices and a squeeze of lemon.",
+                "ingredients": [
+                    "400g chickpeas", "200g spinach", "1 onion", "3 cloves garlic",
+                    "1 tsp smoked paprika", "400g chopped tomatoes", "1 tbsp olive oil", "1 lemon"
+                ],
+                "instructions": [
+                    "Heat the oil and soften the onion for 5 minutes.",
+                    "Add the garlic and paprika and cook for 1 minute.",
+                    "Add the tomatoes and chickpeas and simmer for 15 minutes.",
+                    "Stir in the spinach until wilted.",
+                    "Finish with lemon juice and serve."
+                ],
+                "prep_time": 10,
+                "cook_time": 25,
+                "total_time": 35,
+                "servings": 2,
+                "difficulty": "easy",
+                "cuisine_type": "mediterranean",
+                "nutrition_info": {
+                    "calories": 420.0, "protein": 18.5, "carbs": 52.0, "fat": 14.0,
+                    "fiber": 14.0, "sugar": 9.0, "sodium": 610.0
+                },
+                "tags": ["vegan", "comfort", "one-pot"]
+            },
+            "ingredients_used": ["chickpeas", "spinach", "onion", "garlic"],
+            "mood": "tired",
+            "input_method": "text",
+            "created_at": now - timedelta(hours=i)
+        })
+    return page
+
+def legacy_render(page) -> bytes:
+    """Per-document ObjectId loop, jsonable_encoder, stdlib JSONResponse"""
+    for item in page:
+        if "_id" in item:
+            item["_id"] = str(item["_id"])
+        if "recipe" in item and "_id" in item["recipe"]:
+            item["recipe"]["_id"] = str(item["recipe"]["_id"])
+    content = {"recipes": page, "total": len(page), "limit": len(page), "skip": 0, "has_more": True}
+    return JSONResponse(jsonable_encoder(content)).body
+
+def bson_render(page) -> bytes:
+    content = {"recipes": page, "total": len(page), "limit": len(page), "skip": 0, "has_more": True}
+    return BSONResponse(content).body
+
+def measure(render, page, iterations: int) -> float:
+    # Each call gets a fresh copy; the legacy path mutates documents in place
+    pages = [copy.deepcopy(page) for _ in range(iterations)]
+    start = time.perf_counter()
+    for p in pages:
+        render(p)
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    page = make_history_page(args.page_size)
+
+    # Both encoders must produce the same document
+    assert json.loads(legacy_render(copy.deepcopy(page))) == json.loads(bson_render(copy.deepcopy(page)))
+
+    results = {
+        "page_size": args.page_size,
+        "payload_bytes": len(bson_render(copy.deepcopy(page))),
+        "orjson": responses.orjson is not None,
+        "legacy_ms": round(measure(legacy_render, page, args.iterations) * 1000, 3),
+        "bson_response_ms": round(measure(bson_render, page, args.iterations) * 1000, 3),
+    }
+    if responses.orjson is not None:
+        # Also report the stdlib fallback used when orjson is not installed
+        orjson, responses.orjson = responses.orjson, None
+        results["bson_response_stdlib_ms"] = round(measure(bson_render, page, args.iterations) * 1000, 3)
+        responses.orjson = orjson
+    results["speedup"] = round(results["legacy_ms"] / results["bson_response_ms"], 1)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
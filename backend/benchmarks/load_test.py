@@ -0,0 +1,329 @@
+"""
+End-to-end HTTP load test for the FastAPI app.
+
+Drives main.app through the full user journey (register/login,
+extract-from-text, generate, history paging, favorites, dashboard) with the
+local LLM stand-in, and reports throughput plus p50/p95/p99 per route.
+
+    # In-process, in-memory MongoDB stand-in (needs mongomock-motor)
+    python -m benchmarks.load_test --in-memory --users 20 --iterations 10
+
+    # In-process against a local MongoDB
+    python -m benchmarks.load_test --mongo-url mongodb://localhost:27017 --database bench_db
+
+    # Against an already running server (started with MOCK_AI_RESPONSES=True)
+    python -m benchmarks.load_test --base-url http://localhost:8000
+
+Results are written as JSON (--output) and can be compared with a previous
+run (--baseline); the run fails when a route's p95 regresses past --tolerance.
+
+    # Check that one user generating past their LLM burst gets 429 + Retry-After
+    python -m benchmarks.load_test --in-memory --check-throttling
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+INGREDIENT_TEXTS = [
+    "I have chicken, rice and spinach",
+    "tomatoes, onion, garlic and pasta",
+    "some eggs, cheese and mushrooms",
+    "potatoes, carrots and lentils",
+    "tofu, bell pepper, soy sauce and rice",
+]
+MOODS = ["happy", "sad", "energetic", "tired", "stressed", "calm", "excited", "bored"]
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            self.latencies[route].append(time.perf_counter() - start)
+            return None
+        self.latencies[route].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, float]]:
+    routes = {}
+    for route, values in sorted(recorder.latencies.items()):
+        ordered = sorted(values)
+        routes[route] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(route, 0),
+            "throughput_rps": round(len(ordered) / elapsed, 2),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+    return routes
+
+async def user_journey(client: httpx.AsyncClient, recorder: Recorder, iterations: int, rng: random.Random):
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    password = "bench-password-123"
+    await recorder.call(client, "POST /auth/register", "POST", "/auth/register", json={
+        "name": "Bench User", "email": email, "password": password,
+        "dietary_preferences": [], "allergies": [], "health_goals": []
+    })
+    response = await recorder.call(client, "POST /auth/login", "POST", "/auth/login", json={
+        "email": email, "password": password
+    })
+    if response is None or response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    for _ in range(iterations):
+        response = await recorder.call(
+            client, "POST /ingredients/extract-from-text", "POST", "/ingredients/extract-from-text",
+            headers=headers, json={"text": rng.choice(INGREDIENT_TEXTS)}
+        )
+        ingredients = ["chicken", "rice"]
+        if response is not None and response.status_code == 200:
+            ingredients = response.json().get("validated_ingredients") or ingredients
+
+        await recorder.call(
+            client, "POST /recipes/generate", "POST", "/recipes/generate",
+            headers=headers, json={"ingredients": ingredients, "mood": rng.choice(MOODS)}
+        )
+
+        history_ids = []
+        for skip in (0, 10):
+            response = await recorder.call(
+                client, "GET /recipes/history", "GET", "/recipes/history",
+                headers=headers, params={"limit": 10, "skip": skip}
+            )
+            if response is not None and response.status_code == 200:
+                history_ids += [item["_id"] for item in response.json().get("recipes", [])]
+
+        if history_ids:
+            recipe_id = rng.choice(history_ids)
+            await recorder.call(
+                client, "POST /recipes/{recipe_id}/favorite", "POST", f"/recipes/{recipe_id}/favorite",
+                headers=headers
+            )
+        await recorder.call(client, "GET /recipes/favorites", "GET", "/recipes/favorites", headers=headers)
+        await recorder.call(client, "GET /analytics/dashboard", "GET", "/analytics/dashboard", headers=headers)
+
+def configure_environment(args):
+    """Must run before main is imported: settings are cached on first use"""
+    os.environ["MOCK_AI_RESPONSES"] = "True"
+    os.environ["MOCK_AI_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["MOCK_AI_ERROR_RATE"] = str(args.llm_error_rate)
+    os.environ["MOCK_AI_MALFORMED_RATE"] = str(args.llm_malformed_rate)
+    os.environ["MOCK_AI_SEED"] = str(args.seed)
+    if args.mongo_url:
+        os.environ["MONGODB_URL"] = args.mongo_url
+    if args.database:
+        os.environ["DATABASE_NAME"] = args.database
+
+@asynccontextmanager
+async def in_process_client(args):
+    configure_environment(args)
+    import main
+    from app.database import mongodb
+
+    # Per-request info logs would dominate the timings
+    logging.getLogger().setLevel(args.log_level)
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+
+        class InMemoryMongoDB(mongodb.MongoDB):
+            _client = AsyncMongoMockClient()
+
+            def open(self):
+                if self.client is None:
+                    self.client = self._client
+                    self.database = self.client[self.settings.DATABASE_NAME]
+
+            async def ping(self) -> bool:
+                return True
+
+        main.MongoDB = InMemoryMongoDB
+        mongodb.MongoDB = InMemoryMongoDB
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            yield client
+
+@asynccontextmanager
+async def remote_client(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        yield client
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for route, stats in current["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before or not before.get("p95_ms"):
+            continue
+        change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"]
+        marker = "REGRESSION" if change > tolerance else "ok"
+        print(f"  {route:40} p95 {before['p95_ms']:>9.1f} -> {stats['p95_ms']:>9.1f} ms ({change:+.1%}) {marker}")
+        if change > tolerance:
+            regressions.append(route)
+    return regressions
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float):
+    """Startup warm-up runs in the background; wait for every dependency, not just the required ones"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/ready")
+            dependencies = response.json().get("dependencies", {})
+            if dependencies and all(dep["ready"] for dep in dependencies.values()):
+                return
+        except (httpx.HTTPError, ValueError):
+            pass
+        await asyncio.sleep(0.1)
+    print(f"Warning: app not fully ready after {timeout}s, starting anyway", file=sys.stderr)
+
+async def check_throttling(args) -> bool:
+    """One user generates past their LLM burst; the first call over it must be a 429 with Retry-After"""
+    client_factory = remote_client if args.base_url else in_process_client
+    async with client_factory(args) as client:
+        await wait_until_ready(client, args.timeout)
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        password = "bench-password-123"
+        await client.post("/auth/register", json={
+            "name": "Bench User", "email": email, "password": password,
+            "dietary_preferences": [], "allergies": [], "health_goals": []
+        })
+        response = await client.post("/auth/login", json={"email": email, "password": password})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        burst = int((await client.get("/admission/llm")).json()["burst"])
+
+        for i in range(burst + 2):
+            # Distinct ingredients, so no call is served from the recipe cache
+            response = await client.post("/recipes/generate", headers=headers, json={
+                "ingredients": ["rice", f"vegetable {i}"], "mood": MOODS[i % len(MOODS)]
+            })
+            if response.status_code != 200:
+                break
+        retry_after = response.headers.get("Retry-After")
+        print(f"Generate #{i + 1} of a burst of {burst}: {response.status_code}, Retry-After: {retry_after}")
+        return response.status_code == 429 and retry_after is not None and int(retry_after) >= 1
+
+async def run(args) -> Dict:
+    recorder = Recorder()
+    client_factory = remote_client if args.base_url else in_process_client
+    async with client_factory(args) as client:
+        await wait_until_ready(client, args.timeout)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(index: int):
+            async with semaphore:
+                await user_journey(client, recorder, args.iterations, random.Random(args.seed + index))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+    routes = summarize(recorder, elapsed)
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "target": args.base_url or ("in-process/in-memory" if args.in_memory else "in-process/mongodb"),
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "iterations": args.iterations,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_error_rate": args.llm_error_rate,
+            "llm_malformed_rate": args.llm_malformed_rate,
+            "seed": args.seed,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "total_requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": routes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--in-memory", action="store_true", help="Use an in-memory MongoDB stand-in")
+    target.add_argument("--base-url", help="Load-test a running server instead of main.app in-process")
+    parser.add_argument("--mongo-url", help="MongoDB URL for in-process runs")
+    parser.add_argument("--database", default="recipe_benchmark_db")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=5, help="Journey iterations per user")
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--log-level", default="WARNING", help="Root log level for in-process runs")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth before failing")
+    parser.add_argument("--check-throttling", action="store_true", help="Only check that a throttled generate gets 429 + Retry-After")
+    args = parser.parse_args()
+
+    if args.check_throttling:
+        return 0 if asyncio.run(check_throttling(args)) else 1
+
+    results = asyncio.run(run(args))
+
+    print(f"\n{'route':40} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in results["routes"].items():
+        print(
+            f"{route:40} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+            f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+        )
+    print(f"\n{results['total_requests']} requests in {results['elapsed_seconds']}s ({results['throughput_rps']} req/s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nComparison with {args.baseline} (revision {baseline.get('revision')}):")
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
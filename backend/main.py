@@ -1,26 +1,37 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, status, Form
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, status, Form, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
-import uvicorn
-from typing import List, Optional
+from bson import ObjectId
+from typing import Any, Dict, List, Optional, Tuple
 import logging
 from datetime import datetime
 import os
 import shutil
 from pathlib import Path
+import hashlib
 import time
 
-from app.database.mongodb import MongoDB, get_database
+from app.database.mongodb import MongoDB, close_shared_database, get_database, get_shared_database
 from app.models.schemas import (
     UserCreate, UserResponse, UserLogin, RecipeRequest, RecipeResponse,
     VoiceIngredientRequest, IngredientExtractionResponse,
-    MoodLog, UserProfile, RecipeHistory
+    MoodLog, UserProfile, RecipeHistory, MAX_SERVINGS
 )
-from app.services.auth_service import AuthService
-from app.services.recipe_service import RecipeService
-from app.services.voice_ingredient_service import VoiceIngredientService
+from app.services.registry import services
+from app.utils.admission import AdmissionController, AdmissionMiddleware
+from app.utils.compression import CompressionMiddleware
+from app.utils.conditional import etag_headers, etag_matches, make_etag, not_modified
 from app.utils.exceptions import CustomException
+from app.utils.export import EXPORT_FORMATS, CSVEncoder, csv_columns, encode_ndjson, export_record
+from app.utils.fair_scheduler import get_llm_scheduler, set_scheduling_key
+from app.utils.ingredients import excluded_names
+from app.utils.metrics import REGISTRY, MetricsMiddleware
+from app.utils.readiness import ReadinessMonitor
+from app.utils.responses import BSONResponse
+from app.utils.scaling import scale_recipe
+from app.utils.tracing import SpanExporter, TracingMiddleware, propagate_context_to_motor
 from app.core.config import get_settings
 
 logging.basicConfig(
@@ -30,49 +41,105 @@
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
-auth_service = AuthService()
-recipe_service = RecipeService()
-voice_service = VoiceIngredientService()
 security = HTTPBearer()
-
-# Ensure upload directories exist
-Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
-Path(settings.AUDIO_UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+span_exporter = SpanExporter(
+    file_path=settings.TRACING_EXPORT_PATH,
+    otlp_endpoint=settings.TRACING_OTLP_ENDPOINT,
+    service_name=settings.TRACING_SERVICE_NAME
+)
+admission = AdmissionController(
+    max_concurrent=settings.MAX_CONCURRENT_REQUESTS,
+    timeout=settings.REQUEST_TIMEOUT,
+    llm_share=settings.ADMISSION_LLM_SHARE,
+    queue_size=settings.ADMISSION_QUEUE_SIZE,
+    stream_limit=settings.ADMISSION_STREAM_LIMIT
+)
+readiness = ReadinessMonitor(
+    interval=settings.READINESS_PROBE_INTERVAL,
+    timeout=settings.READINESS_PROBE_TIMEOUT
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     logger.info("🚀 Starting up Recipe Recommendation System...")
-    db = MongoDB()
-    await db.connect()
-    await voice_service.initialize()
-    await recipe_service.initialize()
-    logger.info("✅ System initialized successfully!")
+    Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+    Path(settings.AUDIO_UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+    services.build()
+    db = get_shared_database()
+    
+    # Warm-up runs concurrently in the background; traffic is accepted right away
+    # and /ready reports when each dependency comes up
+    readiness.add("mongodb", db.ping, warm_up=db.connect)
+    # The AI probes call the provider on every interval, so a revoked key or exhausted quota marks them
+    # not ready; their warm-up (initialize) runs only until they are first ready
+    readiness.add("recipe_ai", services.recipe.health_check, warm_up=services.recipe.initialize, required=False)
+    readiness.add("voice_ai", services.voice.health_check, warm_up=services.voice.initialize, required=False)
+    readiness.add("recipe_index", lambda: services.search.ready, warm_up=services.search.refresh, required=False)
+    readiness.add("recipe_similarity", lambda: services.similarity.ready, warm_up=services.similarity.warm_up, required=False)
+    readiness.start()
+    if settings.ENABLE_RECIPE_CACHING and settings.ENABLE_RECIPE_PREGENERATION:
+        services.pregeneration.start()
+    if settings.ENABLE_USER_RECOMMENDATIONS:
+        services.recommendations.start()
+    if settings.ENABLE_MOOD_ANALYSIS:
+        services.mood_analytics.start()
+    logger.info("✅ System started, dependencies warming up in the background")
     yield
     logger.info("👋 Shutting down...")
-    await db.close()
+    await services.pregeneration.stop()
+    await services.recommendations.stop()
+    await services.mood_analytics.stop()
+    await readiness.stop()
+    await services.similarity.save_snapshot()
+    await close_shared_database()
+    span_exporter.shutdown()
     logger.info("✅ Cleanup complete")
 
 app = FastAPI(
     title="AI-Powered Recipe Recommendation System",
     description="Backend API for personalized recipe recommendations with voice input",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=BSONResponse
 )
 
+if settings.ENABLE_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+
+if settings.ENABLE_ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Added after (so outside) admission control: shed 503s still carry CORS headers, and
+# browsers see a retryable 503 instead of a CORS failure
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed", "Retry-After"],
 )
 
+if settings.ENABLE_METRICS:
+    app.add_middleware(MetricsMiddleware)
+
+if settings.ENABLE_TRACING:
+    propagate_context_to_motor()
+    app.add_middleware(TracingMiddleware, exporter=span_exporter)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify JWT token and return user ID"""
     try:
         token = credentials.credentials
-        user_id = auth_service.verify_token(token)
+        user_id = services.auth.verify_token(token)
+        # LLM calls made while serving this request are queued under this user
+        set_scheduling_key(user_id)
         return user_id
     except Exception as e:
         raise HTTPException(
@@ -83,6 +150,13 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 # ============== HEALTH CHECK ==============
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of request, LLM, Vision and MongoDB metrics"""
+    if not settings.ENABLE_METRICS:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     """System health check"""
@@ -94,9 +168,35 @@ async def health_check():
             "voice_input": settings.ENABLE_VOICE_INPUT,
             "recipe_generation": True,
             "user_authentication": True
+        },
+        "circuit_breakers": {
+            "gemini_recipe": services.recipe.get_circuit_state()
         }
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Per-dependency readiness from the cached background probes; 503 until required ones are up"""
+    snapshot = readiness.snapshot()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if snapshot["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=snapshot
+    )
+
+@app.get("/admission")
+async def admission_state():
+    """Admission controller state per route class, for autoscaling decisions"""
+    if not settings.ENABLE_ADMISSION_CONTROL:
+        raise HTTPException(status_code=404, detail="Admission control is disabled")
+    return admission.snapshot()
+
+@app.get("/admission/llm")
+async def llm_scheduler_state():
+    """Fair-share state of the LLM scheduler, busiest users first (counters only, no user ids)"""
+    if not settings.ENABLE_ADMISSION_CONTROL:
+        raise HTTPException(status_code=404, detail="Admission control is disabled")
+    return get_llm_scheduler().snapshot()
+
 @app.get("/")
 async def root():
     """API root endpoint"""
@@ -113,7 +213,7 @@ async def root():
 async def register_user(user_data: UserCreate, db: MongoDB = Depends(get_database)):
     """Register a new user"""
     try:
-        user = await auth_service.create_user(user_data, db)
+        user = await services.auth.create_user(user_data, db)
         return UserResponse(
             id=str(user["_id"]),
             email=user["email"],
@@ -133,7 +233,7 @@ async def register_user(user_data: UserCreate, db: MongoDB = Depends(get_databas
 async def login_user(user_credentials: UserLogin, db: MongoDB = Depends(get_database)):
     """Login user and get access token"""
     try:
-        result = await auth_service.authenticate_user(user_credentials, db)
+        result = await services.auth.authenticate_user(user_credentials, db)
         return result
     except CustomException as e:
         raise HTTPException(status_code=e.status_code, detail=e.detail)
@@ -188,7 +288,9 @@ async def extract_ingredients_from_audio(
         
         # Extract ingredients
         try:
-            ingredients = await voice_service.transcribe_and_extract_ingredients(temp_path)
+            ingredients = await services.voice.transcribe_and_extract_ingredients(temp_path)
+        except CustomException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
         except Exception as e:
             logger.error(f"Gemini AI processing failed: {str(e)}")
             raise HTTPException(
@@ -197,7 +299,7 @@ async def extract_ingredients_from_audio(
             )
         
         # Validate ingredients
-        validation_result = await voice_service.validate_ingredients(ingredients)
+        validation_result = await services.voice.validate_ingredients(ingredients)
         
         processing_time = time.time() - start_time
         
@@ -241,10 +343,10 @@ async def extract_ingredients_from_text(
         logger.info(f"Extracting ingredients from text: {request.text[:50]}...")
         
         # Extract ingredients
-        ingredients = await voice_service.extract_from_text(request.text)
+        ingredients = await services.voice.extract_from_text(request.text)
         
         # Validate ingredients
-        validation_result = await voice_service.validate_ingredients(ingredients)
+        validation_result = await services.voice.validate_ingredients(ingredients)
         
         processing_time = time.time() - start_time
         
@@ -258,6 +360,8 @@ async def extract_ingredients_from_text(
             confidence=0.90
         )
         
+    except CustomException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
     except Exception as e:
         logger.error(f"Text extraction error: {str(e)}")
         raise HTTPException(
@@ -270,11 +374,36 @@ async def extract_ingredients_from_text(
 @app.post("/recipes/generate", response_model=RecipeResponse)
 async def generate_recipe(
     recipe_request: RecipeRequest,
+    response: Response,
     current_user: str = Depends(get_current_user),
-    db: MongoDB = Depends(get_database)
+    db: MongoDB = Depends(get_database),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
-    """Generate personalized recipe based on ingredients and mood"""
+    """
+    Generate personalized recipe based on ingredients and mood. A retry that
+    repeats the Idempotency-Key of a completed request gets the stored recipe
+    back, without generating again or writing history twice.
+    """
+    claimed = False
     try:
+        if idempotency_key:
+            fingerprint = hashlib.sha256(recipe_request.model_dump_json().encode("utf-8")).hexdigest()
+            existing = await db.claim_idempotency_key(current_user, idempotency_key, fingerprint)
+            if existing is None:
+                claimed = True
+            elif existing["fingerprint"] != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            elif existing["status"] == "in_progress":
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"}
+                )
+            else:
+                logger.info(f"Replaying recipe for Idempotency-Key {idempotency_key}")
+                response.headers["Idempotent-Replayed"] = "true"
+                return RecipeResponse(**existing["response"])
+        
         # Get user profile for personalization
         user = await db.get_user_by_id(current_user)
         if not user:
@@ -283,53 +412,42 @@ async def generate_recipe(
         logger.info(f"Generating recipe for user {current_user} with {len(recipe_request.ingredients)} ingredients")
         
         # Generate recipe
-        recipe = await recipe_service.generate_recipe(
+        recipe = await services.recipe.generate_recipe(
             ingredients=recipe_request.ingredients,
             mood=recipe_request.mood,
             dietary_preferences=user.get("dietary_preferences", []),
             allergies=user.get("allergies", []),
             health_goals=user.get("health_goals", []),
-            cuisine_preference=recipe_request.cuisine_preference
-        )
-        
-        # Save to history
-        recipe_history = RecipeHistory(
+            cuisine_preference=recipe_request.cuisine_preference,
             user_id=current_user,
-            recipe=recipe,
-            ingredients_used=recipe_request.ingredients,
-            mood=recipe_request.mood,
-            input_method="voice",  # Can be updated based on how ingredients were added
-            created_at=datetime.utcnow()
+            servings=recipe_request.servings or 2,
+            reroll=lambda candidate: services.dedup.should_reroll(candidate.dict(), current_user)
         )
-        await db.save_recipe_history(recipe_history.dict())
-        
-        # Log mood
-        mood_log = MoodLog(
-            user_id=current_user,
-            mood=recipe_request.mood,
-            timestamp=datetime.utcnow()
-        )
-        await db.save_mood_log(mood_log.dict())
         
         logger.info(f"✅ Recipe generated successfully: {recipe.title}")
+        # The circuit-open placeholder is neither kept in history nor replayed for this key
+        fallback = services.recipe.is_fallback(recipe)
         
-        # Save to history
-        try:
-            recipe_history = {
-                "user_id": current_user,
-                "recipe": recipe.dict(),
-                "ingredients_used": recipe_request.ingredients,
-                "mood": recipe_request.mood.value,
-                "input_method": "voice",
-                "created_at": datetime.utcnow()
-            }
-            
-            history_id = await db.save_recipe_history(recipe_history)
-            logger.info(f"Recipe saved to history with ID: {history_id}")
+        # Save to history; the recipe itself is stored once, by content hash
+        history_id = None
+        if not fallback:
+            try:
+                recipe_history = {
+                    "user_id": current_user,
+                    "recipe": recipe.dict(),
+                    "ingredients_used": recipe_request.ingredients,
+                    "mood": recipe_request.mood.value,
+                    "input_method": "voice",
+                    "created_at": datetime.utcnow()
+                }
+                recipe_history = await services.dedup.annotate(recipe_history)
+                
+                history_id = await db.save_recipe_history(recipe_history)
+                logger.info(f"Recipe saved to history with ID: {history_id}")
             
-        except Exception as save_error:
-            logger.error(f"Failed to save recipe history: {save_error}")
-            # Don't fail the request if history save fails
+            except Exception as save_error:
+                logger.error(f"Failed to save recipe history: {save_error}")
+                # Don't fail the request if history save fails
         
         # Log mood
         try:
@@ -343,21 +461,204 @@ async def generate_recipe(
         except Exception as mood_error:
             logger.error(f"Failed to log mood: {mood_error}")
         
+        if claimed and not fallback:
+            await db.complete_idempotency_key(current_user, idempotency_key, recipe.dict(), history_id)
+            claimed = False
+        
         return recipe
         
     except CustomException as e:
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+        # A subclass of HTTPException, so it has to be caught first
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers) from e
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Recipe generation error: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail="Failed to generate recipe"
         )
+    finally:
+        if claimed:
+            # The work failed or was cancelled; let a retry with this key run it again
+            await db.release_idempotency_key(current_user, idempotency_key)
+
+@app.get("/recipes/cookable")
+async def get_cookable_recipes(
+    ingredients: Optional[List[str]] = Query(None, description="Pantry ingredients; repeat the parameter or comma-separate"),
+    current_user: str = Depends(get_current_user),
+    db: MongoDB = Depends(get_database),
+    limit: int = Query(10, ge=1),
+    max_missing: Optional[int] = Query(None, ge=0)
+):
+    """
+    Already-generated recipes the user can cook from their pantry, without an
+    LLM call. Ranked by how many pantry ingredients each uses, then by fewest
+    missing ones; recipes hitting the user's allergies or diet are left out.
+    """
+    try:
+        start = time.perf_counter()
+        pantry = [item.strip() for value in ingredients or [] for item in value.split(",") if item.strip()]
+        if not pantry:
+            raise HTTPException(status_code=400, detail="At least one ingredient is required")
+        
+        user = await db.get_user_by_id(current_user)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        excluded = excluded_names(user.get("allergies", []), user.get("dietary_preferences", []))
+        
+        recipes = await services.search.cookable(
+            pantry,
+            excluded=excluded,
+            limit=min(limit, settings.COOKABLE_MAX_RESULTS),
+            max_missing=max_missing
+        )
+        
+        return BSONResponse({
+            "recipes": recipes,
+            "total": len(recipes),
+            "index": services.search.snapshot(),
+            "took_ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Cookable recipes error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search recipes")
+
+async def _stored_recipe(db: MongoDB, user_id: str, recipe_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    A recipe and its content hash, from one of the user's history entries or
+    by content hash; a hash only resolves when the user's history has it
+    """
+    if ObjectId.is_valid(recipe_id):
+        entry = await db.get_history_entry(user_id, recipe_id)
+        if not entry:
+            return None, None
+        return entry.get("recipe"), entry.get("recipe_hash")
+    if not await db.user_has_recipes(user_id, [recipe_id]):
+        return None, None
+    return await db.get_recipe(recipe_id), recipe_id
+
+@app.get("/recipes/{recipe_id}/similar")
+async def get_similar_recipes(
+    recipe_id: str,
+    current_user: str = Depends(get_current_user),
+    db: MongoDB = Depends(get_database),
+    limit: int = Query(10, ge=1)
+):
+    """
+    Stored recipes most similar to one of the user's history entries, or to a
+    recipe in their history by content hash, by shared ingredients, cuisine, tags and
+    nutrition. No LLM call; recipes hitting the user's allergies or diet are
+    left out.
+    """
+    try:
+        start = time.perf_counter()
+        recipe, recipe_hash = await _stored_recipe(db, current_user, recipe_id)
+        if not recipe:
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        
+        user = await db.get_user_by_id(current_user)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        excluded = excluded_names(user.get("allergies", []), user.get("dietary_preferences", []))
+        
+        recipes = await services.similarity.similar(
+            recipe,
+            recipe_hash=recipe_hash,
+            excluded=excluded,
+            limit=min(limit, settings.SIMILAR_MAX_RESULTS)
+        )
+        
+        return BSONResponse({
+            "recipe_id": recipe_id,
+            "recipes": recipes,
+            "total": len(recipes),
+            "took_ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Similar recipes error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to find similar recipes")
+
+@app.get("/recipes/{recipe_id}/scaled")
+async def get_scaled_recipe(
+    recipe_id: str,
+    current_user: str = Depends(get_current_user),
+    db: MongoDB = Depends(get_database),
+    servings: int = Query(..., ge=1, le=MAX_SERVINGS)
+):
+    """
+    One of the user's recipes (history entry id or content hash) rescaled
+    to another number of servings. Quantities are scaled and their units
+    normalized locally, with nutrition recomputed; no LLM call and nothing
+    is saved.
+    """
+    try:
+        start = time.perf_counter()
+        recipe, _ = await _stored_recipe(db, current_user, recipe_id)
+        if not recipe:
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        
+        scale_start = time.perf_counter()
+        scaled = scale_recipe(recipe, servings)
+        
+        return BSONResponse({
+            "recipe_id": recipe_id,
+            "original_servings": recipe.get("servings"),
+            "servings": servings,
+            "recipe": scaled,
+            "scale_ms": round((time.perf_counter() - scale_start) * 1000, 3),
+            "took_ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Scale recipe error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to scale recipe")
+
+@app.get("/recipes/recommendations")
+async def get_recommendations(
+    current_user: str = Depends(get_current_user),
+    db: MongoDB = Depends(get_database),
+    limit: int = Query(10, ge=1)
+):
+    """
+    Recipes picked for the user by the periodic recommendation build, plus
+    the ingredients it thinks they like. A single precomputed read; empty
+    until the user has history and a build has run.
+    """
+    if not settings.ENABLE_USER_RECOMMENDATIONS:
+        raise HTTPException(status_code=404, detail="Recommendations are disabled")
+    try:
+        user = await db.get_user_by_id(current_user)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        excluded = excluded_names(user.get("allergies", []), user.get("dietary_preferences", []))
+        
+        result = await services.recommendations.recommendations(
+            current_user,
+            excluded=excluded,
+            limit=min(limit, settings.RECOMMENDATION_TOP_N)
+        )
+        return BSONResponse({**result, "total": len(result["recipes"])})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get recommendations error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve recommendations")
 
 # ============== RECIPE HISTORY ==============
 
 @app.get("/recipes/history")
 async def get_recipe_history(
+    request: Request,
     current_user: str = Depends(get_current_user),
     db: MongoDB = Depends(get_database),
     limit: int = 10,
@@ -365,27 +666,25 @@ async def get_recipe_history(
 ):
     """Get user's recipe history"""
     try:
-        history = await db.get_recipe_history(current_user, limit, skip)
+        versions = await db.get_user_versions(current_user)
+        etag = make_etag(current_user, "history", versions["history"], limit, skip)
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
-        # Convert ObjectId to string for JSON serialization
-        for item in history:
-            if "_id" in item:
-                item["_id"] = str(item["_id"])
-            if "recipe" in item and "_id" in item["recipe"]:
-                item["recipe"]["_id"] = str(item["recipe"]["_id"])
+        history = await db.get_recipe_history(current_user, limit, skip)
         
         # Count total recipes
         total = len(history)
         
         logger.info(f"Retrieved {total} recipes for user {current_user}")
         
-        return {
+        return BSONResponse({
             "recipes": history,
             "total": total,
             "limit": limit,
             "skip": skip,
             "has_more": total == limit
-        }
+        }, headers=etag_headers(etag))
         
     except Exception as e:
         logger.error(f"Get recipe history error: {str(e)}")
@@ -395,6 +694,46 @@ async def get_recipe_history(
             detail="Failed to retrieve recipe history"
         )
 
+# Declared ahead of /recipes/history/{recipe_id}, which would otherwise take "export" as an id
+@app.get("/recipes/history/export")
+async def export_recipe_history(
+    current_user: str = Depends(get_current_user),
+    db: MongoDB = Depends(get_database),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    include_favorites: bool = False,
+    include_mood: bool = False
+):
+    """
+    Stream the user's whole recipe history, newest first, as NDJSON or CSV.
+    Entries are read off one batched cursor and each batch is hydrated and
+    encoded only when the client has taken the previous chunk, so memory
+    stays at one batch whatever the history size.
+    """
+    csv_encoder = CSVEncoder(csv_columns(include_mood, include_favorites)) if format == "csv" else None
+    
+    async def body():
+        exported = 0
+        start = time.perf_counter()
+        try:
+            if csv_encoder is not None:
+                yield csv_encoder.encode([])
+            async for batch in db.iter_user_history(current_user, settings.HISTORY_EXPORT_BATCH_SIZE, include_favorites):
+                records = [export_record(entry, include_mood) for entry in batch]
+                yield csv_encoder.encode(records) if csv_encoder is not None else encode_ndjson(records)
+                exported += len(records)
+        except Exception as e:
+            # The status line is already out; cutting the stream short tells the client the file is incomplete
+            logger.error(f"History export failed after {exported} entries: {str(e)}")
+            raise
+        logger.info(f"Exported {exported} history entries for user {current_user} in {time.perf_counter() - start:.2f}s")
+    
+    filename = f"recipe-history-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
 @app.get("/recipes/history/{recipe_id}")
 async def get_recipe_by_id(
     recipe_id: str,
@@ -403,18 +742,12 @@ async def get_recipe_by_id(
 ):
     """Get specific recipe from history"""
     try:
-        from bson import ObjectId
-        
-        recipe = await db.database.recipe_history.find_one({
-            "_id": ObjectId(recipe_id),
-            "user_id": current_user
-        })
+        recipe = await db.get_history_entry(current_user, recipe_id)
         
         if not recipe:
             raise HTTPException(status_code=404, detail="Recipe not found")
         
-        recipe["_id"] = str(recipe["_id"])
-        return recipe
+        return BSONResponse(recipe)
         
     except HTTPException:
         raise
@@ -430,14 +763,7 @@ async def delete_recipe(
 ):
     """Delete recipe from history"""
     try:
-        from bson import ObjectId
-        
-        result = await db.database.recipe_history.delete_one({
-            "_id": ObjectId(recipe_id),
-            "user_id": current_user
-        })
-        
-        if result.deleted_count == 0:
+        if not await db.delete_history_entry(current_user, recipe_id):
             raise HTTPException(status_code=404, detail="Recipe not found")
         
         return {"message": "Recipe deleted successfully"}
@@ -477,21 +803,28 @@ async def toggle_favorite_recipe(
 
 @app.get("/recipes/favorites")
 async def get_favorite_recipes(
+    request: Request,
     current_user: str = Depends(get_current_user),
     db: MongoDB = Depends(get_database)
 ):
     """Get user's favorite recipes"""
     try:
+        # Favorites embed history entries, so deleting one changes this payload too
+        versions = await db.get_user_versions(current_user)
+        etag = make_etag(current_user, "favorites", versions["favorites"], versions["history"])
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
         # Get favorite recipe IDs
         favorite_cursor = db.database.favorites.find({"user_id": current_user})
         favorite_docs = await favorite_cursor.to_list(length=None)
         
         if not favorite_docs:
             logger.info(f"No favorites found for user {current_user}")
-            return {
+            return BSONResponse({
                 "favorites": [],
                 "total": 0
-            }
+            }, headers=etag_headers(etag))
         
         # Extract recipe IDs and convert to ObjectId
         from bson import ObjectId
@@ -511,29 +844,21 @@ async def get_favorite_recipes(
         
         if not recipe_ids:
             logger.info(f"No valid recipe IDs in favorites for user {current_user}")
-            return {
+            return BSONResponse({
                 "favorites": [],
                 "total": 0
-            }
+            }, headers=etag_headers(etag))
         
         # Get the actual recipes from recipe_history
         recipe_cursor = db.database.recipe_history.find({"_id": {"$in": recipe_ids}})
-        recipes = await recipe_cursor.to_list(length=None)
-        
-        # Convert ObjectIds to strings for JSON serialization
-        for recipe in recipes:
-            if "_id" in recipe:
-                recipe["_id"] = str(recipe["_id"])
-            if "recipe" in recipe and isinstance(recipe["recipe"], dict):
-                if "_id" in recipe["recipe"]:
-                    recipe["recipe"]["_id"] = str(recipe["recipe"]["_id"])
+        recipes = await db.hydrate_history(await recipe_cursor.to_list(length=None))
         
         logger.info(f"Retrieved {len(recipes)} favorite recipes for user {current_user}")
         
-        return {
+        return BSONResponse({
             "favorites": recipes,
             "total": len(recipes)
-        }
+        }, headers=etag_headers(etag))
         
     except Exception as e:
         logger.error(f"Get favorites error: {str(e)}")
@@ -549,15 +874,23 @@ async def get_favorite_recipes(
 
 @app.get("/users/me", response_model=UserResponse)
 async def get_current_user_profile(
+    request: Request,
+    response: Response,
     current_user: str = Depends(get_current_user),
     db: MongoDB = Depends(get_database)
 ):
     """Get current user profile"""
     try:
+        versions = await db.get_user_versions(current_user)
+        etag = make_etag(current_user, "profile", versions["profile"])
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
         user = await db.get_user_by_id(current_user)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
+        response.headers.update(etag_headers(etag))
         return UserResponse(
             id=str(user["_id"]),
             email=user["email"],
@@ -632,11 +965,11 @@ async def get_mood_trends(
     try:
         trends = await db.get_mood_trends(current_user, days)
         
-        return {
+        return BSONResponse({
             "trends": trends,
             "period_days": days,
             "total_entries": len(trends)
-        }
+        })
         
     except Exception as e:
         logger.error(f"Get mood trends error: {str(e)}")
@@ -645,6 +978,17 @@ async def get_mood_trends(
             detail="Failed to retrieve mood trends"
         )
 
+@app.get("/analytics/mood-cuisine")
+async def get_mood_cuisine_insights(current_user: str = Depends(get_current_user)):
+    """
+    Which cuisines each mood leans towards, overall and by time of day, across
+    all users. Served from the periodic snapshot; lift above 1 means chosen
+    more often than at that time of day in general.
+    """
+    if not settings.ENABLE_MOOD_ANALYSIS:
+        raise HTTPException(status_code=404, detail="Mood analysis is disabled")
+    return BSONResponse(services.mood_analytics.priors.summary())
+
 @app.get("/analytics/ingredient-stats")
 async def get_ingredient_statistics(
     current_user: str = Depends(get_current_user),
@@ -654,10 +998,10 @@ async def get_ingredient_statistics(
     try:
         stats = await db.get_ingredient_usage_stats(current_user)
         
-        return {
+        return BSONResponse({
             "ingredients": stats,
             "total_unique_ingredients": len(stats)
-        }
+        })
         
     except Exception as e:
         logger.error(f"Get ingredient stats error: {str(e)}")
@@ -668,11 +1012,22 @@ async def get_ingredient_statistics(
 
 @app.get("/analytics/dashboard")
 async def get_user_dashboard(
+    request: Request,
     current_user: str = Depends(get_current_user),
     db: MongoDB = Depends(get_database)
 ):
     """Get comprehensive user dashboard data"""
     try:
+        # Mood trends cover a rolling 30-day window, so the tag also rolls daily
+        versions = await db.get_user_versions(current_user)
+        etag = make_etag(
+            current_user, "dashboard",
+            versions["history"], versions["favorites"], versions["mood"],
+            datetime.utcnow().date()
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
         # Get various statistics
         history = await db.get_recipe_history(current_user, limit=100)
         mood_trends = await db.get_mood_trends(current_user, days=30)
@@ -708,7 +1063,7 @@ async def get_user_dashboard(
         recent_recipes = []
         for recipe_doc in history[:5]:
             recent_recipes.append({
-                "id": str(recipe_doc.get("_id")),
+                "id": recipe_doc.get("_id"),
                 "title": recipe_doc.get("recipe", {}).get("title", "Unknown"),
                 "created_at": recipe_doc.get("created_at"),
                 "mood": recipe_doc.get("mood")
@@ -716,7 +1071,7 @@ async def get_user_dashboard(
         
         logger.info(f"Dashboard stats: {total_recipes} recipes, {len(favorites)} favorites")
         
-        return {
+        return BSONResponse({
             "total_recipes_generated": total_recipes,
             "total_favorites": len(favorites),
             "mood_trends_count": len(mood_trends),
@@ -725,7 +1080,7 @@ async def get_user_dashboard(
             "avg_cooking_time_minutes": round(avg_cooking_time, 1),
             "top_ingredients": ingredient_stats[:10],
             "recent_recipes": recent_recipes
-        }
+        }, headers=etag_headers(etag))
         
     except Exception as e:
         logger.error(f"Get dashboard error: {str(e)}")
@@ -749,14 +1104,23 @@ async def get_system_info(current_user: str = Depends(get_current_user)):
             "mood_tracking": settings.ENABLE_MOOD_ANALYSIS,
             "favorites": True,
             "history": True,
-            "analytics": settings.ENABLE_ANALYTICS
+            "analytics": settings.ENABLE_ANALYTICS,
+            "recommendations": settings.ENABLE_USER_RECOMMENDATIONS
         },
         "supported_audio_formats": settings.SUPPORTED_AUDIO_FORMATS,
         "max_audio_file_size_mb": settings.MAX_AUDIO_FILE_SIZE / (1024 * 1024),
         "max_ingredients": settings.MAX_INGREDIENTS_DETECTED,
         "ai_services": {
-            "voice_service_initialized": voice_service.initialized,
-            "recipe_service_initialized": recipe_service.initialized
+            "voice_service_initialized": services.voice.initialized,
+            "recipe_service_initialized": services.recipe.initialized,
+            "llm_backend": services.recipe.backend.name if services.recipe.backend else None,
+            "recipe_generation_stats": services.recipe.get_generation_stats(),
+            "recipe_pregeneration": services.pregeneration.snapshot(),
+            "recipe_index": services.search.snapshot(),
+            "recipe_similarity": services.similarity.snapshot(),
+            "user_recommendations": services.recommendations.snapshot(),
+            "mood_analysis": services.mood_analytics.snapshot(),
+            "near_duplicates": services.dedup.snapshot()
         }
     }
 
@@ -765,13 +1129,13 @@ async def test_voice_service(current_user: str = Depends(get_current_user)):
     """Test if voice service is working properly"""
     try:
         # Test with simple text extraction
-        test_result = await voice_service.extract_from_text(
+        test_result = await services.voice.extract_from_text(
             "tomato, onion, garlic, chicken"
         )
         
         return {
             "status": "success",
-            "voice_service_initialized": voice_service.initialized,
+            "voice_service_initialized": services.voice.initialized,
             "test_extraction": test_result,
             "message": "Voice service is working correctly"
         }
@@ -779,7 +1143,7 @@ async def test_voice_service(current_user: str = Depends(get_current_user)):
         logger.error(f"Voice service test failed: {str(e)}")
         return {
             "status": "error",
-            "voice_service_initialized": voice_service.initialized,
+            "voice_service_initialized": services.voice.initialized,
             "error": str(e),
             "message": "Voice service is not working. Check your GEMINI_API_KEY in .env"
         }
@@ -795,24 +1159,20 @@ async def debug_history(
         cursor = db.database.recipe_history.find({"user_id": current_user})
         raw_history = await cursor.to_list(length=100)
         
-        # Convert ObjectIds to strings
-        for item in raw_history:
-            item["_id"] = str(item["_id"])
-        
         # Also check total count
         total_count = await db.database.recipe_history.count_documents({"user_id": current_user})
         
         # Check if any recipes exist at all
         all_count = await db.database.recipe_history.count_documents({})
         
-        return {
+        return BSONResponse({
             "current_user_id": current_user,
             "recipes_for_user": len(raw_history),
             "total_count": total_count,
             "all_recipes_count": all_count,
             "sample_recipes": raw_history[:3] if raw_history else [],
             "message": f"Found {total_count} recipes for this user"
-        }
+        })
         
     except Exception as e:
         logger.error(f"Debug history error: {str(e)}")
@@ -861,22 +1221,20 @@ async def test_save_recipe(
         
         # Try to save
         logger.info(f"Attempting to save test recipe for user: {current_user}")
-        result = await db.database.recipe_history.insert_one(test_recipe)
-        saved_id = str(result.inserted_id)
+        saved_id = await db.save_recipe_history(test_recipe)
         logger.info(f"Test recipe saved with ID: {saved_id}")
         
         # Try to retrieve it
-        saved_recipe = await db.database.recipe_history.find_one({"_id": result.inserted_id})
+        saved_recipe = await db.get_history_entry(current_user, saved_id)
         
         if saved_recipe:
-            saved_recipe["_id"] = str(saved_recipe["_id"])
-            return {
+            return BSONResponse({
                 "status": "success",
                 "message": "Recipe saved and retrieved successfully!",
                 "saved_id": saved_id,
                 "retrieved": True,
                 "recipe": saved_recipe
-            }
+            })
         else:
             return {
                 "status": "warning",
@@ -899,15 +1257,21 @@ async def test_save_recipe(
 @app.exception_handler(CustomException)
 async def custom_exception_handler(request, exc: CustomException):
     """Handle custom exceptions"""
-    return {
-        "error": True,
-        "status_code": exc.status_code,
-        "detail": exc.detail,
-        "error_code": exc.error_code,
-        "timestamp": exc.timestamp.isoformat()
-    }
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "error": True,
+            "status_code": exc.status_code,
+            "detail": exc.detail,
+            "error_code": exc.error_code,
+            "timestamp": exc.timestamp.isoformat()
+        },
+        headers=exc.headers
+    )
 
 if __name__ == "__main__":
+    import uvicorn
+    
     uvicorn.run(
         "main:app",
         host=settings.HOST,
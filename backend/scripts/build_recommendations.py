@@ -0,0 +1,53 @@
+"""
+Rebuild the precomputed per-user recipe recommendations now.
+
+Runs the same job the API workers schedule every RECOMMENDATION_INTERVAL:
+streams recipe_history, favorites and the recipes collection, factorizes the
+user x ingredient matrix and rewrites user_recommendations. Takes the job
+lease, so it will not overlap a build already running on a worker.
+
+    python -m scripts.build_recommendations [--batch-size 5000] [--factors 32]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.core.config import get_settings
+from app.database.mongodb import close_shared_database, get_shared_database
+from app.services.recommendation_service import RecommendationService
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("build_recommendations")
+
+async def build() -> dict:
+    await get_shared_database().connect()
+    try:
+        return await RecommendationService().run_once(force=True)
+    finally:
+        await close_shared_database()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, help="Documents per streamed read")
+    parser.add_argument("--factors", type=int, help="Latent factors in the SVD")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if args.batch_size:
+        settings.RECOMMENDATION_BATCH_SIZE = args.batch_size
+    if args.factors:
+        settings.RECOMMENDATION_FACTORS = args.factors
+
+    stats = asyncio.run(build())
+    if stats is None:
+        logger.info("Another worker is building recommendations right now; nothing done")
+        return 1
+    logger.info(
+        f"{stats['written']} users, {stats['recipes']} recipes, {stats['interactions']} interactions "
+        f"in {stats['seconds']}s"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Sign every stored recipe with MinHash and flag near-duplicates already in
+recipe_history.
+
+Streams the recipes collection, computes signatures a batch at a time and
+writes them (with their LSH band keys) where missing or built with other
+MINHASH_* settings, so write-time detection can match against them. Then
+walks the recipes oldest first and marks the history entries of every
+recipe that nearly repeats an earlier one with `near_duplicate_of`; with
+NEAR_DUPLICATE_ACTION=merge they are repointed at the earlier recipe. Safe
+to re-run.
+
+    python -m scripts.dedup_recipes [--batch-size 1000] [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.database.mongodb import close_shared_database, get_shared_database
+from app.services.recipe_dedup_service import RecipeDedupService
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("dedup_recipes")
+
+async def dedup(batch_size: int, dry_run: bool) -> dict:
+    await get_shared_database().connect()
+    try:
+        return await RecipeDedupService().backfill(batch_size, dry_run)
+    finally:
+        await close_shared_database()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+
+    stats = asyncio.run(dedup(args.batch_size, args.dry_run))
+    logger.info(
+        f"{'Dry run: ' if args.dry_run else ''}{stats['recipes']} recipes, {stats['signed']} signed, "
+        f"{stats['near_duplicates']} near-duplicates, {stats['history_entries_changed']} history entries "
+        f"updated in {stats['seconds']}s"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Move embedded recipes out of recipe_history into the content-addressed
+recipes collection.
+
+Streams history entries that still embed a `recipe`, upserts each recipe once
+under its content hash and rewrites the entry to reference it (`recipe_hash`,
+embedded copy removed). Work goes out as unordered bulk writes per batch.
+Progress is keyed on _id, so the migration can be interrupted and re-run.
+
+    python -m scripts.migrate_recipe_store [--batch-size 500] [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime
+
+from bson import BSON
+from pymongo import UpdateOne
+
+from app.database.mongodb import MongoDB
+from app.utils.recipe_schema import recipe_content, recipe_content_hash
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("migrate_recipe_store")
+
+async def migrate(batch_size: int, dry_run: bool) -> dict:
+    db = MongoDB()
+    await db.connect()
+    stats = {"entries": 0, "unique_recipes": 0, "new_recipes": 0, "embedded_bytes": 0, "stored_bytes": 0}
+    seen = set()
+    start = time.perf_counter()
+
+    try:
+        last_id = None
+        while True:
+            query = {"recipe": {"$exists": True}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            cursor = db.database.recipe_history.find(query, {"recipe": 1}).sort("_id", 1).limit(batch_size)
+            batch = await cursor.to_list(length=batch_size)
+            if not batch:
+                break
+
+            recipe_ops, history_ops = [], []
+            for entry in batch:
+                recipe = entry["recipe"]
+                content_hash = recipe_content_hash(recipe)
+                stats["embedded_bytes"] += len(BSON.encode(recipe))
+                if content_hash not in seen:
+                    seen.add(content_hash)
+                    content = recipe_content(recipe)
+                    stats["stored_bytes"] += len(BSON.encode(content))
+                    recipe_ops.append(UpdateOne(
+                        {"_id": content_hash},
+                        {"$setOnInsert": {"recipe": content, "created_at": datetime.utcnow()}},
+                        upsert=True
+                    ))
+                history_ops.append(UpdateOne(
+                    {"_id": entry["_id"]},
+                    {"$set": {"recipe_hash": content_hash}, "$unset": {"recipe": ""}}
+                ))
+
+            # Recipes first, so an interrupted run never leaves a dangling reference
+            if not dry_run:
+                if recipe_ops:
+                    result = await db.database.recipes.bulk_write(recipe_ops, ordered=False)
+                    stats["new_recipes"] += result.upserted_count
+                await db.database.recipe_history.bulk_write(history_ops, ordered=False)
+
+            stats["entries"] += len(batch)
+            last_id = batch[-1]["_id"]
+            logger.info(f"Migrated {stats['entries']} entries, {len(seen)} unique recipes so far")
+    finally:
+        await db.close()
+
+    stats["unique_recipes"] = len(seen)
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would move without writing")
+    args = parser.parse_args()
+
+    stats = asyncio.run(migrate(args.batch_size, args.dry_run))
+    saved = stats["embedded_bytes"] - stats["stored_bytes"]
+    logger.info(
+        f"{'Dry run: ' if args.dry_run else ''}{stats['entries']} history entries, "
+        f"{stats['unique_recipes']} unique recipes ({stats['new_recipes']} new) in {stats['seconds']}s; "
+        f"recipe payload {stats['embedded_bytes']} -> {stats['stored_bytes']} bytes ({saved} saved)"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
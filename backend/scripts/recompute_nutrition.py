@@ -0,0 +1,116 @@
+"""
+Recompute nutrition_info for every stored recipe from its ingredient lines.
+
+Streams the recipes collection (and history entries that still embed a
+recipe) in _id order, computes each batch's per-serving nutrition in one
+vectorized pass with the local nutrient table and writes back only the
+recipes whose values changed, as unordered bulk writes. Recipes keep their
+content-hash _id, which leaves out computed fields (run rekey_recipes once on
+a database stored before that). The owners of affected history entries get
+their history version bumped, so cached history pages are not served stale.
+
+    python -m scripts.recompute_nutrition [--batch-size 1000] [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+
+from pymongo import UpdateOne
+
+from app.database.mongodb import MongoDB
+from app.models.schemas import NutritionInfo
+from app.utils.nutrition import nutrient_name, nutrition_matrix, nutrition_values, parse_quantity, unmatched_lines
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("recompute_nutrition")
+
+# (collection, query) pairs holding recipe documents under "recipe"
+SOURCES = [
+    ("recipes", None),
+    ("recipe_history", {"recipe": {"$exists": True}}),
+]
+
+async def recompute(batch_size: int, dry_run: bool) -> dict:
+    db = MongoDB()
+    await db.connect()
+    stats = {"recipes": 0, "changed": 0, "lines": 0, "unmatched_lines": 0, "users": 0}
+    unknown: Counter = Counter()
+    users = set()
+    start = time.perf_counter()
+
+    try:
+        for collection, query in SOURCES:
+            projection = {"user_id": 1, "recipe.ingredients": 1, "recipe.servings": 1, "recipe.nutrition_info": 1}
+            async for batch in db.iter_batches(collection, projection, batch_size, query):
+                recipes = [doc.get("recipe") or {} for doc in batch]
+                pairs = [
+                    ([str(line) for line in recipe.get("ingredients") or []], recipe.get("servings") or 1)
+                    for recipe in recipes
+                ]
+                rows = nutrition_matrix(pairs)
+
+                ops, changed = [], []
+                for doc, recipe, (ingredients, _), row in zip(batch, recipes, pairs, rows):
+                    unmatched = unmatched_lines(ingredients)
+                    # Same as compute_nutrition: marked unavailable when no line counts
+                    if len(unmatched) < len(ingredients):
+                        nutrition = {**nutrition_values(row), "available": True}
+                    else:
+                        nutrition = NutritionInfo.unavailable().model_dump()
+                    stats["lines"] += len(ingredients)
+                    for line in unmatched:
+                        stats["unmatched_lines"] += 1
+                        quantity = parse_quantity(line)
+                        # Lines without an amount ("salt to taste") are expected; missing table entries are not
+                        if quantity.amount is not None and nutrient_name(quantity.name) is None:
+                            unknown[quantity.name.lower()] += 1
+                    if recipe.get("nutrition_info") != nutrition:
+                        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"recipe.nutrition_info": nutrition}}))
+                        changed.append(doc)
+
+                if collection == "recipes":
+                    owners = set(await db.database.recipe_history.distinct(
+                        "user_id", {"recipe_hash": {"$in": [doc["_id"] for doc in changed]}}
+                    )) if changed else set()
+                else:
+                    owners = {doc["user_id"] for doc in changed if doc.get("user_id")}
+                users.update(owners)
+
+                if ops and not dry_run:
+                    await db.database[collection].bulk_write(ops, ordered=False)
+                    for user_id in owners:
+                        await db.bump_user_version(user_id, "history")
+                stats["recipes"] += len(batch)
+                stats["changed"] += len(ops)
+                logger.info(f"{collection}: {stats['recipes']} recipes scanned, {stats['changed']} changed so far")
+    finally:
+        await db.close()
+
+    stats["users"] = len(users)
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    stats["top_unknown"] = unknown.most_common(20)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+
+    stats = asyncio.run(recompute(args.batch_size, args.dry_run))
+    coverage = 1 - stats["unmatched_lines"] / max(stats["lines"], 1)
+    logger.info(
+        f"{'Dry run: ' if args.dry_run else ''}{stats['recipes']} recipes, {stats['changed']} updated "
+        f"({stats['users']} users' history) in {stats['seconds']}s; {coverage:.1%} of ingredient lines counted"
+    )
+    if stats["top_unknown"]:
+        logger.info("Most common ingredients missing from the nutrient table: " + ", ".join(
+            f"{name} ({count})" for name, count in stats["top_unknown"]
+        ))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
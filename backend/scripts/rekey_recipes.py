@@ -0,0 +1,98 @@
+"""
+Re-key stored recipes whose content-hash _id no longer matches their content.
+
+Recipe keys used to hash the computed fields too (nutrition_info), so a
+recipe whose nutrition was recomputed ended up under a key its content no
+longer produces. Streams the recipes collection in _id order, copies each
+such recipe to its current key, repoints the history entries and recipe
+cache entries that reference the old key, then deletes it. Recipes that now
+share a key (they differed only in nutrition) collapse into one. Work goes
+out as unordered bulk writes per batch, so the migration can be interrupted
+and re-run.
+
+Afterwards remove the similarity snapshot (SIMILARITY_SNAPSHOT_DIR) so
+workers rebuild it under the new keys; recommendations pick them up on
+their next build.
+
+    python -m scripts.rekey_recipes [--batch-size 500] [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from pymongo import DeleteOne, UpdateMany, UpdateOne
+
+from app.database.mongodb import MongoDB
+from app.utils.recipe_schema import recipe_content_hash
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("rekey_recipes")
+
+async def rekey(batch_size: int, dry_run: bool) -> dict:
+    db = MongoDB()
+    await db.connect()
+    stats = {"recipes": 0, "rekeyed": 0, "history_entries": 0, "cache_entries": 0, "users": 0}
+    start = time.perf_counter()
+
+    try:
+        async for batch in db.iter_batches("recipes", {}, batch_size):
+            moves = {}
+            recipe_ops = []
+            for doc in batch:
+                new_hash = recipe_content_hash(doc.get("recipe") or {})
+                if new_hash == doc["_id"]:
+                    continue
+                moves[doc["_id"]] = new_hash
+                fields = {key: value for key, value in doc.items() if key != "_id"}
+                recipe_ops.append(UpdateOne({"_id": new_hash}, {"$setOnInsert": fields}, upsert=True))
+            stats["recipes"] += len(batch)
+            if not moves:
+                continue
+
+            old_hashes = list(moves)
+            users = await db.database.recipe_history.distinct("user_id", {"recipe_hash": {"$in": old_hashes}})
+            history_ops, cache_ops = [], []
+            for old_hash, new_hash in moves.items():
+                history_ops.append(UpdateMany({"recipe_hash": old_hash}, {"$set": {"recipe_hash": new_hash}}))
+                history_ops.append(UpdateMany(
+                    {"near_duplicate_of.recipe_hash": old_hash}, {"$set": {"near_duplicate_of.recipe_hash": new_hash}}
+                ))
+                cache_ops.append(UpdateMany({"recipe_hash": old_hash}, {"$set": {"recipe_hash": new_hash}}))
+
+            # New keys first and old ones last, so an interrupted run never leaves a dangling reference
+            if not dry_run:
+                await db.database.recipes.bulk_write(recipe_ops, ordered=False)
+                result = await db.database.recipe_history.bulk_write(history_ops, ordered=False)
+                stats["history_entries"] += result.modified_count
+                result = await db.database.recipe_cache.bulk_write(cache_ops, ordered=False)
+                stats["cache_entries"] += result.modified_count
+                await db.database.recipes.bulk_write([DeleteOne({"_id": old_hash}) for old_hash in old_hashes], ordered=False)
+                for user_id in users:
+                    await db.bump_user_version(user_id, "history")
+
+            stats["rekeyed"] += len(moves)
+            stats["users"] += len(users)
+            logger.info(f"{stats['recipes']} recipes scanned, {stats['rekeyed']} re-keyed so far")
+    finally:
+        await db.close()
+
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would move without writing")
+    args = parser.parse_args()
+
+    stats = asyncio.run(rekey(args.batch_size, args.dry_run))
+    logger.info(
+        f"{'Dry run: ' if args.dry_run else ''}{stats['recipes']} recipes, {stats['rekeyed']} re-keyed in "
+        f"{stats['seconds']}s; {stats['history_entries']} history and {stats['cache_entries']} cache entries repointed"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())